@@ -0,0 +1,288 @@
+"""Offline performance suite for the MCTS + sandbox pipeline.
+
+Measures payload build time, scoring time, sandbox eval throughput, end-to-end
+MCTS step latency and memory per search node, with the LLMs replaced by
+stub_llm. Results go to one JSON file per run so versions can be compared:
+
+    python benchmarks/run_benchmarks.py
+    python benchmarks/run_benchmarks.py --backend native --iterations 1,4,8 --out bench.json
+    python benchmarks/run_benchmarks.py --baseline benchmarks/results/old.json
+"""
+from __future__ import annotations
+
+import argparse
+import gc
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+HERE = Path(__file__).resolve().parent
+sys.path.insert(0, str(HERE.parent))
+os.environ.setdefault("OPENAI_API_KEY", "offline-benchmark")  # ChatOpenAI is built at import, never called
+
+import treequest as tq
+from rich.console import Console
+
+import treesearch_fib as tf
+from stub_llm import VARIANTS, fenced, install
+
+EVAL_CODE = "total = sum(range(n))\ntotal"
+
+
+def _summary(samples: List[float]) -> Dict[str, float]:
+    ordered = sorted(samples)
+    def pct(p: float) -> float:
+        return ordered[min(len(ordered) - 1, int(p * len(ordered)))]
+    return {
+        "n": len(ordered),
+        "mean": statistics.fmean(ordered),
+        "p50": pct(0.50),
+        "p95": pct(0.95),
+        "min": ordered[0],
+        "max": ordered[-1],
+    }
+
+
+def _time_ms(fn: Callable[[], Any], repeat: int) -> Dict[str, float]:
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t0) * 1e3)
+    return _summary(samples)
+
+
+class _CannedBackend:
+    """Returns a fixed result without executing, so only payload build and parsing are timed."""
+
+    def __init__(self):
+        self.result: Dict[str, Any] = {}
+
+    def start(self):
+        pass
+
+    def eval(self, code, vars=None, timeout=8.0):
+        return self.result
+
+    def close(self):
+        pass
+
+
+def bench_payload_build(repeat: int) -> Dict[str, Any]:
+    backend = _CannedBackend()
+    sb = tf.SandboxClient(backend=backend)
+    out: Dict[str, Any] = {}
+    for name, code in VARIANTS.items():
+        backend.result = {"status": "success", "return_value": {"results": [("fib_sequence_0_9", True, "")]}}
+        tests = _time_ms(lambda: tf.run_unit_tests(sb, code), repeat)
+        backend.result = {"status": "success", "return_value": {"contract": "sequence", "runtime_ms": 0.1}}
+        bench = _time_ms(lambda: tf.run_benchmark(sb, code), repeat)
+        out[name] = {"unit_tests_ms": tests, "benchmark_ms": bench}
+    return out
+
+
+def bench_sandbox(sb: tf.SandboxClient, evals: int, concurrency: int) -> tuple[Dict[str, Any], Dict[str, tuple]]:
+    for _ in range(3):
+        sb.eval(EVAL_CODE, {"n": 10})
+
+    t0 = time.perf_counter()
+    latencies = []
+    for i in range(evals):
+        t = time.perf_counter()
+        sb.eval(EVAL_CODE, {"n": i})
+        latencies.append((time.perf_counter() - t) * 1e3)
+    serial_s = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as ex:
+        results = list(ex.map(lambda i: sb.eval(EVAL_CODE, {"n": i}), range(evals)))
+    concurrent_s = time.perf_counter() - t0
+    failed = sum(1 for r in results if r.get("status") != "success")
+
+    # one real test + bench round per variant; the outcomes feed the scoring benchmark
+    rounds: Dict[str, Any] = {}
+    outcomes: Dict[str, tuple] = {}
+    for name, code in VARIANTS.items():
+        t = time.perf_counter()
+        ok, note = tf.run_unit_tests(sb, code)
+        tests_ms = (time.perf_counter() - t) * 1e3
+        t = time.perf_counter()
+        bench = tf.run_benchmark(sb, code) if ok else {"runtime_ms": float("inf"), "contract": "missing"}
+        bench_ms = (time.perf_counter() - t) * 1e3
+        rounds[name] = {"tests_ok": ok, "unit_tests_ms": tests_ms, "benchmark_ms": bench_ms,
+                        "contract": bench.get("contract")}
+        outcomes[name] = (ok, bench)
+
+    return {
+        "eval_latency_ms": _summary(latencies),
+        "serial_evals_per_s": evals / serial_s,
+        "concurrent_evals_per_s": evals / concurrent_s,
+        "concurrency": concurrency,
+        "concurrent_failures": failed,
+        "variant_rounds": rounds,
+    }, outcomes
+
+
+def bench_scoring(outcomes: Dict[str, tuple], repeat: int) -> Dict[str, Any]:
+    out: Dict[str, Any] = {}
+    for name, (ok, bench) in outcomes.items():
+        answer = fenced(VARIANTS[name])
+        out[name] = {
+            "evaluate_answer_ms": _time_ms(lambda: tf.evaluate_answer(answer, ok, bench, budget_ms=6.0), repeat),
+            "score": tf.evaluate_answer(answer, ok, bench, budget_ms=6.0),
+        }
+    return out
+
+
+def _search(specs: List[tf.ActionSpec], iterations: int, trace_memory: bool) -> Dict[str, Any]:
+    usage: Dict[str, int] = {}
+    algo = tq.ABMCTSA()
+
+    gc.collect()
+    if trace_memory:
+        tracemalloc.start()
+        base = tracemalloc.get_traced_memory()[0]
+    tree = algo.init_tree()
+    bandit = tf.ActionBandit(specs, seed=0)
+    steps = []
+    for i in range(iterations):
+        t0 = time.perf_counter()
+        tree = algo.step(tree, tf.make_generate_fns(bandit, i, usage))
+        best, _ = tq.top_k(tree, algo, k=1, ranking_fn=tf._rank_by_node_score)[0]
+        steps.append((time.perf_counter() - t0) * 1e3)
+    out: Dict[str, Any] = {"best_score": best.score, "actions": usage}
+    if trace_memory:
+        gc.collect()
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        nodes = max(1, tree.tree.size - 1)  # the root carries no state
+        out.update(nodes=nodes, retained_bytes=current - base, peak_bytes=peak - base,
+                   bytes_per_node=(current - base) / nodes)
+    else:
+        out.update(step_ms=_summary(steps), total_ms=sum(steps))
+    return out
+
+
+def bench_mcts(sb: tf.SandboxClient, iteration_counts: List[int]) -> Dict[str, Any]:
+    # one agent graph for every search, as in mcts_node, warmed by a throwaway
+    # step so first-call setup is not billed to the first iteration count
+    console = Console(file=io.StringIO())
+    gate = tf.ReviewGate()
+    specs = tf.build_action_specs(sb, tf.build_agent_subgraph(sb, console, gate), gate)
+    _search(specs, 1, trace_memory=False)
+    out: Dict[str, Any] = {}
+    for k in iteration_counts:
+        timed = _search(specs, k, trace_memory=False)
+        # a second, traced pass so tracemalloc overhead stays out of the latencies
+        traced = _search(specs, k, trace_memory=True)
+        out[str(k)] = {
+            "step_ms": timed["step_ms"],
+            "total_ms": timed["total_ms"],
+            "best_score": timed["best_score"],
+            "actions": timed["actions"],
+            "memory": {key: traced[key] for key in ("nodes", "retained_bytes", "peak_bytes", "bytes_per_node")},
+        }
+    return out
+
+
+def _git_revision() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=HERE, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _flatten(data: Any, prefix: str = "") -> Dict[str, float]:
+    flat: Dict[str, float] = {}
+    if isinstance(data, dict):
+        for key, value in data.items():
+            flat.update(_flatten(value, f"{prefix}{key}."))
+    elif isinstance(data, (int, float)) and not isinstance(data, bool):
+        flat[prefix[:-1]] = float(data)
+    return flat
+
+
+def compare(baseline: Dict[str, Any], current: Dict[str, Any], threshold: float) -> List[str]:
+    """Lines for medians and rates that moved by more than `threshold` (fractional)."""
+    old, new = _flatten(baseline["results"]), _flatten(current["results"])
+    lines = []
+    for key in sorted(old.keys() & new.keys()):
+        if not key.endswith((".p50", "_per_s", "bytes_per_node")) or old[key] == 0:
+            continue
+        change = (new[key] - old[key]) / old[key]
+        if abs(change) >= threshold:
+            worse = change < 0 if key.endswith("_per_s") else change > 0
+            lines.append(f"{'REGRESSION' if worse else 'improved  '} {key}: {old[key]:.4g} -> {new[key]:.4g} ({change:+.0%})")
+    return lines
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--backend", default="native", choices=tf.SANDBOX_BACKENDS)
+    parser.add_argument("--iterations", default="1,4,8", help="comma-separated MCTS iteration counts")
+    parser.add_argument("--evals", type=int, default=200, help="evals per throughput run")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--repeat", type=int, default=200, help="repeats for payload and scoring timings")
+    parser.add_argument("--llm-latency-ms", type=float, default=0.0, help="simulated model latency per call")
+    parser.add_argument("--out", help="result file (default benchmarks/results/<time>-<rev>.json)")
+    parser.add_argument("--baseline", help="earlier result file to compare against")
+    parser.add_argument("--threshold", type=float, default=0.10, help="relative change reported by --baseline")
+    args = parser.parse_args()
+
+    stubs = install(tf, latency_s=args.llm_latency_ms / 1e3)
+    iteration_counts = [int(k) for k in args.iterations.split(",") if k.strip()]
+
+    results: Dict[str, Any] = {"payload_build": bench_payload_build(args.repeat)}
+    sb = tf.SandboxClient(dependencies=["numpy"], backend=args.backend)
+    sb.start()
+    try:
+        results["sandbox"], outcomes = bench_sandbox(sb, args.evals, args.concurrency)
+        results["scoring"] = bench_scoring(outcomes, args.repeat)
+        results["mcts"] = bench_mcts(sb, iteration_counts)
+    finally:
+        sb.close()
+
+    revision = _git_revision()
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "revision": revision,
+            "backend": args.backend,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "args": vars(args),
+            "llm_calls": {name: stub.calls for name, stub in stubs.items()},
+        },
+        "results": results,
+    }
+
+    out = Path(args.out) if args.out else HERE / "results" / f"{time.strftime('%Y%m%d-%H%M%S')}-{revision or 'local'}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(report, indent=2, default=str))
+    print(f"wrote {out}")
+
+    sandbox = results["sandbox"]
+    print(f"sandbox eval p50={sandbox['eval_latency_ms']['p50']:.3f}ms "
+          f"serial={sandbox['serial_evals_per_s']:.0f}/s concurrent={sandbox['concurrent_evals_per_s']:.0f}/s")
+    for k, row in results["mcts"].items():
+        print(f"mcts iterations={k} step p50={row['step_ms']['p50']:.1f}ms "
+              f"bytes/node={row['memory']['bytes_per_node']:.0f}")
+
+    if args.baseline:
+        lines = compare(json.loads(Path(args.baseline).read_text()), report, args.threshold)
+        print("\n".join(lines) if lines else f"no change beyond {args.threshold:.0%} against {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""Offline stand-ins for the ChatOpenAI clients in treesearch_fib.
+
+StubLLM answers every prompt with the next canned Fibonacci variant, so the
+search exercises the same test/bench/score paths as a real run without a
+network or API key. install() swaps them into the treesearch_fib module.
+"""
+from __future__ import annotations
+
+import hashlib
+import itertools
+import threading
+import time
+from typing import Any, Sequence
+
+from langchain_core.messages import AIMessage
+
+VARIANTS: dict[str, str] = {
+    "list": (
+        "def fibonacci(n):\n"
+        "    seq = [0, 1]\n"
+        "    while len(seq) < n:\n"
+        "        seq.append(seq[-1] + seq[-2])\n"
+        "    return seq[:n]\n"
+    ),
+    "generator": (
+        "def fib(n):\n"
+        "    a, b = 0, 1\n"
+        "    for _ in range(n):\n"
+        "        yield a\n"
+        "        a, b = b, a + b\n"
+    ),
+    "memo": (
+        "from functools import lru_cache\n\n"
+        "@lru_cache(maxsize=None)\n"
+        "def _nth(k):\n"
+        "    return k if k < 2 else _nth(k - 1) + _nth(k - 2)\n\n"
+        "def fib(n):\n"
+        "    return [_nth(i) for i in range(n)]\n"
+    ),
+    "fast_doubling": (
+        "def fib(n: int) -> int:\n"
+        "    \"\"\"Return the n-th Fibonacci number by fast doubling.\"\"\"\n"
+        "    def _pair(k):\n"
+        "        if k == 0:\n"
+        "            return 0, 1\n"
+        "        a, b = _pair(k >> 1)\n"
+        "        c = a * (2 * b - a)\n"
+        "        d = a * a + b * b\n"
+        "        return (d, c + d) if k & 1 else (c, d)\n"
+        "    return _pair(n)[0]\n"
+    ),
+    "off_by_one": (
+        "def fibonacci(n):\n"
+        "    seq = [1, 1]\n"
+        "    while len(seq) < n:\n"
+        "        seq.append(seq[-1] + seq[-2])\n"
+        "    return seq[:n]\n"
+    ),
+}
+
+
+def fenced(code: str) -> str:
+    return f"```python\n{code}```"
+
+
+class StubLLM:
+    """Round-robins over VARIANTS; `latency_s` simulates model round-trip time."""
+
+    def __init__(self, variants: Sequence[str] | None = None, latency_s: float = 0.0):
+        names = list(variants or VARIANTS)
+        self._answers = itertools.cycle([fenced(VARIANTS[name]) for name in names])
+        self._lock = threading.Lock()
+        self.latency_s = latency_s
+        self.calls = 0
+
+    def invoke(self, messages: Sequence[Any], **_: Any) -> AIMessage:
+        if self.latency_s:
+            time.sleep(self.latency_s)
+        with self._lock:
+            self.calls += 1
+            answer = next(self._answers)
+        prompt_tokens = sum(len(str(getattr(m, "content", m))) for m in messages) // 4
+        out_tokens = len(answer) // 4
+        return AIMessage(content=answer, usage_metadata={
+            "input_tokens": prompt_tokens,
+            "output_tokens": out_tokens,
+            "total_tokens": prompt_tokens + out_tokens,
+        })
+
+    def with_structured_output(self, schema: type) -> "_StubStructured":
+        return _StubStructured(self, schema)
+
+
+class _StubStructured:
+    # deterministic judge: the score depends only on the prompt text
+    def __init__(self, parent: StubLLM, schema: type):
+        self._parent = parent
+        self._schema = schema
+
+    def invoke(self, messages: Sequence[Any], **_: Any) -> Any:
+        if self._parent.latency_s:
+            time.sleep(self._parent.latency_s)
+        with self._parent._lock:
+            self._parent.calls += 1
+        text = "".join(str(getattr(m, "content", m)) for m in messages)
+        digest = hashlib.sha1(text.encode()).digest()
+        return self._schema(score=0.5 + digest[0] / 510)
+
+
+def install(module: Any, latency_s: float = 0.0) -> dict[str, StubLLM]:
+    """Replace llm, review_llm and judge on `module` (treesearch_fib) with stubs."""
+    stubs = {
+        "llm": StubLLM(latency_s=latency_s),
+        "review_llm": StubLLM(latency_s=latency_s),
+        "judge": StubLLM(latency_s=latency_s),
+    }
+    for name, stub in stubs.items():
+        setattr(module, name, stub)
+    return stubs
@@ -0,0 +1,323 @@
+# code_analysis.py
+"""
+Static facts about a candidate answer, parsed once.
+
+`analyze` walks the AST and the token stream of a code block a single time and
+returns a frozen `CodeFacts`; results are cached by a hash of the source, so the
+scorer, the prompts and the pre-screen all share one parse per candidate.
+`extract_python_block` is cached the same way on the raw LLM answer.
+
+`prescreen` rejects code that cannot pass in the sandbox (does not compile, no
+entry point the harness looks up, uncached double recursion on n-1/n-2) with a
+`ScreenFailure` that the refine prompt shows verbatim.
+"""
+import ast
+import hashlib
+import io
+import re
+import tokenize
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, Optional, Tuple
+
+ENTRY_NAMES = ("fib", "fibonacci", "Fibonacci", "fib_seq")  # what the harness calls, in order
+FALLBACK_NAMES = ("result", "seq")  # module-level lists the harness accepts without a function
+MEMO_DECORATORS = ("lru_cache", "cache", "memoize", "memoized")
+
+_FENCES = (
+    re.compile(r"```python\s*(.*?)```", re.DOTALL | re.IGNORECASE),
+    re.compile(r"```py\s*(.*?)```", re.DOTALL | re.IGNORECASE),
+    re.compile(r"```\s*(.*?)```", re.DOTALL | re.IGNORECASE),
+)
+_EXAMPLE_COMMENT = re.compile(r"#\s*example", re.IGNORECASE)
+
+
+@lru_cache(maxsize=4096)
+def extract_python_block(text: str) -> Optional[str]:
+    for pat in _FENCES:
+        m = pat.search(text)
+        if m:
+            return m.group(1).strip()
+    lines = [ln for ln in text.splitlines() if not ln.strip().startswith(("```", "# Q:", "# A:"))]
+    code = "\n".join(lines).strip()
+    return code or None
+
+
+@dataclass(frozen=True)
+class FunctionFacts:
+    name: str
+    args: int
+    returns_annotated: bool
+    docstring: bool
+    has_yield: bool
+    has_loop: bool
+    self_calls: int  # call sites of its own name inside the body
+    decrement_calls: int  # self calls whose argument is `x - <constant>`
+    memoized: bool  # decorated with lru_cache/cache/memoize
+    caches: bool  # memoized, or tests membership / stores into a subscript (hand-rolled memo)
+
+
+@dataclass(frozen=True)
+class CodeFacts:
+    syntax_ok: bool
+    error: str = ""  # "SyntaxError: ... (line n)" when it does not compile
+    functions: Tuple[FunctionFacts, ...] = ()
+    entry: Optional[str] = None  # first of ENTRY_NAMES defined at top level
+    bound_names: Tuple[str, ...] = ()  # names bound at module level (def, class, assignment, import)
+    has_yield: bool = False
+    has_loop: bool = False
+    docstring: bool = False  # a module or function docstring of 10+ characters
+    imports: Tuple[str, ...] = ()
+    nonblank_lines: int = 0
+    comment_lines: int = 0  # lines holding only a comment
+    example_comment: bool = False
+
+    def function(self, name: Optional[str]) -> Optional[FunctionFacts]:
+        return next((f for f in self.functions if f.name == name), None)
+
+    @property
+    def entry_facts(self) -> Optional[FunctionFacts]:
+        return self.function(self.entry)
+
+    @property
+    def recursive(self) -> bool:
+        return any(f.self_calls for f in self.functions)
+
+    @property
+    def memoized(self) -> bool:
+        return any(f.memoized for f in self.functions)
+
+    def summary(self) -> str:
+        """One line for prompts, e.g. "entry fib(1); generator; loop; docstring"."""
+        if not self.syntax_ok:
+            return f"does not compile ({self.error})"
+        parts = []
+        ef = self.entry_facts
+        parts.append(f"entry {ef.name}({ef.args})" if ef else "no fib/fibonacci entry point")
+        if self.has_yield:
+            parts.append("generator")
+        if self.has_loop:
+            parts.append("loop")
+        for f in self.functions:
+            if f.self_calls:
+                kind = "memoized" if f.memoized else ("branching" if f.self_calls > 1 else "linear")
+                parts.append(f"{kind} recursion in {f.name}")
+        if self.docstring:
+            parts.append("docstring")
+        if self.comment_lines:
+            parts.append(f"{self.comment_lines} comment line(s)")
+        return "; ".join(parts)
+
+
+def code_hash(src: str) -> str:
+    return hashlib.sha256(src.encode()).hexdigest()
+
+
+class _StripDocsAndHints(ast.NodeTransformer):
+    # drops docstrings and annotations, which never change what the code computes
+    def _strip_doc(self, node):
+        body = node.body
+        if body and isinstance(body[0], ast.Expr) and isinstance(body[0].value, ast.Constant) \
+                and isinstance(body[0].value.value, str):
+            node.body = body[1:] or [ast.Pass()]
+        return node
+
+    def visit_Module(self, node):
+        return self._strip_doc(self.generic_visit(node))
+
+    def visit_ClassDef(self, node):
+        return self._strip_doc(self.generic_visit(node))
+
+    def visit_FunctionDef(self, node):
+        node.returns = None
+        return self._strip_doc(self.generic_visit(node))
+
+    visit_AsyncFunctionDef = visit_FunctionDef
+
+    def visit_arg(self, node):
+        node.annotation = None
+        return node
+
+    def visit_AnnAssign(self, node):
+        if node.value is None:
+            return None
+        return ast.Assign(targets=[node.target], value=node.value, lineno=node.lineno)
+
+
+def logic_hash(src: str) -> Optional[str]:
+    """
+    Hash of `src` with docstrings, annotations and comments removed, so two
+    versions match when only documentation or typing changed. None if it does not parse.
+    """
+    try:
+        tree = _StripDocsAndHints().visit(ast.parse(src))
+    except SyntaxError:
+        return None
+    return code_hash(ast.dump(tree, annotate_fields=False))
+
+
+def _decorator_name(node: ast.expr) -> str:
+    if isinstance(node, ast.Call):
+        node = node.func
+    if isinstance(node, ast.Attribute):
+        return node.attr
+    if isinstance(node, ast.Name):
+        return node.id
+    return ""
+
+
+def _is_decrement(node: ast.expr) -> bool:
+    return (isinstance(node, ast.BinOp) and isinstance(node.op, ast.Sub)
+            and isinstance(node.right, ast.Constant) and isinstance(node.right.value, int))
+
+
+def _function_facts(fn: ast.FunctionDef | ast.AsyncFunctionDef) -> FunctionFacts:
+    has_yield = has_loop = hand_memo = False
+    self_calls = decrement_calls = 0
+    for node in ast.walk(fn):
+        if isinstance(node, (ast.Yield, ast.YieldFrom)):
+            has_yield = True
+        elif isinstance(node, (ast.For, ast.While, ast.AsyncFor, ast.comprehension)):
+            has_loop = True
+        elif isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id == fn.name:
+            self_calls += 1
+            if node.args and _is_decrement(node.args[0]):
+                decrement_calls += 1
+        elif isinstance(node, ast.Compare) and any(
+            isinstance(op, (ast.In, ast.NotIn)) and not isinstance(c, (ast.Tuple, ast.List, ast.Set, ast.Constant))
+            for op, c in zip(node.ops, node.comparators)
+        ):
+            hand_memo = True  # `n in memo`, not `n in (0, 1)`
+        elif isinstance(node, ast.Subscript) and isinstance(node.ctx, ast.Store):
+            hand_memo = True
+    doc = ast.get_docstring(fn) or ""
+    memoized = any(_decorator_name(d) in MEMO_DECORATORS for d in fn.decorator_list)
+    return FunctionFacts(
+        name=fn.name,
+        args=len(fn.args.posonlyargs) + len(fn.args.args),
+        returns_annotated=fn.returns is not None,
+        docstring=len(doc) >= 10,
+        has_yield=has_yield,
+        has_loop=has_loop,
+        self_calls=self_calls,
+        decrement_calls=decrement_calls,
+        memoized=memoized,
+        caches=memoized or hand_memo,
+    )
+
+
+def _token_summary(src: str) -> Tuple[int, bool]:
+    # -> (comment-only lines, "# example" comment present); tolerant of broken code
+    comment_lines, example = 0, False
+    code_rows: set = set()
+    comment_rows: set = set()
+    try:
+        for tok in tokenize.generate_tokens(io.StringIO(src).readline):
+            if tok.type == tokenize.COMMENT:
+                comment_rows.add(tok.start[0])
+                example = example or bool(_EXAMPLE_COMMENT.search(tok.string))
+            elif tok.type not in (tokenize.NL, tokenize.NEWLINE, tokenize.INDENT, tokenize.DEDENT,
+                                  tokenize.ENDMARKER):
+                code_rows.update(range(tok.start[0], tok.end[0] + 1))
+    except (tokenize.TokenError, IndentationError, SyntaxError):
+        pass
+    comment_lines = len(comment_rows - code_rows)
+    return comment_lines, example
+
+
+def _analyze(src: str) -> CodeFacts:
+    nonblank = sum(1 for ln in src.splitlines() if ln.strip())
+    comment_lines, example = _token_summary(src)
+    try:
+        tree = ast.parse(src)
+    except SyntaxError as e:
+        return CodeFacts(syntax_ok=False, error=f"SyntaxError: {e.msg} (line {e.lineno})",
+                         nonblank_lines=nonblank, comment_lines=comment_lines, example_comment=example)
+
+    functions: Dict[str, FunctionFacts] = {}
+    imports = []
+    for node in ast.walk(tree):
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            functions.setdefault(node.name, _function_facts(node))
+        elif isinstance(node, ast.Import):
+            imports.extend(a.name for a in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.module:
+            imports.append(node.module)
+    top_level = {n.name for n in tree.body if isinstance(n, (ast.FunctionDef, ast.AsyncFunctionDef))}
+    entry = next((name for name in ENTRY_NAMES if name in top_level), None)
+    bound = set(top_level)
+    for node in tree.body:
+        if isinstance(node, ast.ClassDef):
+            bound.add(node.name)
+        elif isinstance(node, (ast.Import, ast.ImportFrom)):
+            bound.update((a.asname or a.name).split(".")[0] for a in node.names)
+        elif isinstance(node, (ast.Assign, ast.AnnAssign, ast.AugAssign, ast.For, ast.With, ast.If, ast.Try)):
+            # bindings nested in module-level control flow still land in the module namespace
+            for sub in ast.walk(node):
+                if isinstance(sub, ast.Name) and isinstance(sub.ctx, ast.Store):
+                    bound.add(sub.id)
+                elif isinstance(sub, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+                    bound.add(sub.name)
+    module_doc = len(ast.get_docstring(tree) or "") >= 10
+    facts = tuple(functions.values())
+    return CodeFacts(
+        syntax_ok=True,
+        functions=facts,
+        entry=entry,
+        bound_names=tuple(sorted(bound)),
+        has_yield=any(f.has_yield for f in facts),
+        has_loop=any(f.has_loop for f in facts) or any(
+            isinstance(n, (ast.For, ast.While)) for n in tree.body),
+        docstring=module_doc or any(f.docstring for f in facts),
+        imports=tuple(imports),
+        nonblank_lines=nonblank,
+        comment_lines=comment_lines,
+        example_comment=example,
+    )
+
+
+_CACHE: Dict[str, CodeFacts] = {}
+_CACHE_MAX = 4096
+
+
+def analyze(src: str) -> CodeFacts:
+    """Facts for `src`, cached by its sha256 (one parse per distinct candidate)."""
+    key = code_hash(src)
+    facts = _CACHE.get(key)
+    if facts is None:
+        if len(_CACHE) >= _CACHE_MAX:
+            _CACHE.pop(next(iter(_CACHE)))
+        facts = _CACHE[key] = _analyze(src)
+    return facts
+
+
+@dataclass(frozen=True)
+class ScreenFailure:
+    kind: str  # "syntax" | "no_entry" | "exponential_recursion"
+    message: str
+    hint: str
+
+    @property
+    def note(self) -> str:
+        return f"prescreen {self.kind}: {self.message}"
+
+
+def prescreen(src: str) -> Optional[ScreenFailure]:
+    """None when `src` is worth a sandbox run, else why it is not."""
+    facts = analyze(src)
+    if not facts.syntax_ok:
+        return ScreenFailure("syntax", facts.error, "Return code that compiles.")
+    if not set(facts.bound_names) & set(ENTRY_NAMES + FALLBACK_NAMES):
+        return ScreenFailure(
+            "no_entry",
+            "no top-level fib, fibonacci, Fibonacci or fib_seq is defined",
+            "Define a top-level function named fib or fibonacci.",
+        )
+    for f in facts.functions:
+        if f.decrement_calls >= 2 and not f.caches:
+            return ScreenFailure(
+                "exponential_recursion",
+                f"{f.name} calls itself {f.decrement_calls} times on n-minus-constant without caching (exponential time)",
+                "Use a loop, a generator, memoization or fast doubling.",
+            )
+    return None
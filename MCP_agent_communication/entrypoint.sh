@@ -4,6 +4,8 @@ set -euo pipefail
 MODE="${1:-streamable-http}"
 PORT="${PORT:-3333}"
 DEPS="${DEPS:-}"   # e.g. "numpy,pandas"
+PREWARM_DIR="${MCP_PREWARM_DIR:-}"   # cache built by sandbox_prewarm.py warm
+WORKERS="${WORKERS:-1}"   # >1: N runtimes behind one endpoint (streamable-http only)
 
 # Build args for mcp-run-python
 ARGS=()
@@ -11,6 +13,20 @@ if [ -n "${DEPS}" ]; then
   ARGS+=(--deps "${DEPS}")
 fi
 
+# Several Deno/Pyodide workers behind one MCP endpoint; the router uses the cache itself when it verifies
+if [ "$MODE" = "streamable-http" ] && [ "${WORKERS}" -gt 1 ]; then
+  exec python /usr/local/bin/sandbox_router.py --workers "${WORKERS}" --port "${PORT}" --deps "${DEPS}" \
+    ${PREWARM_DIR:+--cache-dir "${PREWARM_DIR}"}
+fi
+
+# Serve from the prewarmed cache (no network needed) when it verifies for DEPS
+if [ -n "${PREWARM_DIR}" ] && [ "$MODE" != "example" ]; then
+  if VERIFY_OUT="$(python /usr/local/bin/sandbox_prewarm.py --cache-dir "${PREWARM_DIR}" --deps "${DEPS}" verify 2>&1)"; then
+    exec python /usr/local/bin/sandbox_prewarm.py --cache-dir "${PREWARM_DIR}" --deps "${DEPS}" serve "$MODE" --port "${PORT}"
+  fi
+  echo "prewarm cache ${PREWARM_DIR} does not verify for DEPS='${DEPS}', falling back to mcp_run_python (needs network): ${VERIFY_OUT//$'\n'/; }" >&2
+fi
+
 if [ "$MODE" = "stdio" ]; then
   exec python -m mcp_run_python stdio "${ARGS[@]}"
 elif [ "$MODE" = "streamable-http" ]; then
@@ -0,0 +1,253 @@
+# mcp_http_client.py
+"""
+Client for a long-lived `mcp-run-python streamable-http` server
+(`entrypoint.sh streamable-http`, port 3333 by default).
+
+One container then backs many workers: `HttpSandbox` keeps a small pool of
+MCP sessions open, pings them to keep them alive, multiplexes concurrent
+`run_python_code` calls over them (MCP requests carry ids, so one session can
+have several calls in flight), and reconnects a session in the background when
+its transport fails. `eval()` returns the same dict shape as `code_sandbox`, so
+it drops in wherever a sandbox is expected (SandboxClient, sandbox_bridge).
+"""
+import asyncio
+import json
+import os
+import re
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, List, Optional
+from urllib.parse import urlsplit
+
+from mcp import ClientSession
+
+try:
+    from mcp.client.streamable_http import streamablehttp_client as _http_transport
+    from mcp.shared.exceptions import McpError
+except ImportError:  # mcp >= 2 renamed both
+    from mcp.client.streamable_http import streamable_http_client as _http_transport
+    from mcp.shared.exceptions import MCPError as McpError
+
+DEFAULT_URL = "http://localhost:3333"
+TOOL = "run_python_code"
+
+
+def mcp_endpoint(url: Optional[str] = None) -> str:
+    """Server URL from the argument or MCP_SERVER_URL, with the `/mcp` path the server listens on."""
+    url = (url or os.getenv("MCP_SERVER_URL") or DEFAULT_URL).rstrip("/")
+    return url if urlsplit(url).path else url + "/mcp"
+
+def parse_tool_text(text: str) -> Dict[str, Any]:
+    """
+    The HTTP server answers in mcp-run-python's default XML return mode
+    (`<status>`, `<output>`, `<return_value>`, `<error>`); the stdio sandbox in JSON.
+    Both become {status, output, return_value | error}.
+    """
+    if text.lstrip().startswith("{"):
+        return json.loads(text)
+
+    def _tag(name: str) -> Optional[str]:
+        m = re.search(rf"<{name}>\n?(.*?)\n?</{name}>", text, re.DOTALL)
+        return m.group(1).replace("&lt;", "<").replace("&gt;", ">") if m else None
+
+    status = _tag("status") or "run-error"
+    out: Dict[str, Any] = {"status": status, "output": (_tag("output") or "").splitlines()}
+    if status == "success":
+        rv = _tag("return_value")
+        out["return_value"] = json.loads(rv) if rv else None
+    else:
+        out["error"] = _tag("error") or ""
+    return out
+
+
+class _PooledSession:
+    """
+    One MCP session owned by a supervisor task. The task opens the transport,
+    pings every `keepalive_s`, and reopens it with backoff when the transport
+    or a ping fails. The transport is opened and closed in that same task,
+    which anyio's cancel scopes require.
+    """
+    def __init__(self, url: str, index: int, keepalive_s: float) -> None:
+        self.url = url
+        self.index = index
+        self.keepalive_s = keepalive_s
+        self.session: Optional[ClientSession] = None
+        self.in_flight = 0
+        self.calls = 0
+        self.errors = 0
+        self.reconnects = 0
+        self.last_error = ""
+        self._ready = asyncio.Event()
+        self._broken = asyncio.Event()
+        self._closing = False
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def _run(self) -> None:
+        backoff = 0.5
+        while not self._closing:
+            try:
+                async with _http_transport(self.url) as streams:
+                    async with ClientSession(streams[0], streams[1]) as session:
+                        await session.initialize()
+                        self.session = session
+                        self._broken.clear()
+                        self._ready.set()
+                        backoff = 0.5
+                        while not self._closing and not self._broken.is_set():
+                            try:
+                                await asyncio.wait_for(self._broken.wait(), timeout=self.keepalive_s)
+                            except asyncio.TimeoutError:
+                                await asyncio.wait_for(session.send_ping(), timeout=self.keepalive_s)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.last_error = repr(e)
+            finally:
+                self._ready.clear()
+                self.session = None
+            if self._closing:
+                break
+            self.reconnects += 1
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, 10.0)
+
+    @property
+    def ready(self) -> bool:
+        return self._ready.is_set()
+
+    async def wait_ready(self, timeout: float) -> None:
+        if not self._ready.is_set():
+            await asyncio.wait_for(self._ready.wait(), timeout=timeout)
+
+    async def call_tool(self, name: str, args: Dict[str, Any], timeout: float, connect_timeout: float):
+        # counted before the first await so concurrent callers spread across sessions
+        self.in_flight += 1
+        try:
+            for attempt in range(2):
+                await self.wait_ready(connect_timeout)
+                session = self.session
+                self.calls += 1
+                try:
+                    return await asyncio.wait_for(session.call_tool(name, args), timeout=timeout)
+                except (asyncio.TimeoutError, McpError):
+                    # slow code or a tool-level error; the session itself is fine
+                    self.errors += 1
+                    raise
+                except Exception as e:
+                    # transport failure: reconnect in the background and retry once.
+                    # Drop the dead session now (the supervisor has not run yet), so
+                    # the retry waits in wait_ready() for the fresh one.
+                    self.errors += 1
+                    self.last_error = repr(e)
+                    if self.session is session:
+                        self._ready.clear()
+                        self.session = None
+                    self._broken.set()
+                    if attempt:
+                        raise
+        finally:
+            self.in_flight -= 1
+
+    async def close(self) -> None:
+        self._closing = True
+        self._broken.set()
+        if self._task is not None:
+            try:
+                await asyncio.wait_for(self._task, timeout=5)
+            except (asyncio.TimeoutError, asyncio.CancelledError):
+                self._task.cancel()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "index": self.index,
+            "ready": self.ready,
+            "in_flight": self.in_flight,
+            "calls": self.calls,
+            "errors": self.errors,
+            "reconnects": self.reconnects,
+            "last_error": self.last_error,
+        }
+
+
+class HttpSandbox:
+    """
+    Pool of `sessions` MCP sessions to one streamable-HTTP server.
+    Calls go to the ready session with the fewest calls in flight;
+    at most `sessions * max_in_flight` calls run at once, the rest wait.
+    """
+    def __init__(
+        self,
+        url: Optional[str] = None,
+        sessions: int = 2,
+        max_in_flight: int = 4,
+        keepalive_s: float = 20.0,
+        connect_timeout: float = 30.0,
+    ) -> None:
+        self.url = mcp_endpoint(url)
+        self.connect_timeout = connect_timeout
+        self._sessions = [_PooledSession(self.url, i, keepalive_s) for i in range(max(1, sessions))]
+        self._slots = asyncio.Semaphore(len(self._sessions) * max(1, max_in_flight))
+
+    async def start(self) -> None:
+        for s in self._sessions:
+            s.start()
+        # one live session is enough to start serving; the rest join when ready
+        done, pending = await asyncio.wait(
+            [asyncio.create_task(s.wait_ready(self.connect_timeout)) for s in self._sessions],
+            return_when=asyncio.FIRST_COMPLETED,
+        )
+        for t in pending:
+            t.cancel()
+        if not any(s.ready for s in self._sessions):
+            await self.close()
+            errors = "; ".join(s.last_error for s in self._sessions if s.last_error)
+            raise ConnectionError(f"could not reach MCP server at {self.url}: {errors or 'timeout'}")
+
+    async def close(self) -> None:
+        await asyncio.gather(*[s.close() for s in self._sessions])
+
+    @property
+    def ready(self) -> bool:
+        return any(s.ready for s in self._sessions)
+
+    def _pick(self) -> _PooledSession:
+        ready = [s for s in self._sessions if s.ready] or self._sessions
+        return min(ready, key=lambda s: s.in_flight)
+
+    async def call_tool(self, name: str, args: Dict[str, Any], timeout: float = 30.0):
+        async with self._slots:
+            return await self._pick().call_tool(name, args, timeout, self.connect_timeout)
+
+    async def eval(self, code: str, globals: Optional[Dict[str, Any]] = None, timeout: float = 30.0) -> Dict[str, Any]:
+        """Run code on the server; same contract as `CodeSandbox.eval`."""
+        args: Dict[str, Any] = {"python_code": code}
+        if globals:
+            args["global_variables"] = globals
+        result = await self.call_tool(TOOL, args, timeout=timeout)
+        block = result.content[0]
+        if block.type != "text":
+            raise ValueError(f"Unexpected content type: {block.type}")
+        return parse_tool_text(block.text)
+
+    def stats(self) -> List[Dict[str, Any]]:
+        return [s.stats() for s in self._sessions]
+
+
+@asynccontextmanager
+async def http_sandbox(url: Optional[str] = None, sessions: int = 2, **kwargs) -> AsyncIterator[HttpSandbox]:
+    """
+    `async with http_sandbox() as sb: await sb.eval(code)`, the HTTP counterpart of `code_sandbox`.
+    """
+    sb = HttpSandbox(url, sessions=sessions, **kwargs)
+    await sb.start()
+    try:
+        yield sb
+    finally:
+        await sb.close()
+
+def agent_toolset(url: Optional[str] = None):
+    """pydantic-ai toolset for the same server, so agents reuse it instead of spawning a container."""
+    from pydantic_ai.mcp import MCPServerStreamableHTTP
+    return MCPServerStreamableHTTP(mcp_endpoint(url))
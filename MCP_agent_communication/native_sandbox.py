@@ -0,0 +1,625 @@
+# native_sandbox.py
+"""
+CPython execution backend for trusted, in-house code.
+
+Pyodide timings are slower than CPython and scale differently, so benchmarks
+run there do not match production. Both executors here run the same payloads on
+CPython and return the same result dict as `code_sandbox`:
+{status, output, stdout, stderr, return_value | error}.
+
+- `ZygoteSandbox` (SandboxClient backend "native"): a zygote imports the harness
+  modules once and forks a fresh child per evaluation.
+- `NativeSandbox` (backend "native-pool"): a pool of long-lived worker processes.
+
+Isolation is process-level only (no seccomp, no filesystem or network
+sandbox). Processes are bare `python -c` interpreters that import only this
+module (not the caller's `__main__`); every evaluation runs under rlimits on
+address space, CPU seconds, file size and core dumps, and a process that times
+out or crashes is replaced. Use Pyodide for untrusted LLM output.
+"""
+import ast
+import asyncio
+import contextlib
+import gc
+import importlib
+import importlib.util
+import io
+import itertools
+import json
+import marshal
+import os
+import queue
+import re
+import resource
+import selectors
+import signal
+import socket
+import struct
+import subprocess
+import sys
+import threading
+import time
+import traceback
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+from multiprocessing.connection import Connection
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+def _apply_limits(mem_mb: Optional[int], cpu_s: Optional[int], fsize_mb: int) -> None:
+    if mem_mb:
+        nbytes = mem_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (nbytes, nbytes))
+    if cpu_s:
+        # soft limit is re-armed before each task by _arm_cpu
+        resource.setrlimit(resource.RLIMIT_CPU, (cpu_s, resource.RLIM_INFINITY))
+    resource.setrlimit(resource.RLIMIT_FSIZE, (fsize_mb * 1024 * 1024,) * 2)
+    resource.setrlimit(resource.RLIMIT_CORE, (0, 0))
+
+def _arm_cpu(cpu_s: Optional[int]) -> None:
+    if not cpu_s:
+        return
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    used = int(usage.ru_utime + usage.ru_stime) + 1
+    resource.setrlimit(resource.RLIMIT_CPU, (used + cpu_s, resource.RLIM_INFINITY))
+
+_FLAGS = ast.PyCF_ALLOW_TOP_LEVEL_AWAIT
+
+def _package_name(requirement: str) -> str:
+    return re.split(r"[<>=!~\[ ]", requirement, maxsplit=1)[0].strip()
+
+def _jsonable(value: Any) -> Any:
+    # Pyodide hands results back as JSON; match that (tuples -> lists, repr for the rest)
+    return json.loads(json.dumps(value, default=repr))
+
+def _compile(code: str) -> Tuple[Any, Any]:
+    """Compile `code` like mcp-run-python: a trailing expression is compiled separately as the return value."""
+    tree = ast.parse(code, "main.py")
+    last = None
+    if tree.body and isinstance(tree.body[-1], ast.Expr):
+        last = compile(ast.Expression(tree.body.pop().value), "main.py", "eval", flags=_FLAGS)
+    return compile(tree, "main.py", "exec", flags=_FLAGS), last
+
+def _execute(program: Tuple[Any, Any], global_vars: Dict[str, Any]) -> Dict[str, Any]:
+    body, last = program
+    out, err = io.StringIO(), io.StringIO()
+    ns: Dict[str, Any] = {"__name__": "__main__", **global_vars}
+    try:
+        with contextlib.redirect_stdout(out), contextlib.redirect_stderr(err):
+            # only code with top-level await evaluates to a coroutine and needs an event loop
+            rv = eval(body, ns)
+            if asyncio.iscoroutine(rv):
+                asyncio.run(rv)
+            rv = eval(last, ns) if last is not None else None
+            if asyncio.iscoroutine(rv):
+                rv = asyncio.run(rv)
+        return {
+            "status": "success",
+            "output": out.getvalue().splitlines(),
+            "stdout": out.getvalue(),
+            "stderr": err.getvalue(),
+            "return_value": _jsonable(rv),
+        }
+    except BaseException:
+        return {
+            "status": "run-error",
+            "output": out.getvalue().splitlines(),
+            "stdout": out.getvalue(),
+            "stderr": err.getvalue(),
+            "error": traceback.format_exc(limit=-4),
+        }
+
+def _run(code: str, global_vars: Dict[str, Any]) -> Dict[str, Any]:
+    try:
+        program = _compile(code)
+    except SyntaxError:
+        return {"status": "run-error", "output": [], "stdout": "", "stderr": "", "error": traceback.format_exc(limit=0)}
+    return _execute(program, global_vars)
+
+def _worker_main(fd: int, mem_mb: Optional[int], cpu_s: Optional[int], fsize_mb: int) -> None:
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    _apply_limits(mem_mb, cpu_s, fsize_mb)
+    conn = Connection(fd)
+    while True:
+        try:
+            msg = conn.recv()
+        except EOFError:
+            return
+        if msg is None:
+            return
+        code, global_vars = msg
+        _arm_cpu(cpu_s)
+        try:
+            conn.send(_run(code, global_vars))
+        except MemoryError:
+            conn.send({"status": "run-error", "output": [], "stdout": "", "stderr": "", "error": "MemoryError"})
+
+
+class _Worker:
+    def __init__(self, limits) -> None:
+        parent, child = socket.socketpair()
+        boot = (
+            f"import sys; sys.path.insert(0, {HERE!r}); "
+            f"import native_sandbox; native_sandbox._worker_main({child.fileno()}, *{tuple(limits)!r})"
+        )
+        self.proc = subprocess.Popen(
+            [sys.executable, "-c", boot],
+            pass_fds=(child.fileno(),),
+            stdin=subprocess.DEVNULL,
+            start_new_session=True,
+        )
+        child.close()
+        self.conn = Connection(parent.detach())
+        self.tasks = 0
+
+    def kill(self) -> None:
+        with contextlib.suppress(Exception):
+            self.conn.close()
+        if self.proc.poll() is None:
+            self.proc.kill()
+        with contextlib.suppress(subprocess.TimeoutExpired):
+            self.proc.wait(timeout=1)
+
+
+def _error(message: str) -> Dict[str, Any]:
+    return {"status": "error", "output": [], "stdout": "", "stderr": "", "return_value": None, "error": message}
+
+
+class NativeSandbox:
+    """
+    Pool of `workers` reusable CPython processes with the SandboxClient interface
+    (`start`, `eval(code, vars, timeout)`, `close`). `eval` is thread-safe and
+    blocks while all workers are busy.
+    """
+    def __init__(
+        self,
+        workers: int = 2,
+        dependencies: Sequence[str] = (),
+        log_handler=None,
+        mem_mb: Optional[int] = 1024,
+        cpu_s: Optional[int] = 30,
+        fsize_mb: int = 16,
+        max_tasks: int = 200,
+    ) -> None:
+        self.size = max(1, workers)
+        self.deps = list(dependencies)
+        self.log_handler = log_handler
+        self.limits = (mem_mb, cpu_s, fsize_mb)
+        self.max_tasks = max_tasks
+        self.restarts = 0
+        self._idle: "queue.Queue[_Worker]" = queue.Queue()
+        self._all: List[_Worker] = []
+        self._lock = threading.Lock()
+
+    def _log(self, level: str, message: str) -> None:
+        if self.log_handler is not None:
+            self.log_handler(level, message)
+
+    def _spawn(self) -> _Worker:
+        w = _Worker(self.limits)
+        with self._lock:
+            self._all.append(w)
+        return w
+
+    def _retire(self, w: _Worker) -> None:
+        w.kill()
+        with self._lock:
+            if w in self._all:
+                self._all.remove(w)
+
+    def start(self) -> None:
+        missing = [d for d in self.deps if importlib.util.find_spec(_package_name(d)) is None]
+        if missing:
+            self._log("warning", f"native backend: not installed on host: {', '.join(missing)}")
+        for _ in range(self.size):
+            self._idle.put(self._spawn())
+
+    def eval(self, code: str, vars: Optional[Dict[str, Any]] = None, timeout: float = 8.0) -> Dict[str, Any]:
+        w = self._idle.get()
+        replace = False
+        try:
+            w.conn.send((code, dict(vars or {})))
+            if not w.conn.poll(timeout):
+                replace = True
+                return _error("timeout")
+            try:
+                res = w.conn.recv()
+            except EOFError:
+                replace = True
+                # SIGXCPU from RLIMIT_CPU, SIGKILL from the OOM killer, or a hard crash
+                with contextlib.suppress(subprocess.TimeoutExpired):
+                    w.proc.wait(timeout=1)
+                return _error(f"worker died (exit code {w.proc.returncode})")
+            w.tasks += 1
+            replace = w.tasks >= self.max_tasks
+            return res
+        except (BrokenPipeError, OSError) as e:
+            replace = True
+            return _error(repr(e))
+        finally:
+            if replace:
+                self._retire(w)
+                self.restarts += 1
+                w = self._spawn()
+            self._idle.put(w)
+
+    def close(self) -> None:
+        with self._lock:
+            workers = list(self._all)
+        for w in workers:
+            with contextlib.suppress(Exception):
+                w.conn.send(None)
+            with contextlib.suppress(subprocess.TimeoutExpired):
+                w.proc.wait(timeout=1)
+            w.kill()
+        with self._lock:
+            self._all.clear()
+
+
+# --- pre-fork zygote ----------------------------------------------------------
+
+PRELOAD = ("json", "time", "tracemalloc", "numpy")
+_FRAME = struct.Struct("!I")
+_COMPILE_CACHE = 256
+
+def _send_frame(sock: socket.socket, obj: Any) -> None:
+    data = marshal.dumps(obj)
+    sock.sendall(_FRAME.pack(len(data)) + data)
+
+def _recv_exact(sock: socket.socket, n: int) -> bytes:
+    buf = bytearray()
+    while len(buf) < n:
+        chunk = sock.recv(n - len(buf))
+        if not chunk:
+            raise EOFError
+        buf += chunk
+    return bytes(buf)
+
+def _recv_frame(sock: socket.socket) -> Any:
+    (n,) = _FRAME.unpack(_recv_exact(sock, _FRAME.size))
+    return marshal.loads(_recv_exact(sock, n))
+
+def _vm_bytes() -> int:
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[0]) * resource.getpagesize()
+
+def _child_limits(mem_mb: Optional[int], cpu_s: Optional[int], fsize_mb: int) -> None:
+    # the child inherits the zygote's preloaded address space; the budget is on top of it
+    if mem_mb:
+        nbytes = _vm_bytes() + mem_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (nbytes, nbytes))
+    if cpu_s:
+        resource.setrlimit(resource.RLIMIT_CPU, (cpu_s, cpu_s + 1))
+    resource.setrlimit(resource.RLIMIT_FSIZE, (fsize_mb * 1024 * 1024,) * 2)
+    resource.setrlimit(resource.RLIMIT_CORE, (0, 0))
+
+
+def _read_exact_fd(fd: int, n: int) -> bytes:
+    buf = bytearray()
+    while len(buf) < n:
+        chunk = os.read(fd, n - len(buf))
+        if not chunk:
+            raise EOFError
+        buf += chunk
+    return bytes(buf)
+
+def _write_all_fd(fd: int, data: bytes) -> None:
+    view = memoryview(data)
+    while view:
+        view = view[os.write(fd, view):]
+
+
+@dataclass
+class _Spare:
+    pid: int
+    job_fd: int
+    result_fd: int
+
+
+@dataclass
+class _Child:
+    pid: int
+    req_id: int
+    fd: int
+    deadline: float
+    buf: bytearray = field(default_factory=bytearray)
+
+
+def _zygote_main(
+    fd: int,
+    preload: Sequence[str],
+    spares: int,
+    mem_mb: Optional[int],
+    cpu_s: Optional[int],
+    fsize_mb: int,
+) -> None:
+    """
+    Import `preload` once, then serve (req_id, code, vars, timeout) frames.
+    Code objects are compiled here (LRU-cached by source) and handed, marshalled,
+    to a child forked ahead of time that is blocked on its job pipe; the child's
+    marshalled result is relayed back as (req_id, result). Up to `spares` children
+    are kept forked. With more than one CPU, a spare's replacement is forked as
+    soon as the spare gets its job, overlapping the child's run; on one CPU spares
+    are refilled only while nothing is in flight. Every eval still costs one fork
+    plus the new child's warm-up (about 2 ms of CPU), so requests arriving faster
+    than that wait for fork(). Single-threaded, so fork is safe.
+    """
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    for mod in preload:
+        with contextlib.suppress(ImportError):
+            importlib.import_module(mod)
+    # keep the preloaded heap out of the collector so children do not copy its pages
+    gc.freeze()
+    sock = socket.socket(fileno=fd)
+    sel = selectors.DefaultSelector()
+    sel.register(sock, selectors.EVENT_READ, None)
+    programs: "OrderedDict[str, Tuple[Any, Any]]" = OrderedDict()
+    warmup = _compile("None")
+    idle: "deque[_Spare]" = deque()
+    children: Dict[int, _Child] = {}
+    # on one CPU a replacement's fork and warm-up would only slow the running child
+    overlap = len(os.sched_getaffinity(0)) > 1 if hasattr(os, "sched_getaffinity") else (os.cpu_count() or 1) > 1
+
+    def _prefork() -> _Spare:
+        job_r, job_w = os.pipe()
+        res_r, res_w = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            try:
+                sock.close()
+                for fd_ in (job_w, res_r, *(x for sp in idle for x in (sp.job_fd, sp.result_fd))):
+                    os.close(fd_)
+                _child_limits(mem_mb, cpu_s, fsize_mb)
+                # take the copy-on-write faults of a first run now, while idle
+                marshal.dumps(_execute(warmup, {}))
+                (n,) = _FRAME.unpack(_read_exact_fd(job_r, _FRAME.size))
+                program, global_vars = marshal.loads(_read_exact_fd(job_r, n))
+                res = _execute(program, global_vars)
+                try:
+                    data = marshal.dumps(res)
+                except ValueError:
+                    data = marshal.dumps(_error("result is not serialisable"))
+                _write_all_fd(res_w, _FRAME.pack(len(data)) + data)
+            finally:
+                os._exit(0)
+        os.close(job_r)
+        os.close(res_w)
+        return _Spare(pid, job_w, res_r)
+
+    def _discard(spare: _Spare) -> None:
+        os.close(spare.job_fd)
+        os.close(spare.result_fd)
+        with contextlib.suppress(ProcessLookupError):
+            os.kill(spare.pid, signal.SIGKILL)
+        os.waitpid(spare.pid, 0)
+
+    def _dispatch(req_id: int, program: Tuple[Any, Any], global_vars: Dict[str, Any], timeout: float) -> None:
+        job = marshal.dumps((program, global_vars))
+        while True:
+            spare = idle.popleft() if idle else _prefork()
+            try:
+                _write_all_fd(spare.job_fd, _FRAME.pack(len(job)) + job)
+                break
+            except BrokenPipeError:
+                _discard(spare)
+        os.close(spare.job_fd)
+        c = _Child(spare.pid, req_id, spare.result_fd, time.monotonic() + timeout)
+        children[c.pid] = c
+        sel.register(c.fd, selectors.EVENT_READ, c)
+        # fork the replacement now, while the child runs on another core, so the next
+        # request finds a spare instead of waiting for fork() after this reply
+        if overlap and len(idle) < spares:
+            idle.append(_prefork())
+
+    def _reply(child: _Child, res: Dict[str, Any]) -> None:
+        sel.unregister(child.fd)
+        os.close(child.fd)
+        children.pop(child.pid, None)
+        exited.append(child.pid)
+        _send_frame(sock, (child.req_id, res))
+
+    def _died(child: _Child, timed_out: bool = False) -> None:
+        if timed_out:
+            with contextlib.suppress(ProcessLookupError):
+                os.kill(child.pid, signal.SIGKILL)
+            _reply(child, _error("timeout"))
+            return
+        _, status = os.waitpid(child.pid, 0)
+        exited.remove(child.pid) if child.pid in exited else None
+        sel.unregister(child.fd)
+        os.close(child.fd)
+        children.pop(child.pid, None)
+        # SIGXCPU from RLIMIT_CPU, SIGKILL from the OOM killer, or a hard crash
+        _send_frame(sock, (child.req_id, _error(f"worker died (exit code {os.waitstatus_to_exitcode(status)})")))
+
+    def _reap() -> None:
+        for pid in list(exited):
+            done, _ = os.waitpid(pid, os.WNOHANG)
+            if done:
+                exited.remove(pid)
+
+    exited: List[int] = []
+    while True:
+        # refill one spare at a time and only while nothing is in flight, so a finished
+        # child never waits on fork(); requests check in between via select(timeout=0)
+        refill = len(idle) < spares and not children
+        if refill:
+            idle.append(_prefork())
+        _reap()
+        now = time.monotonic()
+        wait = min((c.deadline for c in children.values()), default=None)
+        if refill and len(idle) < spares:
+            wait = now
+        for key, _ in sel.select(None if wait is None else max(0.0, wait - now)):
+            child = key.data
+            if child is None:
+                try:
+                    req_id, code, global_vars, timeout = _recv_frame(sock)
+                except EOFError:
+                    for c in list(children.values()):
+                        _died(c, timed_out=True)
+                    for spare in idle:
+                        _discard(spare)
+                    _reap()
+                    return
+                program = programs.get(code)
+                if program is None:
+                    try:
+                        program = _compile(code)
+                    except SyntaxError:
+                        _send_frame(sock, (req_id, {"status": "run-error", "output": [], "stdout": "", "stderr": "",
+                                                    "error": traceback.format_exc(limit=0)}))
+                        continue
+                    programs[code] = program
+                    if len(programs) > _COMPILE_CACHE:
+                        programs.popitem(last=False)
+                else:
+                    programs.move_to_end(code)
+                _dispatch(req_id, program, global_vars, timeout)
+            else:
+                chunk = os.read(child.fd, 1 << 16)
+                if not chunk:
+                    _died(child)
+                    continue
+                child.buf += chunk
+                if len(child.buf) >= _FRAME.size:
+                    (n,) = _FRAME.unpack_from(child.buf)
+                    if len(child.buf) >= _FRAME.size + n:
+                        _reply(child, marshal.loads(bytes(child.buf[_FRAME.size:_FRAME.size + n])))
+        now = time.monotonic()
+        for c in [c for c in children.values() if c.deadline <= now]:
+            _died(c, timed_out=True)
+
+
+class ZygoteSandbox:
+    """
+    Pre-fork executor with the SandboxClient interface. One zygote process
+    imports the harness modules (`preload`, NumPy by default) once and keeps
+    `workers` copy-on-write children forked ahead of demand; each `eval` runs in
+    a fresh one under CPU-time and memory limits, so dispatch costs two pipe
+    writes instead of an interpreter start. Up to `workers` evaluations run at
+    once; `eval` is thread-safe.
+    """
+    def __init__(
+        self,
+        workers: int = 4,
+        dependencies: Sequence[str] = (),
+        log_handler=None,
+        mem_mb: Optional[int] = 512,
+        cpu_s: Optional[int] = 30,
+        fsize_mb: int = 16,
+        preload: Sequence[str] = PRELOAD,
+    ) -> None:
+        self.size = max(1, workers)
+        self.deps = list(dependencies)
+        self.log_handler = log_handler
+        self.limits = (mem_mb, cpu_s, fsize_mb)
+        self.preload = tuple(dict.fromkeys([*preload, *(_package_name(d) for d in self.deps)]))
+        self.restarts = 0
+        self._slots = threading.Semaphore(self.size)
+        self._send_lock = threading.Lock()
+        self._state_lock = threading.Lock()
+        self._pending: Dict[int, "_Waiter"] = {}
+        self._ids = itertools.count(1)
+        self._proc: Optional[subprocess.Popen] = None
+        self._sock: Optional[socket.socket] = None
+
+    def _log(self, level: str, message: str) -> None:
+        if self.log_handler is not None:
+            self.log_handler(level, message)
+
+    def _spawn(self) -> None:
+        parent, child = socket.socketpair()
+        boot = (
+            f"import sys; sys.path.insert(0, {HERE!r}); import native_sandbox; "
+            f"native_sandbox._zygote_main({child.fileno()}, {self.preload!r}, {self.size}, *{self.limits!r})"
+        )
+        # single-threaded BLAS: no helper threads in the zygote to break fork, and stable timings
+        env = {**os.environ, "OMP_NUM_THREADS": "1", "OPENBLAS_NUM_THREADS": "1", "MKL_NUM_THREADS": "1"}
+        self._proc = subprocess.Popen(
+            [sys.executable, "-c", boot],
+            pass_fds=(child.fileno(),),
+            stdin=subprocess.DEVNULL,
+            env=env,
+            start_new_session=True,
+        )
+        child.close()
+        self._sock = parent
+        threading.Thread(target=self._reader, args=(parent,), daemon=True).start()
+
+    def _reader(self, sock: socket.socket) -> None:
+        try:
+            while True:
+                req_id, res = _recv_frame(sock)
+                waiter = self._pending.pop(req_id, None)
+                if waiter is not None:
+                    waiter.set(res)
+        except (EOFError, OSError):
+            pass
+        with self._state_lock:
+            if self._sock is sock:
+                self._sock = None
+            pending, self._pending = self._pending, {}
+        for waiter in pending.values():
+            waiter.set(_error("zygote exited"))
+
+    def _ensure_running(self) -> socket.socket:
+        with self._state_lock:
+            if self._sock is None:
+                if self._proc is not None:
+                    self.restarts += 1
+                    self._log("warning", "native backend: zygote exited, restarting")
+                    with contextlib.suppress(Exception):
+                        self._proc.kill()
+                self._spawn()
+            return self._sock
+
+    def start(self) -> None:
+        missing = [d for d in self.deps if importlib.util.find_spec(_package_name(d)) is None]
+        if missing:
+            self._log("warning", f"native backend: not installed on host: {', '.join(missing)}")
+        self._ensure_running()
+
+    def eval(self, code: str, vars: Optional[Dict[str, Any]] = None, timeout: float = 8.0) -> Dict[str, Any]:
+        with self._slots:
+            sock = self._ensure_running()
+            req_id = next(self._ids)
+            waiter = _Waiter()
+            self._pending[req_id] = waiter
+            try:
+                with self._send_lock:
+                    _send_frame(sock, (req_id, code, dict(vars or {}), float(timeout)))
+            except ValueError:
+                self._pending.pop(req_id, None)
+                return _error("global variables are not serialisable")
+            except OSError as e:
+                self._pending.pop(req_id, None)
+                return _error(repr(e))
+            # the zygote enforces `timeout`; the extra second covers a stuck zygote
+            if not waiter.wait(timeout + 1.0):
+                self._pending.pop(req_id, None)
+                return _error("timeout")
+            return waiter.result
+
+    def close(self) -> None:
+        with self._state_lock:
+            sock, proc = self._sock, self._proc
+            self._sock = None
+        if sock is not None:
+            with contextlib.suppress(OSError):
+                sock.shutdown(socket.SHUT_RDWR)
+            sock.close()
+        if proc is not None:
+            try:
+                proc.wait(timeout=2)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+
+
+class _Waiter(threading.Event):
+    result: Dict[str, Any]
+
+    def set(self, result: Dict[str, Any]) -> None:  # type: ignore[override]
+        self.result = result
+        super().set()
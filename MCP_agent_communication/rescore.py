@@ -0,0 +1,152 @@
+# rescore.py
+"""
+Offline what-if scoring of a recorded search run.
+
+Loads a RUN_RECORD file (run_recorder.py) and recomputes `evaluate_answer` for
+every candidate with `evaluate_batch`, using the recorded judge scores, so no
+sandbox or LLM call is made. Weights start from the ones the run used and can be
+overridden field by field; budgets can be replaced or scaled.
+
+CLI:
+    python rescore.py run.jsonl
+    python rescore.py run.jsonl --set perf=0.4 --set capped_max=0.99 --top 5
+    python rescore.py run.jsonl --set "growth_steps=((3.0, 0.2), (1.5, 0.05))" --budget-scale 0.5
+    python rescore.py run.jsonl --budget-ms 2 --json whatif.json
+"""
+import argparse
+import ast
+import json
+import os
+import sys
+from dataclasses import asdict, fields, replace
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+from rich.console import Console
+from rich.table import Table
+
+os.environ.setdefault("OPENAI_API_KEY", "offline-rescore")  # treesearch_fib builds its clients at import
+
+from run_recorder import load_run
+from treesearch_fib import SCORE_WEIGHTS, ScoreWeights, bench_records, evaluate_batch
+
+
+def _tuples(value: Any) -> Any:
+    return tuple(_tuples(v) for v in value) if isinstance(value, (list, tuple)) else value
+
+
+def weights_from(meta: Dict[str, Any]) -> ScoreWeights:
+    """The ScoreWeights a run was recorded with (defaults for fields it does not list)."""
+    known = {f.name for f in fields(ScoreWeights)}
+    recorded = {k: _tuples(v) for k, v in (meta.get("weights") or {}).items() if k in known}
+    return replace(SCORE_WEIGHTS, **recorded)
+
+
+def parse_overrides(pairs: Sequence[str], base: ScoreWeights) -> ScoreWeights:
+    known = {f.name for f in fields(ScoreWeights)}
+    changes: Dict[str, Any] = {}
+    for pair in pairs:
+        name, sep, raw = pair.partition("=")
+        name = name.strip()
+        if not sep or name not in known:
+            raise SystemExit(f"bad --set {pair!r}; fields: {', '.join(sorted(known))}")
+        changes[name] = _tuples(ast.literal_eval(raw.strip()))
+    return replace(base, **changes)
+
+
+def rescore(
+    answers: Dict[str, str],
+    candidates: List[Dict[str, Any]],
+    weights: ScoreWeights,
+    budget_ms: Optional[float] = None,
+    budget_scale: float = 1.0,
+) -> np.ndarray:
+    budgets = [(budget_ms if budget_ms is not None else c["budget_ms"]) * budget_scale for c in candidates]
+    records = bench_records(
+        [(answers[c["hash"]], c["tests_ok"], c["bench"]) for c in candidates],
+        budget_ms=budgets,
+        judge_scores=[c.get("judge") for c in candidates],
+    )
+    return evaluate_batch(records, weights)
+
+
+def _ranks(scores: np.ndarray) -> np.ndarray:
+    order = np.argsort(-scores, kind="stable")
+    ranks = np.empty(len(scores), dtype=int)
+    ranks[order] = np.arange(len(scores))
+    return ranks
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Re-score a recorded search run under other weights or budgets.")
+    parser.add_argument("record", help="RUN_RECORD jsonl file")
+    parser.add_argument("--set", action="append", default=[], metavar="FIELD=VALUE",
+                        help="override a ScoreWeights field (Python literal)")
+    parser.add_argument("--budget-ms", type=float, help="replace every candidate's budget")
+    parser.add_argument("--budget-scale", type=float, default=1.0, help="multiply budgets")
+    parser.add_argument("--top", type=int, default=10, help="candidates listed, by new score")
+    parser.add_argument("--json", help="write per-candidate old/new scores here")
+    args = parser.parse_args(argv)
+
+    header, answers, candidates = load_run(args.record)
+    if not candidates:
+        print(f"{args.record}: no candidates recorded", file=sys.stderr)
+        return 1
+    base = weights_from(header.get("meta") or {})
+    weights = parse_overrides(args.set, base)
+
+    recorded = np.array([c["score"] for c in candidates])
+    replayed = rescore(answers, candidates, base)
+    drift = int(np.count_nonzero(~np.isclose(replayed, recorded, rtol=0, atol=1e-12)))
+    new = rescore(answers, candidates, weights, args.budget_ms, args.budget_scale)
+
+    console = Console()
+    console.print(f"[bold]{args.record}[/bold]: {len(candidates)} candidates, {len(answers)} distinct answers")
+    if drift:
+        console.print(f"[yellow]{drift} recorded scores differ from a replay with the recorded weights[/yellow]")
+    changed = {k: v for k, v in asdict(weights).items() if asdict(base)[k] != v}
+    console.print(f"changes: {changed or 'none'}"
+                  + (f", budget={args.budget_ms} ms" if args.budget_ms is not None else "")
+                  + (f", budget x{args.budget_scale}" if args.budget_scale != 1.0 else ""))
+
+    old_rank, new_rank = _ranks(recorded), _ranks(new)
+    delta = new - recorded
+    console.print(f"mean score {recorded.mean():.4f} → {new.mean():.4f} "
+                  f"(Δ min {delta.min():+.4f}, max {delta.max():+.4f}); "
+                  f"{int(np.count_nonzero(old_rank != new_rank))} rank changes")
+    best_old, best_new = int(np.argmin(old_rank)), int(np.argmin(new_rank))
+    if best_old == best_new:
+        console.print(f"best candidate unchanged: #{best_new}")
+    else:
+        console.print(f"[bold]best candidate changes[/bold]: #{best_old} → #{best_new}")
+
+    table = Table(show_header=True, header_style="bold magenta")
+    for col, justify in (("#", "right"), ("Step", "right"), ("Action", "left"), ("Tests OK", "center"),
+                         ("Contract", "center"), ("Old", "right"), ("New", "right"), ("Rank", "right")):
+        table.add_column(col, justify=justify)
+    for i in np.argsort(new_rank)[:args.top]:
+        c = candidates[i]
+        table.add_row(str(i), str(c.get("step", "")), str(c.get("action", "")), str(c["tests_ok"]),
+                      str((c["bench"] or {}).get("contract", "?")), f"{recorded[i]:.3f}", f"{new[i]:.3f}",
+                      f"{old_rank[i] + 1} → {new_rank[i] + 1}")
+    console.print(table)
+
+    if args.json:
+        with open(args.json, "w") as fh:
+            json.dump({
+                "record": args.record,
+                "weights": asdict(weights),
+                "budget_ms": args.budget_ms,
+                "budget_scale": args.budget_scale,
+                "candidates": [
+                    {"seq": c["seq"], "hash": c["hash"], "step": c.get("step"), "action": c.get("action"),
+                     "old": float(recorded[i]), "new": float(new[i])}
+                    for i, c in enumerate(candidates)
+                ],
+            }, fh, indent=2)
+        console.print(f"wrote {args.json}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,106 @@
+# run_recorder.py
+"""
+Recorder for scored candidates of a search run.
+
+`evaluate_answer` reports every candidate it scores here: the answer (stored once
+per code hash), test result, bench record, budget, raw judge score and final
+score, tagged with the MCTS step and action that produced it. The JSONL file is
+everything `rescore.py` needs to recompute the rubric offline, without a sandbox
+or LLM.
+
+File layout, one JSON object per line:
+    {"type": "run", "started": ..., "meta": {...}}
+    {"type": "code", "hash": "<sha256 of the answer>", "answer": "..."}
+    {"type": "candidate", "seq": 0, "hash": ..., "tests_ok": ..., "bench": {...},
+     "budget_ms": ..., "judge": ..., "judge_part": ..., "score": ..., "step": ..., "action": ...}
+"""
+import json
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from code_analysis import code_hash
+
+RECORD_ENV = "RUN_RECORD"
+
+
+class RunRecorder:
+    def __init__(self, path: str, meta: Optional[Dict[str, Any]] = None):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._fh = self.path.open("w")
+        self._lock = threading.Lock()
+        self._seen: set = set()
+        self._tags: Dict[str, Any] = {}
+        self.count = 0
+        self._write({"type": "run", "started": time.time(), "meta": meta or {}})
+
+    def _write(self, obj: Dict[str, Any]) -> None:
+        self._fh.write(json.dumps(obj, default=str) + "\n")
+
+    @contextmanager
+    def tagged(self, **tags: Any) -> Iterator[None]:
+        """Attach tags (e.g. step, action) to candidates recorded inside the block."""
+        saved = dict(self._tags)
+        self._tags.update(tags)
+        try:
+            yield
+        finally:
+            self._tags = saved
+
+    def record(
+        self,
+        answer: str,
+        tests_ok: Optional[bool],
+        bench: Dict[str, Any],
+        budget_ms: float,
+        judge: Optional[float],
+        judge_part: Optional[float],
+        score: float,
+    ) -> None:
+        h = code_hash(answer)
+        with self._lock:
+            if h not in self._seen:
+                self._seen.add(h)
+                self._write({"type": "code", "hash": h, "answer": answer})
+            self._write({
+                "type": "candidate",
+                "seq": self.count,
+                "hash": h,
+                "tests_ok": tests_ok,
+                "bench": bench,
+                "budget_ms": budget_ms,
+                "judge": judge,
+                "judge_part": judge_part,
+                "score": score,
+                **self._tags,
+            })
+            self.count += 1
+            self._fh.flush()
+
+    def close(self) -> None:
+        with self._lock:
+            if not self._fh.closed:
+                self._fh.close()
+
+
+def load_run(path: str) -> Tuple[Dict[str, Any], Dict[str, str], List[Dict[str, Any]]]:
+    """-> (run header, answers by code hash, candidates in recording order)."""
+    header: Dict[str, Any] = {}
+    answers: Dict[str, str] = {}
+    candidates: List[Dict[str, Any]] = []
+    with open(path) as fh:
+        for line in fh:
+            if not line.strip():
+                continue
+            obj = json.loads(line)
+            kind = obj.get("type")
+            if kind == "run":
+                header = obj
+            elif kind == "code":
+                answers[obj["hash"]] = obj["answer"]
+            elif kind == "candidate":
+                candidates.append(obj)
+    return header, answers, candidates
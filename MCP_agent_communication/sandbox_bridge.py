@@ -1,16 +1,19 @@
 # sandbox_bridge.py
 import asyncio
-from contextlib import asynccontextmanager
-from typing import Any, Dict, Optional, Sequence
+import time
+from contextlib import AsyncExitStack, asynccontextmanager
+from dataclasses import asdict, dataclass
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence
 
-from mcp_run_python import code_sandbox
+from sandbox_prewarm import open_code_sandbox
 
 @asynccontextmanager
-async def sandbox(dependencies: Optional[Sequence[str]] = None, log_handler=None):
+async def sandbox(dependencies: Optional[Sequence[str]] = None, log_handler=None, cache_dir=None):
     """
     Shared sandbox context. Use in a long-lived scope to avoid re-downloading wheels.
+    Starts from the prewarm cache when `cache_dir` or MCP_PREWARM_DIR is set.
     """
-    async with code_sandbox(dependencies=list(dependencies or []), log_handler=log_handler) as sb:
+    async with open_code_sandbox(dependencies, log_handler, cache_dir) as sb:
         yield sb
 
 async def sandbox_eval(
@@ -24,3 +27,178 @@ async def sandbox_eval(
     Returns the dict from code_sandbox: {status, stdout, stderr, return_value, error}
     """
     return await asyncio.wait_for(sb.eval(code, vars or {}), timeout=timeout)
+
+
+@dataclass
+class SandboxStats:
+    index: int
+    evals: int = 0
+    errors: int = 0
+    timeouts: int = 0
+    busy_s: float = 0.0
+    max_s: float = 0.0
+    retired: bool = False
+
+
+class SandboxPool:
+    """
+    Fixed set of sandbox instances leased one caller at a time.
+    Idle instances sit in a FIFO queue, so waiters are served in arrival order
+    and callers block (back-pressure) while every instance is busy.
+
+    An instance whose eval timed out may still be running that code, so it only
+    goes back to the queue once it answers a ping (up to `ping_attempts` tries
+    of `ping_timeout` seconds); otherwise it is retired.
+    """
+    def __init__(self, sandboxes: Sequence[Any], ping_timeout: float = 5.0, ping_attempts: int = 3) -> None:
+        self._sandboxes = list(sandboxes)
+        self._stats = [SandboxStats(index=i) for i in range(len(self._sandboxes))]
+        self.ping_timeout = ping_timeout
+        self.ping_attempts = ping_attempts
+        self._waiting = 0
+        self._recovering: set = set()
+        self._idle: asyncio.Queue[int] = asyncio.Queue()
+        for i in range(len(self._sandboxes)):
+            self._idle.put_nowait(i)
+
+    @property
+    def size(self) -> int:
+        return len(self._sandboxes)
+
+    @property
+    def waiting(self) -> int:
+        """Callers currently blocked on a lease."""
+        return self._waiting
+
+    @asynccontextmanager
+    async def _lease(self) -> AsyncIterator[int]:
+        self._waiting += 1
+        try:
+            i = await self._idle.get()
+        finally:
+            self._waiting -= 1
+        if i < 0:
+            # every instance was retired; pass the marker on to the next waiter
+            self._idle.put_nowait(i)
+            raise RuntimeError("no sandbox in the pool answers any more")
+        try:
+            yield i
+        except asyncio.TimeoutError:
+            task = asyncio.create_task(self._recover(i))
+            self._recovering.add(task)
+            task.add_done_callback(self._recovering.discard)
+            raise
+        except BaseException:
+            self._idle.put_nowait(i)
+            raise
+        else:
+            self._idle.put_nowait(i)
+
+    async def _recover(self, i: int) -> None:
+        for _ in range(self.ping_attempts):
+            try:
+                res = await sandbox_eval(self._sandboxes[i], "1", timeout=self.ping_timeout)
+            except Exception:
+                continue
+            if res.get("status") == "success":
+                self._idle.put_nowait(i)
+                return
+        self._stats[i].retired = True
+        if all(st.retired for st in self._stats):
+            self._idle.put_nowait(-1)
+
+    @asynccontextmanager
+    async def lease(self) -> AsyncIterator[Any]:
+        """
+        Hold one instance for several evals that must share interpreter state.
+        """
+        async with self._lease() as i:
+            yield self._sandboxes[i]
+
+    async def eval(
+        self,
+        code: str,
+        vars: Optional[Dict[str, Any]] = None,
+        timeout: float = 8.0,
+    ) -> Dict[str, Any]:
+        """
+        Run one code string on the next free instance. Raises like `sandbox_eval`.
+        """
+        async with self._lease() as i:
+            sb, st = self._sandboxes[i], self._stats[i]
+            t0 = time.perf_counter()
+            try:
+                res = await sandbox_eval(sb, code, vars, timeout=timeout)
+            except asyncio.TimeoutError:
+                st.timeouts += 1
+                raise
+            except Exception:
+                st.errors += 1
+                raise
+            finally:
+                dt = time.perf_counter() - t0
+                st.evals += 1
+                st.busy_s += dt
+                st.max_s = max(st.max_s, dt)
+            if res.get("status") != "success":
+                st.errors += 1
+            return res
+
+    async def eval_many(
+        self,
+        codes: Sequence[str],
+        vars: Optional[Dict[str, Any]] = None,
+        timeout: float = 8.0,
+    ) -> List[Dict[str, Any]]:
+        """
+        Fan `codes` out across all instances; results keep the input order.
+        One worker per instance pulls the next code, so at most `size` evals
+        are in flight. Failures come back as error dicts instead of raising.
+        """
+        results: List[Dict[str, Any]] = [{} for _ in codes]
+        pending = iter(range(len(codes)))
+
+        async def _worker() -> None:
+            for i in pending:
+                try:
+                    results[i] = await self.eval(codes[i], vars, timeout=timeout)
+                except asyncio.TimeoutError:
+                    results[i] = {"status": "error", "stdout": "", "stderr": "", "return_value": None, "error": "timeout"}
+                except Exception as e:
+                    results[i] = {"status": "error", "stdout": "", "stderr": "", "return_value": None, "error": repr(e)}
+
+        await asyncio.gather(*[_worker() for _ in range(min(self.size, len(codes)))])
+        return results
+
+    def stats(self) -> List[Dict[str, Any]]:
+        return [asdict(st) for st in self._stats]
+
+    async def aclose(self) -> None:
+        """Cancel pending health checks, so none pings an instance that is being closed."""
+        tasks = list(self._recovering)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+@asynccontextmanager
+async def sandbox_pool(
+    size: int = 2,
+    dependencies: Optional[Sequence[str]] = None,
+    log_handler=None,
+    cache_dir=None,
+) -> AsyncIterator[SandboxPool]:
+    """
+    Start `size` independent sandboxes (one Deno/Pyodide runtime each) and
+    yield a `SandboxPool` over them. Instances are entered one after another
+    in this task because the stdio client must be closed by the task that opened it.
+    """
+    if size < 1:
+        raise ValueError("sandbox_pool size must be >= 1")
+    async with AsyncExitStack() as stack:
+        sbs = [await stack.enter_async_context(sandbox(dependencies, log_handler, cache_dir)) for _ in range(size)]
+        pool = SandboxPool(sbs)
+        try:
+            yield pool
+        finally:
+            await pool.aclose()
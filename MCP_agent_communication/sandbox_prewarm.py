@@ -0,0 +1,311 @@
+# sandbox_prewarm.py
+"""
+Prewarm cache for the Pyodide sandbox.
+
+`code_sandbox` copies mcp-run-python's Deno project into a fresh temp dir and
+re-downloads the npm modules, the Pyodide runtime and every package wheel on
+each start. This module does that install once into a persistent directory,
+pins the resolved Pyodide packages in a lockfile, and starts sandboxes (or the
+MCP server) from that directory with `deno run --cached-only`, so no network
+is needed afterwards.
+
+mcp-run-python 0.0.21 does not expose Pyodide memory snapshots, so the reusable
+"warmed state" is the prepared environment itself: Deno module cache, npm
+modules, Pyodide runtime and wheels. `snapshot`/`restore` move it between
+machines, e.g. from a Docker build stage into an offline container.
+
+Only packages shipped in the Pyodide distribution resolve offline; pure PyPI
+packages installed by micropip still need network.
+
+CLI:
+    python sandbox_prewarm.py warm --deps numpy
+    python sandbox_prewarm.py verify --deps numpy
+    python sandbox_prewarm.py snapshot --deps numpy --out sandbox-cache.tar.gz
+    python sandbox_prewarm.py restore sandbox-cache.tar.gz
+    python sandbox_prewarm.py serve streamable-http --port 3333 --deps numpy
+"""
+import argparse
+import hashlib
+import json
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tarfile
+import time
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence
+
+import mcp_run_python
+from mcp import ClientSession, StdioServerParameters
+from mcp.client.stdio import get_default_environment, stdio_client
+from mcp_run_python import code_sandbox
+from mcp_run_python.code_sandbox import CodeSandbox
+from mcp_run_python.main import _deno_install_args, _deno_run_args
+
+CACHE_ENV = "MCP_PREWARM_DIR"
+LOCK_NAME = "prewarm-lock.json"
+# mcp-run-python's runtime always loads these before the requested deps
+BASE_PACKAGES = ("micropip", "pydantic")
+
+
+class PrewarmError(RuntimeError):
+    pass
+
+
+def default_cache_dir() -> Optional[Path]:
+    value = os.getenv(CACHE_ENV)
+    return Path(value).expanduser() if value else None
+
+def _package_name(requirement: str) -> str:
+    return re.split(r"[<>=!~\[; ]", requirement.strip(), maxsplit=1)[0].lower().replace("_", "-")
+
+def env_dir(cache_dir: Path, dependencies: Sequence[str]) -> Path:
+    """One prepared Deno project per (mcp-run-python version, dependency set)."""
+    key = json.dumps([mcp_run_python.__version__, sorted(dependencies)])
+    return Path(cache_dir) / f"env-{hashlib.sha256(key.encode()).hexdigest()[:12]}"
+
+def _deno_env(cache_dir: Path) -> Dict[str, str]:
+    return {**get_default_environment(), "DENO_DIR": str(Path(cache_dir) / "deno_dir")}
+
+def _pyodide_dir(env: Path) -> Path:
+    for candidate in sorted(env.glob("node_modules/.deno/pyodide@*/node_modules/pyodide")) + [env / "node_modules" / "pyodide"]:
+        if (candidate / "pyodide-lock.json").is_file():
+            return candidate
+    raise PrewarmError(f"no Pyodide runtime under {env}/node_modules; run `warm` first")
+
+def _sha256(path: Path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+def resolve(env: Path, dependencies: Sequence[str]) -> Dict[str, Dict[str, str]]:
+    """
+    Transitive closure of the requested packages in Pyodide's own lockfile.
+    Returns {name: {"file_name", "sha256"}}; names Pyodide does not ship are skipped.
+    """
+    lock = json.loads((_pyodide_dir(env) / "pyodide-lock.json").read_text())
+    packages = lock["packages"]
+    todo = [_package_name(d) for d in (*BASE_PACKAGES, *dependencies)]
+    resolved: Dict[str, Dict[str, str]] = {}
+    while todo:
+        name = todo.pop()
+        if name in resolved or name not in packages:
+            continue
+        pkg = packages[name]
+        resolved[name] = {"file_name": pkg["file_name"], "sha256": pkg["sha256"]}
+        todo.extend(pkg.get("depends", []))
+    return dict(sorted(resolved.items()))
+
+def prewarm(cache_dir: Path, dependencies: Sequence[str], log_handler=None) -> Path:
+    """
+    Install the Deno project, Pyodide and `dependencies` into `cache_dir` and write the lockfile.
+    Needs network once; a cache that already verifies is left untouched.
+    """
+    deps = list(dependencies)
+    env = env_dir(cache_dir, deps)
+    if env.exists() and not verify(cache_dir, deps):
+        return env
+    if not env.exists():
+        shutil.copytree(Path(mcp_run_python.__file__).parent / "deno", env)
+
+    p = subprocess.Popen(
+        ("deno", *_deno_install_args(deps)),
+        cwd=env, env=_deno_env(cache_dir),
+        stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True,
+    )
+    out: List[str] = []
+    for line in p.stdout or ():
+        line = line.strip()
+        out.append(line)
+        if log_handler:
+            level, _, msg = line.partition("|") if "|" in line else ("info", "", line)
+            log_handler(level, msg)
+    if p.wait() != 0:
+        raise PrewarmError(f"`deno run ... noop` exited with {p.returncode}: {' '.join(out)[-2000:]}")
+
+    pyodide_dir = _pyodide_dir(env)
+    packages = resolve(env, deps)
+    missing = [name for name, pkg in packages.items() if not (pyodide_dir / pkg["file_name"]).is_file()]
+    if missing:
+        raise PrewarmError(f"install finished but wheels are not cached: {', '.join(missing)}")
+    lock = {
+        "mcp_run_python": mcp_run_python.__version__,
+        "pyodide": json.loads((pyodide_dir / "package.json").read_text()).get("version"),
+        "dependencies": deps,
+        "packages": packages,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+    }
+    (env / LOCK_NAME).write_text(json.dumps(lock, indent=2))
+    return env
+
+def verify(cache_dir: Path, dependencies: Sequence[str]) -> List[str]:
+    """Problems with the cached environment; an empty list means it can start offline."""
+    env = env_dir(cache_dir, dependencies)
+    lock_path = env / LOCK_NAME
+    if not lock_path.is_file():
+        return [f"no lockfile at {lock_path}"]
+    lock = json.loads(lock_path.read_text())
+    problems = []
+    if lock.get("mcp_run_python") != mcp_run_python.__version__:
+        problems.append(f"lockfile is for mcp-run-python {lock.get('mcp_run_python')}, have {mcp_run_python.__version__}")
+    if sorted(lock.get("dependencies", [])) != sorted(dependencies):
+        problems.append(f"lockfile pins {lock.get('dependencies')}, asked for {list(dependencies)}")
+    try:
+        pyodide_dir = _pyodide_dir(env)
+    except PrewarmError as e:
+        return problems + [str(e)]
+    for name, pkg in lock.get("packages", {}).items():
+        path = pyodide_dir / pkg["file_name"]
+        if not path.is_file():
+            problems.append(f"{name}: {pkg['file_name']} missing")
+        elif _sha256(path) != pkg["sha256"]:
+            problems.append(f"{name}: {pkg['file_name']} sha256 mismatch")
+    if not (Path(cache_dir) / "deno_dir").is_dir():
+        problems.append("Deno module cache (deno_dir) missing")
+    return problems
+
+def snapshot(cache_dir: Path, dependencies: Sequence[str], out: Path) -> Path:
+    """Pack the verified environment and the Deno module cache into one tar.gz."""
+    problems = verify(cache_dir, dependencies)
+    if problems:
+        raise PrewarmError("refusing to snapshot an unverified cache: " + "; ".join(problems))
+    env = env_dir(cache_dir, dependencies)
+    with tarfile.open(out, "w:gz") as tar:
+        tar.add(env, arcname=env.name)
+        tar.add(Path(cache_dir) / "deno_dir", arcname="deno_dir")
+    return Path(out)
+
+def restore(archive: Path, cache_dir: Path) -> None:
+    Path(cache_dir).mkdir(parents=True, exist_ok=True)
+    with tarfile.open(archive, "r:gz") as tar:
+        tar.extractall(cache_dir, filter="data")
+
+def run_args(
+    mode: str,
+    dependencies: Sequence[str],
+    http_port: Optional[int] = None,
+    return_mode: str = "xml",
+    allow_networking: bool = True,
+) -> List[str]:
+    args = _deno_run_args(
+        mode,  # type: ignore[arg-type]
+        http_port=http_port,
+        dependencies=list(dependencies),
+        return_mode=return_mode,  # type: ignore[arg-type]
+        allow_networking=allow_networking,
+    )
+    return [args[0], "--cached-only", *args[1:]]
+
+@asynccontextmanager
+async def cached_code_sandbox(
+    cache_dir: Path,
+    dependencies: Optional[Sequence[str]] = None,
+    log_handler=None,
+    allow_networking: bool = True,
+) -> AsyncIterator[CodeSandbox]:
+    """
+    Same contract as `mcp_run_python.code_sandbox`, started from the prewarmed cache.
+    Raises PrewarmError when the cache does not verify.
+    """
+    deps = list(dependencies or [])
+    problems = verify(cache_dir, deps)
+    if problems:
+        raise PrewarmError("; ".join(problems))
+    params = StdioServerParameters(
+        command="deno",
+        args=run_args("stdio", deps, return_mode="json", allow_networking=allow_networking),
+        cwd=env_dir(cache_dir, deps),
+        env=_deno_env(cache_dir),
+    )
+    logging_callback = None
+    if log_handler:
+        async def logging_callback(params: Any) -> None:
+            log_handler(params.level, params.data)
+
+    async with stdio_client(params) as (read, write):
+        async with ClientSession(read, write, logging_callback=logging_callback) as session:
+            if log_handler:
+                await session.set_logging_level("debug")
+            yield CodeSandbox(session)
+
+def open_code_sandbox(
+    dependencies: Optional[Sequence[str]] = None,
+    log_handler=None,
+    cache_dir: Optional[Path] = None,
+):
+    """
+    `cached_code_sandbox` when a cache dir is given or set via MCP_PREWARM_DIR,
+    otherwise the cold `code_sandbox`. A cache picked up from the environment
+    that does not verify for these dependencies also falls back to the cold path.
+    """
+    deps = list(dependencies or [])
+    if cache_dir is not None:
+        return cached_code_sandbox(cache_dir, deps, log_handler)
+    env_cache = default_cache_dir()
+    if env_cache is not None and not verify(env_cache, deps):
+        return cached_code_sandbox(env_cache, deps, log_handler)
+    return code_sandbox(dependencies=deps, log_handler=log_handler)
+
+def serve(mode: str, cache_dir: Path, dependencies: Sequence[str], port: Optional[int] = None) -> int:
+    """Run the MCP server from the cache, like `python -m mcp_run_python <mode>` but offline."""
+    deps = list(dependencies)
+    problems = verify(cache_dir, deps)
+    if problems:
+        raise PrewarmError("; ".join(problems))
+    mode = mode.replace("-", "_")
+    args = run_args(mode, deps, http_port=port if mode == "streamable_http" else None)
+    try:
+        return subprocess.run(("deno", *args), cwd=env_dir(cache_dir, deps), env=_deno_env(cache_dir)).returncode
+    except KeyboardInterrupt:
+        return 0
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Prewarm cache for the mcp-run-python sandbox.")
+    parser.add_argument("--cache-dir", default=os.getenv(CACHE_ENV, ".sandbox-cache"))
+    parser.add_argument("--deps", default=os.getenv("DEPS", ""), help="comma separated, e.g. numpy,pandas")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    sub.add_parser("warm")
+    sub.add_parser("verify")
+    p_snap = sub.add_parser("snapshot")
+    p_snap.add_argument("--out", required=True)
+    p_restore = sub.add_parser("restore")
+    p_restore.add_argument("archive")
+    p_serve = sub.add_parser("serve")
+    p_serve.add_argument("mode", choices=["stdio", "streamable-http"])
+    p_serve.add_argument("--port", type=int, default=int(os.getenv("PORT", "3333")))
+    args = parser.parse_args(argv)
+
+    cache_dir = Path(args.cache_dir)
+    deps = [d for d in args.deps.split(",") if d]
+    try:
+        if args.cmd == "warm":
+            env = prewarm(cache_dir, deps, log_handler=lambda level, msg: print(f"{level}: {msg}", file=sys.stderr))
+            print(f"prewarmed {env}")
+        elif args.cmd == "verify":
+            problems = verify(cache_dir, deps)
+            for problem in problems:
+                print(problem)
+            if problems:
+                return 1
+            print("cache OK")
+        elif args.cmd == "snapshot":
+            print(f"wrote {snapshot(cache_dir, deps, Path(args.out))}")
+        elif args.cmd == "restore":
+            restore(Path(args.archive), cache_dir)
+            print(f"restored into {cache_dir}")
+        else:
+            return serve(args.mode, cache_dir, deps, port=args.port)
+    except PrewarmError as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
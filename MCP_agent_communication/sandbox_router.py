@@ -0,0 +1,366 @@
+# sandbox_router.py
+"""
+Multi-worker sandbox server: N mcp-run-python runtimes behind one MCP endpoint.
+
+    python sandbox_router.py --workers 4 --port 3333 --deps numpy [--cache-dir DIR]
+
+Each worker is its own `streamable_http` Deno/Pyodide process on PORT+1..PORT+N
+(started from the prewarm cache when it verifies, cold otherwise). The router
+serves the same `run_python_code` tool on PORT/mcp and forwards each call to
+the least-loaded live worker; a Pyodide runtime runs one call at a time, so
+callers beyond `workers * per_worker` queue in arrival order.
+
+A supervisor restarts workers that exit (crashed), time out on a call or stay
+unreachable for `wedge_s` (wedged). `GET /stats` returns queue depth, in-flight
+calls, latency percentiles and per-worker restarts as JSON.
+"""
+import argparse
+import asyncio
+import os
+import signal
+import sys
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Deque, Dict, List, Optional, Sequence, Tuple
+
+from mcp_http_client import TOOL, HttpSandbox
+import sandbox_prewarm
+
+LATENCY_WINDOW = 500
+
+
+def _percentiles(samples: Sequence[float]) -> Dict[str, float]:
+    if not samples:
+        return {"p50_ms": 0.0, "p95_ms": 0.0, "max_ms": 0.0}
+    xs = sorted(samples)
+    pick = lambda q: xs[min(len(xs) - 1, int(q * len(xs)))] * 1000.0
+    return {"p50_ms": round(pick(0.50), 2), "p95_ms": round(pick(0.95), 2), "max_ms": round(xs[-1] * 1000.0, 2)}
+
+def _error_text(message: str) -> str:
+    # same shape as the worker's xml return mode
+    return f"<status>run-error</status>\n<error>\n{message}\n</error>"
+
+
+@dataclass
+class Worker:
+    index: int
+    port: int
+    proc: Optional[asyncio.subprocess.Process] = None
+    client: Optional[HttpSandbox] = None
+    state: str = "starting"  # starting | booting | up | failed | restarting | stopped
+    in_flight: int = 0
+    calls: int = 0
+    errors: int = 0
+    restarts: int = 0
+    last_restart_reason: str = ""
+    unready_since: Optional[float] = None
+    latency_s: Deque[float] = field(default_factory=lambda: deque(maxlen=LATENCY_WINDOW))
+
+    @property
+    def live(self) -> bool:
+        return self.state == "up" and self.client is not None and self.client.ready
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "index": self.index,
+            "port": self.port,
+            "pid": self.proc.pid if self.proc else None,
+            "state": self.state,
+            "live": self.live,
+            "in_flight": self.in_flight,
+            "calls": self.calls,
+            "errors": self.errors,
+            "restarts": self.restarts,
+            "last_restart_reason": self.last_restart_reason,
+            **_percentiles(self.latency_s),
+        }
+
+
+class SandboxRouter:
+    """
+    Owns the worker processes and dispatches `run_python_code` calls to them.
+    """
+    def __init__(
+        self,
+        workers: int = 2,
+        port: int = 3333,
+        dependencies: Sequence[str] = (),
+        cache_dir: Optional[Path] = None,
+        per_worker: int = 1,
+        call_timeout: float = 60.0,
+        wedge_s: float = 30.0,
+        check_s: float = 2.0,
+        boot_timeout: float = 120.0,
+        boot_attempts: int = 3,
+    ) -> None:
+        if workers < 1:
+            raise ValueError("workers must be >= 1")
+        self.deps = list(dependencies)
+        self.cache_dir = cache_dir
+        self.per_worker = max(1, per_worker)
+        self.call_timeout = call_timeout
+        self.wedge_s = wedge_s
+        self.check_s = check_s
+        self.boot_timeout = boot_timeout
+        self.boot_attempts = max(1, boot_attempts)
+        self.workers = [Worker(index=i, port=port + 1 + i) for i in range(workers)]
+        self.waiting = 0
+        self.calls = 0
+        self.errors = 0
+        self.latency_s: Deque[float] = deque(maxlen=LATENCY_WINDOW)
+        self.queue_s: Deque[float] = deque(maxlen=LATENCY_WINDOW)
+        self._cond = asyncio.Condition()
+        self._tasks: set = set()
+        self._supervisor: Optional[asyncio.Task] = None
+        self._cached = bool(cache_dir) and not sandbox_prewarm.verify(cache_dir, self.deps)
+
+    # --- worker lifecycle --------------------------------------------------
+
+    def _command(self, w: Worker) -> Tuple[List[str], Optional[Path], Optional[Dict[str, str]]]:
+        if self._cached:
+            args = sandbox_prewarm.run_args("streamable_http", self.deps, http_port=w.port)
+            env = {**os.environ, **sandbox_prewarm._deno_env(self.cache_dir)}
+            return ["deno", *args], sandbox_prewarm.env_dir(self.cache_dir, self.deps), env
+        cmd = [sys.executable, "-m", "mcp_run_python", "streamable-http", "--port", str(w.port)]
+        if self.deps:
+            cmd += ["--deps", ",".join(self.deps)]
+        return cmd, None, None
+
+    async def _spawn(self, w: Worker) -> None:
+        cmd, cwd, env = self._command(w)
+        w.proc = await asyncio.create_subprocess_exec(*cmd, cwd=cwd, env=env, start_new_session=True)
+        w.state = "booting"
+        for _ in range(self.boot_attempts):
+            # a failed start() closes its client for good, so each attempt gets a fresh one
+            w.client = HttpSandbox(f"http://127.0.0.1:{w.port}", sessions=1, max_in_flight=self.per_worker,
+                                   connect_timeout=self.boot_timeout)
+            try:
+                await w.client.start()
+            except ConnectionError:
+                if w.state == "stopped" or w.proc.returncode is not None:
+                    break
+                continue
+            if w.state == "booting":
+                w.state = "up"
+                w.unready_since = None
+                await self._notify()
+            return
+        if w.state == "booting":
+            # exited or never answered; the supervisor restarts it on its next check
+            w.state = "failed"
+
+    async def _stop(self, w: Worker) -> None:
+        if w.client is not None:
+            await w.client.close()
+            w.client = None
+        if w.proc is not None and w.proc.returncode is None:
+            try:
+                os.killpg(w.proc.pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+            try:
+                await asyncio.wait_for(w.proc.wait(), timeout=5)
+            except asyncio.TimeoutError:
+                os.killpg(w.proc.pid, signal.SIGKILL)
+                await w.proc.wait()
+
+    async def _restart(self, w: Worker, reason: str) -> None:
+        if w.state in ("restarting", "stopped"):
+            return
+        w.state = "restarting"
+        w.restarts += 1
+        w.last_restart_reason = reason
+        w.unready_since = None
+        print(f"worker {w.index}: restarting ({reason})", file=sys.stderr)
+        await self._stop(w)
+        await self._spawn(w)
+
+    def _schedule_restart(self, w: Worker, reason: str) -> None:
+        if w.state not in ("up", "failed"):
+            return
+        task = asyncio.create_task(self._restart(w, reason))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _supervise(self) -> None:
+        while True:
+            await asyncio.sleep(self.check_s)
+            now = time.monotonic()
+            for w in self.workers:
+                if w.state == "failed":
+                    exited = w.proc is not None and w.proc.returncode is not None
+                    self._schedule_restart(w, f"exited with {w.proc.returncode} while booting" if exited else
+                                           f"did not boot within {self.boot_attempts} x {self.boot_timeout:.0f}s")
+                    continue
+                if w.state != "up":
+                    continue
+                if w.proc is not None and w.proc.returncode is not None:
+                    self._schedule_restart(w, f"exited with {w.proc.returncode}")
+                elif not w.live:
+                    w.unready_since = w.unready_since or now
+                    if now - w.unready_since > self.wedge_s:
+                        self._schedule_restart(w, f"unreachable for {self.wedge_s:.0f}s")
+                else:
+                    w.unready_since = None
+            # a live worker's sessions reconnect on their own; wake callers waiting for one
+            await self._notify()
+
+    async def start(self) -> None:
+        await asyncio.gather(*[self._spawn(w) for w in self.workers])
+        self._supervisor = asyncio.create_task(self._supervise())
+
+    async def close(self) -> None:
+        if self._supervisor is not None:
+            self._supervisor.cancel()
+        for task in list(self._tasks):
+            task.cancel()
+        for w in self.workers:
+            w.state = "stopped"
+        await asyncio.gather(*[self._stop(w) for w in self.workers], return_exceptions=True)
+
+    # --- dispatch -------------------------------------------------------------
+
+    async def _notify(self) -> None:
+        async with self._cond:
+            self._cond.notify_all()
+
+    def _free_worker(self) -> Optional[Worker]:
+        free = [w for w in self.workers if w.live and w.in_flight < self.per_worker]
+        return min(free, key=lambda w: (w.in_flight, w.calls)) if free else None
+
+    async def _acquire(self) -> Worker:
+        async with self._cond:
+            self.waiting += 1
+            try:
+                w = await asyncio.wait_for(self._cond.wait_for(self._free_worker), timeout=self.call_timeout)
+            finally:
+                self.waiting -= 1
+            w.in_flight += 1
+            return w
+
+    async def _release(self, w: Worker) -> None:
+        async with self._cond:
+            w.in_flight -= 1
+            self._cond.notify()
+
+    async def run(self, python_code: str, global_variables: Optional[Dict[str, Any]] = None) -> str:
+        """Forward one `run_python_code` call; returns the worker's text reply."""
+        self.calls += 1
+        t0 = time.perf_counter()
+        try:
+            w = await self._acquire()
+        except asyncio.TimeoutError:
+            self.errors += 1
+            return _error_text(f"no sandbox worker free within {self.call_timeout:.0f}s")
+        t1 = time.perf_counter()
+        self.queue_s.append(t1 - t0)
+        w.calls += 1
+        args: Dict[str, Any] = {"python_code": python_code}
+        if global_variables:
+            args["global_variables"] = global_variables
+        try:
+            result = await w.client.call_tool(TOOL, args, timeout=self.call_timeout)
+            return result.content[0].text
+        except asyncio.TimeoutError:
+            w.errors += 1
+            self.errors += 1
+            self._schedule_restart(w, f"call exceeded {self.call_timeout:.0f}s")
+            return _error_text(f"timeout after {self.call_timeout:.0f}s")
+        except Exception as e:
+            w.errors += 1
+            self.errors += 1
+            if w.proc is not None and w.proc.returncode is not None:
+                self._schedule_restart(w, f"exited with {w.proc.returncode}")
+            return _error_text(repr(e))
+        finally:
+            dt = time.perf_counter() - t1
+            w.latency_s.append(dt)
+            self.latency_s.append(time.perf_counter() - t0)
+            await self._release(w)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "workers": len(self.workers),
+            "live": sum(1 for w in self.workers if w.live),
+            "queue_depth": self.waiting,
+            "in_flight": sum(w.in_flight for w in self.workers),
+            "calls": self.calls,
+            "errors": self.errors,
+            "latency": _percentiles(self.latency_s),
+            "queue_wait": _percentiles(self.queue_s),
+            "per_worker": [w.stats() for w in self.workers],
+        }
+
+
+def build_app(router: SandboxRouter):
+    """
+    Starlette app serving `run_python_code` on /mcp and the stats on /stats.
+    The router starts with the app (the MCP server's own lifespan runs per session).
+    """
+    try:
+        from mcp.server.fastmcp import FastMCP as MCPServer
+    except ImportError:  # mcp >= 2 renamed it
+        from mcp.server.mcpserver import MCPServer
+    from starlette.responses import JSONResponse
+
+    mcp = MCPServer("MCP Run Python (router)", instructions='Call the "run_python_code" tool with the Python code to run.')
+
+    @mcp.tool()
+    async def run_python_code(python_code: str, global_variables: Optional[Dict[str, Any]] = None) -> str:
+        """Tool to execute Python code and return stdout, stderr, and return value.
+
+        The code may be async, and the value on the last line will be returned as the return value.
+        """
+        return await router.run(python_code, global_variables)
+
+    @mcp.custom_route("/stats", methods=["GET"])
+    async def stats(_request):
+        return JSONResponse(router.stats())
+
+    app = mcp.streamable_http_app()
+    session_lifespan = app.router.lifespan_context
+
+    @asynccontextmanager
+    async def lifespan(app_):
+        async with session_lifespan(app_):
+            await router.start()
+            try:
+                yield
+            finally:
+                await router.close()
+
+    app.router.lifespan_context = lifespan
+    return app
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Serve N mcp-run-python workers behind one MCP endpoint.")
+    parser.add_argument("--workers", type=int, default=int(os.getenv("WORKERS", "2")))
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "3333")))
+    parser.add_argument("--host", default=os.getenv("HOST", "0.0.0.0"))
+    parser.add_argument("--deps", default=os.getenv("DEPS", ""), help="comma separated, e.g. numpy,pandas")
+    parser.add_argument("--cache-dir", default=os.getenv(sandbox_prewarm.CACHE_ENV) or None)
+    parser.add_argument("--per-worker", type=int, default=1, help="concurrent calls per runtime")
+    parser.add_argument("--call-timeout", type=float, default=60.0)
+    parser.add_argument("--wedge-s", type=float, default=30.0)
+    args = parser.parse_args(argv)
+
+    router = SandboxRouter(
+        workers=args.workers,
+        port=args.port,
+        dependencies=[d for d in args.deps.split(",") if d],
+        cache_dir=Path(args.cache_dir) if args.cache_dir else None,
+        per_worker=args.per_worker,
+        call_timeout=args.call_timeout,
+        wedge_s=args.wedge_s,
+    )
+    import uvicorn
+    uvicorn.run(build_app(router), host=args.host, port=args.port)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,6 +1,6 @@
 import asyncio
 import time
-from mcp_run_python import code_sandbox
+from sandbox_bridge import sandbox_pool
 
 def log_handler(level: str, message: str):
     print(f"{level}: {message}")
@@ -13,24 +13,28 @@ await asyncio.sleep(1)
 a
 """
 
+POOL_SIZE = 4
+
 async def main():
-    async with code_sandbox(dependencies=["numpy"], log_handler=log_handler) as sandbox:
+    async with sandbox_pool(size=POOL_SIZE, dependencies=["numpy"], log_handler=log_handler) as pool:
         print("running code")
         # single run with variables
-        result = await sandbox.eval(code, {"thing": [1, 2, 3]})
+        result = await pool.eval(code, {"thing": [1, 2, 3]})
         print(f"{result['status'].title()}:")
         if result["status"] == "success":
             print(result["return_value"])
         else:
             print(result["error"])
 
-        # parallel runs to show concurrency
+        # parallel runs fanned out across the pool's runtimes
         tic = time.time()
-        results = await asyncio.gather(*[sandbox.eval(code, {"thing": [4, 5, 6]}) for _ in range(10)])
+        results = await pool.eval_many([code] * 10, {"thing": [4, 5, 6]})
         toc = time.time()
         ok = sum(1 for r in results if r["status"] == "success")
         print(f"Batch runs ok: {ok}/{len(results)}")
         print(f"Execution time: {toc - tic:.3f} seconds")
+        for st in pool.stats():
+            print(f"  sandbox {st['index']}: evals={st['evals']} errors={st['errors']} busy={st['busy_s']:.3f}s")
 
 if __name__ == "__main__":
     asyncio.run(main())
@@ -1,16 +1,15 @@
 import os, asyncio
 from dotenv import load_dotenv
 from pydantic_ai import Agent
-from pydantic_ai.mcp import MCPServerStdio
+
+from mcp_http_client import agent_toolset
 
 load_dotenv()
 OPENAI_MODEL = os.getenv("OPENAI_MODEL", "openai:gpt-5")
 
-server = MCPServerStdio(
-    # Launch in stdio mode
-    "docker",
-    args=["run","--rm","-i","mcp-run-python:latest","/usr/local/bin/entrypoint.sh","stdio"],
-)
+# Long-lived server, started once with:
+#   docker run --rm -p 3333:3333 mcp-run-python:latest /usr/local/bin/entrypoint.sh streamable-http
+server = agent_toolset(os.getenv("MCP_SERVER_URL"))
 
 agent = Agent(OPENAI_MODEL, toolsets=[server])
 
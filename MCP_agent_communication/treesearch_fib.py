@@ -1,13 +1,15 @@
 from __future__ import annotations
 import os
-import re
 import json
+import math
+import difflib
 import time
 import asyncio
 import threading
-from dataclasses import dataclass, field
-from typing import TypedDict, Literal, Optional, Sequence, Dict, Any
+from dataclasses import asdict, dataclass, field, replace
+from typing import TypedDict, Literal, Optional, Sequence, Dict, Any, Callable
 
+import numpy as np
 from dotenv import load_dotenv
 
 import treequest as tq
@@ -17,7 +19,11 @@ from langchain_core.messages import HumanMessage, BaseMessage, SystemMessage
 from langgraph.graph import StateGraph, START, END
 from langgraph.types import Command
 
-from mcp_run_python import code_sandbox  # MCP server helper
+from sandbox_prewarm import open_code_sandbox  # code_sandbox, from the prewarm cache when available
+from mcp_http_client import http_sandbox, mcp_endpoint  # shared long-lived streamable-http server
+from native_sandbox import NativeSandbox, ZygoteSandbox  # CPython executors for trusted benchmarking
+from run_recorder import RECORD_ENV, RunRecorder  # per-candidate log for offline re-scoring (rescore.py)
+from code_analysis import analyze, extract_python_block, logic_hash, prescreen  # one cached AST/token pass per candidate
 
 from rich.console import Console
 from rich.table import Table
@@ -60,6 +66,29 @@ PROMPT_REVIEW_BASE = (
     "Keep the same contract if possible. Return ONLY one fenced code block with language tag python."
 )
 
+PROMPT_PERF_BASE = (
+    "You are optimizing Python code for speed and memory. Keep it correct.\n"
+    "Here is the current answer:\n\n{answer}\n\n"
+    "Feedback:\n{feedback}\n\n"
+    "Cut the runtime below the budget and avoid building data you do not return.\n"
+    "Return ONLY one fenced code block with language tag python and NO comments or prose."
+)
+
+PROMPT_FAST_DOUBLING = (
+    "Rewrite the Python code below with the fast doubling method:\n"
+    "F(2k) = F(k) * (2*F(k+1) - F(k)) and F(2k+1) = F(k)**2 + F(k+1)**2.\n"
+    "Keep the function name and call contract. If it yields a sequence, keep a simple iterative generator.\n"
+    "Here is the current answer:\n\n{answer}\n\n"
+    "Feedback:\n{feedback}\n\n"
+    "Return ONLY one fenced code block with language tag python and NO comments or prose."
+)
+
+PROMPT_REVIEW_LITE = (
+    "Add a short docstring and type hints to the code below. Do not change names or logic.\n"
+    "Here is the current answer:\n\n{answer}\n\n"
+    "Return ONLY one fenced code block with language tag python."
+)
+
 PERF_TIPS = (
     "Performance tips:\n"
     "• Use an iterative approach for single Fibonacci(n)\n"
@@ -83,6 +112,7 @@ class NodeState:
     bench: Dict[str, Any] | None = None
     note: str = ""
     messages: list[str] = field(default_factory=list)  # agent-to-agent handoffs
+    budget_ms: Optional[float] = None  # budget the score was computed at
 
 
 class LGState(TypedDict, total=False):
@@ -91,25 +121,13 @@ class LGState(TypedDict, total=False):
     best_score: float
     trace: str
     best_messages: list[str]
+    review_savings: Dict[str, Any]
+    review_token_budget: Optional[int]  # reviewer tokens for the whole run; None = unlimited
 
 # --- helpers: extraction & sentinels ----------------------------------------
 
 FIB10 = [0, 1, 1, 2, 3, 5, 8, 13, 21, 34]
 
-def extract_python_block(text: str) -> Optional[str]:
-    patterns = [
-        r"```python\s*(.*?)```",
-        r"```py\s*(.*?)```",
-        r"```\s*(.*?)```",
-    ]
-    for pat in patterns:
-        m = re.search(pat, text, re.DOTALL | re.IGNORECASE)
-        if m:
-            return m.group(1).strip()
-    lines = [ln for ln in text.splitlines() if not ln.strip().startswith(("```", "# Q:", "# A:"))]
-    code = "\n".join(lines).strip()
-    return code or None
-
 def _esc_triple_single(s: str) -> str:
     return s.replace("'''", "\\'\\'\\'")
 
@@ -132,14 +150,26 @@ class _LoopThread:
         self.loop.call_soon_threadsafe(self.loop.stop)
         self.thread.join(timeout=2)
 
-class SandboxClient:
+class PyodideBackend:
     """
-    Synchronous façade over the async `code_sandbox` context.
-    Reuses one sandbox for the whole run.
+    The async `code_sandbox` context (or a streamable-http server) driven from a
+    private event-loop thread. Reuses one sandbox for the whole run. With `cache_dir`
+    (or MCP_PREWARM_DIR) it starts from the prewarmed, offline cache built by
+    `sandbox_prewarm.py warm`. With `server_url` it instead attaches to a running
+    `entrypoint.sh streamable-http` server over pooled sessions; dependencies are
+    then the server's `DEPS`.
     """
-    def __init__(self, dependencies: Sequence[str] | None = None, log_handler=_sb_log):
+    def __init__(
+        self,
+        dependencies: Sequence[str] | None = None,
+        log_handler=_sb_log,
+        cache_dir: str | None = None,
+        server_url: str | None = None,
+    ):
         self.deps = list(dependencies or [])
         self.log_handler = log_handler
+        self.cache_dir = cache_dir
+        self.server_url = server_url
         self._loop_thread = _LoopThread()
         self._ctx = None
         self._sb = None
@@ -147,7 +177,10 @@ class SandboxClient:
     def start(self):
         self._loop_thread.start()
         loop = self._loop_thread.loop
-        self._ctx = code_sandbox(dependencies=self.deps, log_handler=self.log_handler)
+        if self.server_url:
+            self._ctx = http_sandbox(self.server_url)
+        else:
+            self._ctx = open_code_sandbox(self.deps, self.log_handler, self.cache_dir)
         self._sb = asyncio.run_coroutine_threadsafe(self._ctx.__aenter__(), loop).result()
 
     def eval(self, code: str, vars: Dict[str, Any] | None = None, timeout: float = 8.0) -> Dict[str, Any]:
@@ -172,9 +205,52 @@ class SandboxClient:
         finally:
             self._loop_thread.stop()
 
+SANDBOX_BACKENDS = ("pyodide", "native", "native-pool")
+
+class SandboxClient:
+    """
+    Synchronous façade over an execution backend: anything with
+    `start()`, `eval(code, vars, timeout) -> dict` and `close()`.
+    "pyodide" (default) runs code in the mcp-run-python sandbox; "native" forks each
+    evaluation from a preloaded CPython zygote and "native-pool" reuses CPython worker
+    processes (native_sandbox.py), for production-representative timings of trusted code only.
+    """
+    def __init__(
+        self,
+        dependencies: Sequence[str] | None = None,
+        log_handler=_sb_log,
+        cache_dir: str | None = None,
+        server_url: str | None = None,
+        backend: str | Any = "pyodide",
+    ):
+        if backend == "pyodide":
+            self._backend = PyodideBackend(dependencies, log_handler, cache_dir, server_url)
+        elif backend == "native":
+            self._backend = ZygoteSandbox(dependencies=dependencies or (), log_handler=log_handler)
+        elif backend == "native-pool":
+            self._backend = NativeSandbox(dependencies=dependencies or (), log_handler=log_handler)
+        elif isinstance(backend, str):
+            raise ValueError(f"unknown sandbox backend {backend!r}; expected one of {SANDBOX_BACKENDS}")
+        else:
+            self._backend = backend
+        self.backend = backend if isinstance(backend, str) else type(backend).__name__
+
+    def start(self):
+        self._backend.start()
+
+    def eval(self, code: str, vars: Dict[str, Any] | None = None, timeout: float = 8.0) -> Dict[str, Any]:
+        return self._backend.eval(code, vars, timeout=timeout)
+
+    def close(self):
+        self._backend.close()
+
 # --- sandboxed test/bench ----------------------------------------------------
 
 def run_unit_tests(sb: SandboxClient, code: str) -> tuple[bool, str]:
+    # hopeless code never reaches the sandbox; callers skip run_benchmark when this fails
+    screen = prescreen(code)
+    if screen is not None:
+        return False, screen.note
     code_src = _esc_triple_single(code)
     payload = f"""
 NS = {{}}
@@ -253,6 +329,16 @@ ___RV___
         pass
     return False, f"sandbox_error_or_empty_output: {res.get('error')!r}"
 
+# memory stage of run_benchmark: n values (stops early once a call exceeds the budget)
+MEM_NS = (8, 16, 32, 64, 128)
+MEM_CALL_BUDGET_S = 0.05
+MEM_O1_BYTES_PER_N = 8.0  # below this many peak bytes per extra n the curve counts as flat
+# big-n stage: F(n) has ~0.694n bits, so big-integer cost dominates and O(n) vs O(log n) shows
+BIG_NS = (1_000, 10_000, 100_000, 1_000_000)
+BIG_BUDGET_S = 1.0  # wall-clock cap for the whole stage
+BIG_MAX_GROWTH = 4.0  # small-n growth ratio above which the stage is skipped (exponential time)
+BIG_SEQ_MAX_BYTES = 64 << 20  # largest materialised list of F(0..n-1) the stage will ask for
+
 def run_benchmark(sb: SandboxClient, code: str) -> dict:
     code_src = _esc_triple_single(code)
     payload = f"""
@@ -260,7 +346,178 @@ NS = {{}}
 SRC = r'''{code_src}'''
 exec(compile(SRC, '<user>', 'exec'), NS, NS)
 
-import json, time, tracemalloc
+import json, time, tracemalloc, gc, math, sys
+
+MEM_NS = {MEM_NS!r}
+MEM_CALL_BUDGET_S = {MEM_CALL_BUDGET_S!r}
+
+def _consume(fn, n, contract):
+    # peak live blocks above the start while the output is produced and consumed
+    b0 = sys.getallocatedblocks()
+    peak_blocks = 0
+    if contract == "nth":
+        fn(n)
+    else:
+        try:
+            out = fn(n)
+        except TypeError:
+            out = fn()
+        if isinstance(out, (list, tuple)):
+            peak_blocks = sys.getallocatedblocks() - b0
+        else:
+            for i, _ in enumerate(out):
+                if i >= n:
+                    break
+                if not i & 7:
+                    peak_blocks = max(peak_blocks, sys.getallocatedblocks() - b0)
+        del out
+    return max(peak_blocks, sys.getallocatedblocks() - b0)
+
+def _memory_profile(fn, contract):
+    rows = []
+    gc.collect()
+    tracemalloc.start()
+    try:
+        for n in MEM_NS:
+            gc.collect()
+            base, _ = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+            blocks0 = sys.getallocatedblocks()
+            t0 = time.perf_counter()
+            peak_blocks = _consume(fn, n, contract)
+            dt = time.perf_counter() - t0
+            _, peak = tracemalloc.get_traced_memory()
+            gc.collect()
+            current, _ = tracemalloc.get_traced_memory()
+            rows.append((n, peak - base, max(0, current - base), max(0, peak_blocks),
+                         max(0, sys.getallocatedblocks() - blocks0)))
+            if dt > MEM_CALL_BUDGET_S:
+                break
+    finally:
+        tracemalloc.stop()
+
+    mem = {{
+        "ns": [r[0] for r in rows],
+        "peak_bytes": [r[1] for r in rows],
+        "retained_bytes": [r[2] for r in rows],
+        "peak_blocks": [r[3] for r in rows],
+        "retained_blocks": [r[4] for r in rows],
+        "bytes_per_n": None,
+        "exponent": None,
+        "class": "unknown",
+    }}
+    if len(rows) >= 3:
+        # least-squares fits: bytes per extra n, and the log-log slope of the peak
+        xs = [r[0] for r in rows]
+        ys = [r[1] for r in rows]
+        mx, my = sum(xs) / len(xs), sum(ys) / len(ys)
+        slope = sum((x - mx) * (y - my) for x, y in zip(xs, ys)) / sum((x - mx) ** 2 for x in xs)
+        lx = [math.log(x) for x in xs]
+        ly = [math.log(max(y, 1)) for y in ys]
+        mlx, mly = sum(lx) / len(lx), sum(ly) / len(ly)
+        expo = sum((a - mlx) * (b - mly) for a, b in zip(lx, ly)) / sum((a - mlx) ** 2 for a in lx)
+        mem["bytes_per_n"] = slope
+        mem["exponent"] = expo
+        if slope < {MEM_O1_BYTES_PER_N!r}:
+            mem["class"] = "O(1)"
+        elif expo < 1.5:
+            mem["class"] = "O(n)"
+        else:
+            mem["class"] = "O(n^2)+"
+    return mem
+
+BIG_NS = {BIG_NS!r}
+BIG_BUDGET_S = {BIG_BUDGET_S!r}
+BIG_SEQ_MAX_BYTES = {BIG_SEQ_MAX_BYTES!r}
+BIG_MOD = 1_000_000_007
+
+def _fib_mod(n, m):
+    # reference F(n) mod m by fast doubling, to check huge results cheaply
+    a, b = 0, 1
+    for bit in bin(n)[2:]:
+        c = a * ((2 * b - a) % m) % m
+        d = (a * a + b * b) % m
+        a, b = (d, (c + d) % m) if bit == "1" else (c, d)
+    return a
+
+def _big_call(fn, n, contract, deadline):
+    # -> (seconds, result bits, correct, is_list); None seconds when cut off. is_list is True
+    # when a sequence came back as a list/tuple (memory grows with n), False for a lazy
+    # iterable, None for the nth contract
+    t0 = time.perf_counter()
+    if contract == "nth":
+        v = fn(n)
+        dt = time.perf_counter() - t0
+        return dt, v.bit_length(), v % BIG_MOD == _fib_mod(n, BIG_MOD), None
+    out = fn(n)
+    bits, count, last = 0, 0, 0
+    for v in out:
+        if count >= n:
+            break
+        bits += v.bit_length()
+        count += 1
+        last = v
+        if not count & 1023 and time.perf_counter() > deadline:
+            return None, bits, True, None
+    dt = time.perf_counter() - t0
+    ok = count == n and last % BIG_MOD == _fib_mod(n - 1, BIG_MOD)
+    return dt, bits, ok, isinstance(out, (list, tuple))
+
+def _big_n_tier(fn, contract, per_call_s):
+    big = {{"ns": [], "ms": [], "bits": [], "ns_per_bit": [], "exponent": None,
+           "max_n": None, "correct": True, "budget_s": BIG_BUDGET_S, "notes": ""}}
+    start = time.perf_counter()
+    deadline = start + BIG_BUDGET_S
+    prev_n, prev_s, expo, is_list = 30, per_call_s, 2.0, False
+    for n in BIG_NS:
+        # a linear loop over k-bit integers is ~n^2, so assume that until two points are measured
+        predicted = prev_s * (n / prev_n) ** expo
+        if time.perf_counter() + predicted > deadline:
+            big["notes"] = f"stopped before n={{n}}: predicted {{predicted:.2f}}s over the {{BIG_BUDGET_S}}s cap"
+            break
+        if is_list and 0.0434 * n * n + 36 * n > BIG_SEQ_MAX_BYTES:
+            big["notes"] = f"stopped before n={{n}}: list output over {{BIG_SEQ_MAX_BYTES >> 20}} MB"
+            break
+        try:
+            dt, bits, ok, is_list = _big_call(fn, n, contract, deadline)
+        except RecursionError:
+            # recursive solutions hit the interpreter's depth limit at large n; that caps
+            # how far the tier gets, it is not a wrong answer
+            big["notes"] = f"stopped at n={{n}}: recursion limit"
+            break
+        except TypeError as e:
+            if contract == "sequence" and not big["ns"]:
+                big["notes"] = "sequence takes no n argument"
+                break
+            big["correct"] = False
+            big["notes"] = f"n={{n}}: {{e!r}}"[:200]
+            break
+        except Exception as e:
+            big["correct"] = False
+            big["notes"] = f"n={{n}}: {{e!r}}"[:200]
+            break
+        if dt is None:
+            big["notes"] = f"stopped during n={{n}}: over the {{BIG_BUDGET_S}}s cap"
+            break
+        if not ok:
+            big["correct"] = False
+            big["notes"] = f"wrong result at n={{n}}"
+            break
+        big["ns"].append(n)
+        big["ms"].append(dt * 1000.0)
+        big["bits"].append(bits)
+        big["ns_per_bit"].append(dt * 1e9 / max(1, bits))
+        if len(big["ns"]) >= 2 and dt > 0 and prev_s > 0:
+            expo = max(1.0, math.log(dt / prev_s) / math.log(n / prev_n))
+        prev_n, prev_s = n, max(dt, 1e-7)
+    if big["ns"]:
+        big["max_n"] = big["ns"][-1]
+    if len(big["ns"]) >= 2:
+        lx = [math.log(x) for x in big["ns"]]
+        ly = [math.log(max(y, 1e-6)) for y in big["ms"]]
+        mlx, mly = sum(lx) / len(lx), sum(ly) / len(ly)
+        big["exponent"] = sum((a - mlx) * (b - mly) for a, b in zip(lx, ly)) / sum((a - mlx) ** 2 for a in lx)
+    return big
 
 result = {{
     "contract": "missing",
@@ -343,6 +600,25 @@ try:
             result["notes"] = "sequence: timed at n=30 with peak memory"
         else:
             result["notes"] = "unknown contract"
+
+        if contract in ("nth", "sequence"):
+            try:
+                result["memory"] = _memory_profile(fn, contract)
+            except RecursionError:
+                result["memory"] = {{"class": "unknown", "notes": "recursion error"}}
+            except Exception as e:
+                result["memory"] = {{"class": "unknown", "notes": repr(e)}}
+
+            if result["growth_ratio"] is not None and result["growth_ratio"] >= {BIG_MAX_GROWTH!r}:
+                result["big_n"] = {{"ns": [], "max_n": None, "correct": True, "exponent": None,
+                                   "notes": "skipped: exponential growth at n=20..30"}}
+            else:
+                per_call_s = result["runtime30_ms"] / 1000.0 / (600 if contract == "nth" else 300)
+                try:
+                    result["big_n"] = _big_n_tier(fn, contract, per_call_s)
+                except Exception as e:
+                    result["big_n"] = {{"ns": [], "max_n": None, "correct": False, "exponent": None,
+                                       "notes": repr(e)[:200]}}
 except RecursionError:
     result["runtime_ms"] = float('inf')
     result["growth_ratio"] = float('inf')
@@ -352,7 +628,7 @@ except Exception as e:
 
 result
 """
-    res = sb.eval(payload, timeout=6.0)
+    res = sb.eval(payload, timeout=6.0 + BIG_BUDGET_S)
     if res.get("status") == "success" and isinstance(res.get("return_value"), dict):
         data = res["return_value"]
         if data.get("runtime_ms") is None:
@@ -381,9 +657,14 @@ def refine_prompt(
     fail_note: str,
     bench: Dict[str, Any],
     budget_ms: float,
+    template: str = PROMPT_REFINE_BASE,
 ) -> str:
     fb = []
-    if test_ok is False:
+    code = extract_python_block(answer)
+    screen = prescreen(code) if code else None
+    if screen is not None:
+        fb.append(f"Rejected before execution ({screen.kind}): {screen.message}. {screen.hint}")
+    elif test_ok is False:
         fb.append("Unit tests failed. Fix correctness first.\n" + fail_note)
     elif test_ok is None:
         fb.append("No valid ```python fenced block``` detected. Return exactly one fenced block.")
@@ -400,126 +681,379 @@ def refine_prompt(
     if runtime30_ms is not None and runtime30_ms != float("inf"):
         fb.append(f"Measured runtime n=30: {float(runtime30_ms):.3f} ms.")
     fb.append(f"Target budget (n=30): {budget_ms:.3f} ms.")
+    if code and (screen is None or screen.kind != "syntax"):
+        fb.append(f"Structure: {analyze(code).summary()}.")
     if contract:
         fb.append(f"Detected API contract: {contract}. Prefer iterative or fast doubling where applicable.")
     if growth is not None:
         fb.append(f"Growth ratio time(n=30)/time(n=20) ≈ {float(growth):.2f}.")
+    big_note = _big_n_note(bench)
+    if big_note:
+        fb.append(f"Large-n tier (big integers, {BIG_BUDGET_S:.1f}s cap, up to n={BIG_NS[-1]:,}): {big_note}.")
     fb.append(PERF_TIPS)
-    return PROMPT_REFINE_BASE.format(answer=answer, feedback="\n".join(fb))
+    return template.format(answer=answer, feedback="\n".join(fb))
 
-def _perf_score_dual(runtime20_ms: float | None, runtime30_ms: float | None, budget_ms: float) -> float:
+@dataclass(frozen=True)
+class ScoreWeights:
+    """
+    Weights and breakpoints of the `evaluate_answer` rubric. The scalar helpers and
+    `evaluate_batch` both read them, so re-scoring under `replace(SCORE_WEIGHTS, ...)`
+    matches what a live run with those weights would have produced.
+    """
+    correctness: float = 0.55
+    perf: float = 0.28
+    untested_correctness: float = 0.8  # tests_ok is None
+    failed_score: float = 0.35  # returned as is when tests fail
+    # perf: 1.0 up to perf_full x budget, linear down to perf_slow x budget, then perf_tail / ratio
+    perf_full: float = 1.0
+    perf_slow: float = 2.0
+    perf_slope: float = 0.6
+    perf_tail: float = 0.4
+    uncapped_perf: float = 0.98
+    # contract bonus
+    nth_flat_bonus: float = 0.18
+    nth_flat_growth: float = 1.15
+    sequence_bonus: float = 0.10
+    nth_bonus: float = 0.08
+    # growth ladder: (ratio at or above, penalty), highest first
+    growth_missing: float = 0.25
+    growth_steps: tuple[tuple[float, float], ...] = ((4.0, 0.25), (2.0, 0.18), (1.6, 0.10), (1.3, 0.04))
+    # memory
+    memory_class_penalty: tuple[tuple[str, float], ...] = (("O(1)", 0.0), ("O(n)", 0.08), ("O(n^2)+", 0.12))
+    retained_bytes: int = 4096
+    retained_penalty: float = 0.03
+    memory_cap: float = 0.15
+    bytes_free: int = 6000
+    bytes_scale: float = 50000.0
+    bytes_cap: float = 0.12
+    # big-n tier
+    big_per_decade: float = 0.02
+    big_base_decade: float = 3.0
+    big_cap: float = 0.06
+    big_wrong_penalty: float = 0.06
+    # blend with the LLM judge
+    rubric_weight: float = 0.82
+    judge_weight: float = 0.18
+    judge_base: float = 0.25
+    judge_scale: float = 0.5
+    judge_fallback: float = 0.5
+    capped_max: float = 0.985
+
+SCORE_WEIGHTS = ScoreWeights()
+
+# set by mcts_node when RUN_RECORD names a file; evaluate_answer logs every candidate to it
+recorder: RunRecorder | None = None
+
+def _perf_score_dual(runtime20_ms: float | None, runtime30_ms: float | None, budget_ms: float,
+                     w: ScoreWeights = SCORE_WEIGHTS) -> float:
     if runtime30_ms is None or runtime30_ms == float("inf"):
         return 0.0
     r = max(0.0, float(runtime30_ms) / max(1e-6, budget_ms))
-    if r <= 1.0:
+    if r <= w.perf_full:
         return 1.0
-    if r <= 2.0:
-        return max(0.0, 1.0 - 0.6 * (r - 1.0))
-    return max(0.0, 0.4 * (1.0 / r))
+    if r <= w.perf_slow:
+        return max(0.0, 1.0 - w.perf_slope * (r - w.perf_full))
+    return max(0.0, w.perf_tail * (1.0 / r))
 
-def _contract_bonus(contract: str | None, growth: float | None) -> float:
-    if contract == "nth" and growth is not None and float(growth) < 1.15:
-        return 0.18
+def _contract_bonus(contract: str | None, growth: float | None, w: ScoreWeights = SCORE_WEIGHTS) -> float:
+    if contract == "nth" and growth is not None and float(growth) < w.nth_flat_growth:
+        return w.nth_flat_bonus
     if contract == "sequence":
-        return 0.10
+        return w.sequence_bonus
     if contract == "nth":
-        return 0.08
+        return w.nth_bonus
     return 0.0
 
-def _growth_penalty(growth: float | None) -> float:
+def _growth_penalty(growth: float | None, w: ScoreWeights = SCORE_WEIGHTS) -> float:
     if growth is None:
-        return 0.25
+        return w.growth_missing
     g = float(growth)
     if g == float("inf"):
-        return 0.25
-    if g >= 4.0:
-        return 0.25
-    if g >= 2.0:
-        return 0.18
-    if g >= 1.6:
-        return 0.10
-    if g >= 1.3:
-        return 0.04
+        return w.growth_missing
+    for at_least, pen in w.growth_steps:
+        if g >= at_least:
+            return pen
     return 0.0
 
 def _structure_bonus(src: str) -> float:
+    facts = analyze(src)
     b = 0.0
-    if "yield" in src:
+    if facts.has_yield:
         b += 0.08
-    if re.search(r"def\s+fib(?:onacci)?\s*\(.*\)\s*->\s*[\w\[\], ]+", src):
+    named = [f for f in (facts.function("fib"), facts.function("fibonacci")) if f is not None]
+    if any(f.returns_annotated for f in named):
         b += 0.03
-    if re.search(r'"""[^"]{10,}"""', src) or re.search(r"'''[^']{10,}'''", src):
+    if facts.docstring:
         b += 0.03
-    if re.search(r"def\s+(fib|fibonacci)\s*\(", src):
+    if named:
         b += 0.02
-    lines = [ln for ln in src.splitlines() if ln.strip()]
-    if len(lines) > 60:
+    if facts.nonblank_lines > 60:
         b -= 0.04
-    comment_lines = sum(1 for ln in lines if ln.lstrip().startswith("#"))
-    if comment_lines >= 1:
+    if facts.comment_lines >= 1:
         b -= 0.03
-    if re.search(r"#\s*example", src, re.I):
+    if facts.example_comment:
         b -= 0.02
     return max(-0.08, min(0.12, b))
 
-def _memory_penalty_bytes(bytes_used: int | None, contract: str | None) -> float:
+def _memory_penalty_bytes(bytes_used: int | None, contract: str | None, w: ScoreWeights = SCORE_WEIGHTS) -> float:
     if bytes_used is None or contract != "sequence":
         return 0.0
-    if bytes_used <= 6000:
+    if bytes_used <= w.bytes_free:
         return 0.0
-    return min(0.12, (bytes_used - 6000) / 50000.0)
+    return min(w.bytes_cap, (bytes_used - w.bytes_free) / w.bytes_scale)
+
+def _memory_note(bench: dict | None) -> str:
+    mem = (bench or {}).get("memory") or {}
+    if mem.get("class") in (None, "unknown"):
+        return ""
+    return f" | growth {mem['class']} ({mem['bytes_per_n']:.1f} B/n, retained {max(mem['retained_bytes'])} B)"
+
+def _memory_penalty(bench: dict, w: ScoreWeights = SCORE_WEIGHTS) -> float:
+    """
+    Penalty from the memory stage of `run_benchmark`. Peak memory that grows with n
+    is penalised because an O(1) generator or loop exists for both contracts, and
+    memory still held after the call (module-level caches) costs extra. Benches
+    without a memory profile fall back to the n=30 tracemalloc peak.
+    """
+    mem = bench.get("memory") or {}
+    cls = mem.get("class")
+    if cls in (None, "unknown"):
+        return _memory_penalty_bytes(bench.get("bytes_used"), bench.get("contract"), w)
+    pen = dict(w.memory_class_penalty).get(cls, 0.0)
+    if max(mem.get("retained_bytes") or [0]) > w.retained_bytes:
+        pen += w.retained_penalty
+    return min(w.memory_cap, pen)
+
+def _big_n_note(bench: dict | None) -> str:
+    big = (bench or {}).get("big_n") or {}
+    if not big.get("ns"):
+        return big.get("notes", "")
+    expo = big.get("exponent")
+    shape = f", time ~ n^{expo:.2f}" if expo is not None else ""
+    tail = "" if big.get("correct", True) else " (wrong beyond)"
+    return f"n={big['max_n']:,}{tail} at {big['ns_per_bit'][-1]:.2f} ns/bit{shape}"
+
+def _big_n_bonus(bench: dict, w: ScoreWeights = SCORE_WEIGHTS) -> float:
+    """
+    Reward for the big-n stage of `run_benchmark`: +0.02 per decade of n beyond 10^3
+    reached inside BIG_BUDGET_S (a fast-doubling nth reaches 10^6, a linear loop
+    about 10^5), and a penalty when large n gives a wrong result or raises
+    (hitting the recursion limit only ends the tier).
+    """
+    big = bench.get("big_n") or {}
+    if big.get("correct") is False:
+        return -w.big_wrong_penalty
+    max_n = big.get("max_n")
+    if not max_n:
+        return 0.0
+    return max(0.0, min(w.big_cap, w.big_per_decade * (math.log10(max_n) - w.big_base_decade)))
+
+def _uncapped(tests_ok: Optional[bool], perf: float, g_pen: float, m_pen: float,
+              w: ScoreWeights = SCORE_WEIGHTS) -> bool:
+    return tests_ok is True and perf >= w.uncapped_perf and g_pen == 0.0 and m_pen == 0.0
+
+def is_optimal(tests_ok: Optional[bool], bench: dict, budget_ms: float = 5.0,
+               w: ScoreWeights = SCORE_WEIGHTS) -> bool:
+    """True when `evaluate_answer` would return the uncapped score for this bench."""
+    perf = _perf_score_dual(bench.get("runtime20_ms"), bench.get("runtime30_ms") or bench.get("runtime_ms"), budget_ms, w)
+    g_pen = _growth_penalty(bench.get("growth_ratio"), w)
+    m_pen = _memory_penalty(bench, w)
+    return _uncapped(tests_ok, perf, g_pen, m_pen, w)
+
+def _judge_score(answer: str) -> float | None:
+    """Raw 0..1 judge score, or None when the judge call fails."""
+    try:
+        structured = judge.with_structured_output(ScoreResponse)
+        return float(structured.invoke([HumanMessage(
+            content=("Score 0..1 as JSON {\"score\": x}. "
+                     "Focus on API clarity, naming, docstring, and usability only.\n\n"
+                     f"Answer:\n{answer}")
+        )]).score)
+    except Exception:
+        return None
 
 def evaluate_answer(
     answer: str,
     tests_ok: Optional[bool],
     bench: dict,
     budget_ms: float = 5.0,
+    w: ScoreWeights = SCORE_WEIGHTS,
 ) -> float:
     if tests_ok is False:
-        return 0.35
+        if recorder is not None:
+            recorder.record(answer, tests_ok, bench, budget_ms, None, None, w.failed_score)
+        return w.failed_score
 
     contract = bench.get("contract")
     growth = bench.get("growth_ratio")
     rt20 = bench.get("runtime20_ms")
     rt30 = bench.get("runtime30_ms") or bench.get("runtime_ms")
-    bytes_used = bench.get("bytes_used")
 
-    perf = _perf_score_dual(rt20, rt30, budget_ms)
+    perf = _perf_score_dual(rt20, rt30, budget_ms, w)
     src = extract_python_block(answer) or ""
     s_bonus = _structure_bonus(src)
-    c_bonus = _contract_bonus(contract, growth)
-    g_pen = _growth_penalty(growth)
-    m_pen = _memory_penalty_bytes(bytes_used, contract)
+    c_bonus = _contract_bonus(contract, growth, w)
+    g_pen = _growth_penalty(growth, w)
+    m_pen = _memory_penalty(bench, w)
+    b_bonus = _big_n_bonus(bench, w)
 
-    correctness = 1.0 if tests_ok is True else 0.8
+    correctness = 1.0 if tests_ok is True else w.untested_correctness
 
     rubric = (
-        0.55 * correctness +
-        0.28 * perf +
-        c_bonus + s_bonus -
+        w.correctness * correctness +
+        w.perf * perf +
+        c_bonus + s_bonus + b_bonus -
         g_pen - m_pen
     )
     rubric = max(0.0, min(1.0, rubric))
 
-    try:
-        structured = judge.with_structured_output(ScoreResponse)
-        j = structured.invoke([HumanMessage(
-            content=("Score 0..1 as JSON {\"score\": x}. "
-                     "Focus on API clarity, naming, docstring, and usability only.\n\n"
-                     f"Answer:\n{answer}")
-        )]).score
-        judge_part = 0.25 + 0.5 * float(j)
-    except Exception:
-        judge_part = 0.5
+    j = _judge_score(answer)
+    judge_part = w.judge_fallback if j is None else w.judge_base + w.judge_scale * j
+
+    blended = w.rubric_weight * rubric + w.judge_weight * judge_part
+    if _uncapped(tests_ok, perf, g_pen, m_pen, w):
+        score = min(1.0, blended)
+    else:
+        score = min(w.capped_max, blended)
+    if recorder is not None:
+        recorder.record(answer, tests_ok, bench, budget_ms, j, judge_part, score)
+    return score
+
+# --- batch scoring -----------------------------------------------------------
+
+# One row per candidate; evaluate_batch scores a whole array with the rubric above.
+BENCH_DTYPE = np.dtype([
+    ("tests_ok", "i1"),  # 1 passed, 0 failed, -1 not run (None)
+    ("contract", "U8"),
+    ("growth", "f8"),  # NaN when missing
+    ("runtime30_ms", "f8"),  # runtime30_ms or runtime_ms; NaN when missing
+    ("budget_ms", "f8"),
+    ("bytes_used", "f8"),  # NaN when missing
+    ("mem_class", "U8"),  # "" when the bench has no usable memory profile
+    ("mem_retained_max", "f8"),
+    ("big_correct", "?"),
+    ("big_decades", "f8"),  # log10 of the largest big-n size reached; NaN when none
+    ("structure", "f8"),  # _structure_bonus of the answer's code
+    ("judge", "f8"),  # raw judge score; NaN when the judge call failed
+])
+
+def _num(x: Any) -> float:
+    return float("nan") if x is None else float(x)
+
+def bench_records(
+    candidates: Sequence[tuple[str, Optional[bool], dict]],
+    budget_ms: float | Sequence[float] = 5.0,
+    judge_scores: Sequence[float | None] | None = None,
+) -> np.ndarray:
+    """
+    Pack (answer, tests_ok, bench) triples into a BENCH_DTYPE array. Judge scores are
+    taken as given (e.g. from a recorded run); None or a missing list scores as a
+    failed judge call.
+    """
+    rows = []
+    for i, (answer, tests_ok, bench) in enumerate(candidates):
+        bench = bench or {}
+        mem = bench.get("memory") or {}
+        big = bench.get("big_n") or {}
+        cls = mem.get("class")
+        budget = budget_ms if isinstance(budget_ms, (int, float)) else budget_ms[i]
+        j = judge_scores[i] if judge_scores is not None else None
+        rows.append((
+            -1 if tests_ok is None else int(bool(tests_ok)),
+            bench.get("contract") or "",
+            _num(bench.get("growth_ratio")),
+            _num(bench.get("runtime30_ms") or bench.get("runtime_ms")),
+            float(budget),
+            _num(bench.get("bytes_used")),
+            "" if cls in (None, "unknown") else cls,
+            float(max(mem.get("retained_bytes") or [0])),
+            big.get("correct") is not False,
+            math.log10(big["max_n"]) if big.get("max_n") else float("nan"),
+            _structure_bonus(extract_python_block(answer) or ""),
+            _num(j),
+        ))
+    return np.array(rows, dtype=BENCH_DTYPE)
+
+def evaluate_batch(records: np.ndarray, w: ScoreWeights = SCORE_WEIGHTS) -> np.ndarray:
+    """
+    `evaluate_answer` over a BENCH_DTYPE array, with judge scores read from the
+    records instead of calling the judge. Operations run in the scalar path's order,
+    so each score equals `evaluate_answer` for the same inputs and weights.
+    """
+    tests_ok = records["tests_ok"]
+    contract = records["contract"]
+    growth = records["growth"]
+    rt = records["runtime30_ms"]
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        timed = np.isfinite(rt)
+        r = np.maximum(0.0, np.where(timed, rt, 0.0) / np.maximum(1e-6, records["budget_ms"]))
+        perf = np.select(
+            [~timed, r <= w.perf_full, r <= w.perf_slow],
+            [0.0, 1.0, np.maximum(0.0, 1.0 - w.perf_slope * (r - w.perf_full))],
+            np.maximum(0.0, w.perf_tail * (1.0 / r)),
+        )
+
+    nth = contract == "nth"
+    c_bonus = np.select(
+        [nth & (growth < w.nth_flat_growth), contract == "sequence", nth],
+        [w.nth_flat_bonus, w.sequence_bonus, w.nth_bonus],
+        0.0,
+    )
 
-    blended = 0.82 * rubric + 0.18 * judge_part
-    if tests_ok is True and perf >= 0.98 and g_pen == 0.0 and m_pen == 0.0:
-        return min(1.0, blended)
-    return min(0.985, blended)
+    g_pen = np.select(
+        [np.isnan(growth) | np.isinf(growth)] + [growth >= at_least for at_least, _ in w.growth_steps],
+        [w.growth_missing] + [pen for _, pen in w.growth_steps],
+        0.0,
+    )
+
+    cls = records["mem_class"]
+    cls_pen = np.zeros(len(records))
+    for name, pen in w.memory_class_penalty:
+        cls_pen = np.where(cls == name, pen, cls_pen)
+    cls_pen = np.where(records["mem_retained_max"] > w.retained_bytes, cls_pen + w.retained_penalty, cls_pen)
+    cls_pen = np.minimum(w.memory_cap, cls_pen)
+    used = records["bytes_used"]
+    bytes_pen = np.where(
+        np.isnan(used) | (contract != "sequence") | (used <= w.bytes_free),
+        0.0,
+        np.minimum(w.bytes_cap, (used - w.bytes_free) / w.bytes_scale),
+    )
+    m_pen = np.where(cls != "", cls_pen, bytes_pen)
+
+    decades = records["big_decades"]
+    b_bonus = np.where(
+        ~records["big_correct"],
+        -w.big_wrong_penalty,
+        np.where(np.isnan(decades), 0.0,
+                 np.maximum(0.0, np.minimum(w.big_cap, w.big_per_decade * (decades - w.big_base_decade)))),
+    )
+
+    correctness = np.where(tests_ok == 1, 1.0, w.untested_correctness)
+    rubric = (
+        w.correctness * correctness +
+        w.perf * perf +
+        c_bonus + records["structure"] + b_bonus -
+        g_pen - m_pen
+    )
+    rubric = np.maximum(0.0, np.minimum(1.0, rubric))
+
+    j = records["judge"]
+    judge_part = np.where(np.isnan(j), w.judge_fallback, w.judge_base + w.judge_scale * j)
+    blended = w.rubric_weight * rubric + w.judge_weight * judge_part
+
+    uncapped = (tests_ok == 1) & (perf >= w.uncapped_perf) & (g_pen == 0.0) & (m_pen == 0.0)
+    scores = np.where(uncapped, np.minimum(1.0, blended), np.minimum(w.capped_max, blended))
+    return np.where(tests_ok == 0, w.failed_score, scores)
 
 # --- role functions used by nodes & MCTS ------------------------------------
 
-def role_coder(sb: SandboxClient, parent: Optional[NodeState], step_idx: int) -> NodeState:
+def role_coder(
+    sb: SandboxClient,
+    parent: Optional[NodeState],
+    step_idx: int,
+    template: str = PROMPT_REFINE_BASE,
+) -> NodeState:
     budgets = (4.0, 6.0, 8.0)
     budget = budgets[step_idx % len(budgets)]
     if parent is None:
@@ -539,7 +1073,7 @@ def role_coder(sb: SandboxClient, parent: Optional[NodeState], step_idx: int) ->
         bench = run_benchmark(sb, code) if ok else {"runtime_ms": float("inf"), "contract": "missing",
                                                     "growth_ratio": None, "runtime20_ms": None,
                                                     "runtime30_ms": None, "bytes_used": None}
-    out = refine_answer(sb, parent.llm_answer, parent.score, ok, note, bench, budget_ms=budget)
+    out = refine_answer(sb, parent.llm_answer, parent.score, ok, note, bench, budget_ms=budget, template=template)
     out.messages = (parent.messages if parent else []) + [f"[coder] refined code (prev={parent.score:.3f} → new={out.score:.3f})"]
     out.note = f"[coder] {out.note or 'refined'}"
     return out
@@ -563,25 +1097,37 @@ def role_tester(sb: SandboxClient, parent: Optional[NodeState]) -> NodeState:
         bench = run_benchmark(sb, code) if tests_ok else {"runtime_ms": float("inf"), "contract": "missing",
                                                           "growth_ratio": None, "runtime20_ms": None,
                                                           "runtime30_ms": None, "bytes_used": None}
-    score = evaluate_answer(parent.llm_answer, tests_ok, bench, budget_ms=6.0)
-    out = NodeState(llm_answer=parent.llm_answer, score=score, tests_ok=tests_ok, bench=bench, note=note)
+    # same budget as the parent's score, so the difference is not budget mismatch
+    budget = parent.budget_ms if parent.budget_ms is not None else 6.0
+    score = evaluate_answer(parent.llm_answer, tests_ok, bench, budget_ms=budget)
+    out = NodeState(llm_answer=parent.llm_answer, score=score, tests_ok=tests_ok, bench=bench, note=note,
+                    budget_ms=budget)
     out.messages = parent.messages + [f"[tester] tests_ok={tests_ok} rt={(bench.get('runtime30_ms') or bench.get('runtime_ms'))}"]
     out.note = f"[tester] {out.note or 'tested'}"
     return out
 
 
-def role_reviewer(sb: SandboxClient, parent: Optional[NodeState]) -> NodeState:
+def role_reviewer(
+    sb: SandboxClient,
+    parent: Optional[NodeState],
+    lite: bool = False,
+    gate: Optional[ReviewGate] = None,
+) -> NodeState:
     if parent is None:
         out = role_coder(sb, parent, 0)
         out.messages.append("[reviewer] nothing to review; invoked coder")
         out.note = f"[reviewer] {out.note}"
         return out
 
+    t0 = time.perf_counter()
+    template = PROMPT_REVIEW_LITE if lite else PROMPT_REVIEW_BASE
     msgs: Sequence[BaseMessage] = [
         SystemMessage(content="You improve clarity and typing. Return only one ```python block."),
-        HumanMessage(content=PROMPT_REVIEW_BASE.format(answer=parent.llm_answer)),
+        HumanMessage(content=template.format(answer=parent.llm_answer)),
     ]
-    reviewed = review_llm.invoke(msgs).content.strip()
+    resp = review_llm.invoke(msgs)
+    tokens = int((getattr(resp, "usage_metadata", None) or {}).get("total_tokens", 0))
+    reviewed = resp.content.strip()
     code = extract_python_block(reviewed)
     if not code:
         tests_ok, note = None, "no code block found"
@@ -589,12 +1135,23 @@ def role_reviewer(sb: SandboxClient, parent: Optional[NodeState]) -> NodeState:
                  "runtime20_ms": None, "runtime30_ms": None, "bytes_used": None}
     else:
         tests_ok, note = run_unit_tests(sb, code)
-        bench = run_benchmark(sb, code) if tests_ok else {"runtime_ms": float("inf"), "contract": "missing",
-                                                          "growth_ratio": None, "runtime20_ms": None,
-                                                          "runtime30_ms": None, "bytes_used": None}
-    score = evaluate_answer(reviewed, tests_ok, bench, budget_ms=6.0)
-    out = NodeState(llm_answer=reviewed, score=score, tests_ok=tests_ok, bench=bench, note=note)
-    out.messages = parent.messages + [f"[reviewer] adjusted API/readability (score={score:.3f})"]
+        parent_code = extract_python_block(parent.llm_answer) or ""
+        if lite and tests_ok and parent.bench and logic_hash(code) is not None \
+                and logic_hash(code) == logic_hash(parent_code):
+            # only docstrings/hints changed, as a lite review should; reuse the tester's bench
+            bench = dict(parent.bench)
+        else:
+            bench = run_benchmark(sb, code) if tests_ok else {"runtime_ms": float("inf"), "contract": "missing",
+                                                              "growth_ratio": None, "runtime20_ms": None,
+                                                              "runtime30_ms": None, "bytes_used": None}
+    # scored at the parent's budget, like the tester, so the score change is the review's
+    budget = parent.budget_ms if parent.budget_ms is not None else 6.0
+    score = evaluate_answer(reviewed, tests_ok, bench, budget_ms=budget)
+    if gate is not None:
+        gate.record_review(lite, time.perf_counter() - t0, tokens)
+    out = NodeState(llm_answer=reviewed, score=score, tests_ok=tests_ok, bench=bench, note=note, budget_ms=budget)
+    action = "polished docstring/typing" if lite else "adjusted API/readability"
+    out.messages = parent.messages + [f"[reviewer] {action} (score={score:.3f})"]
     out.note = f"[reviewer] {out.note or 'reviewed'}"
     return out
 
@@ -605,6 +1162,98 @@ class AgentState(TypedDict, total=False):
     parent: Optional[NodeState]
     step_idx: int
     out: NodeState
+    review: Literal["full", "lite", "skip"]
+    review_reason: str
+
+def _changed_lines(before: str, after: str) -> int:
+    diff = difflib.ndiff(before.splitlines(), after.splitlines())
+    return sum(1 for ln in diff if ln.startswith(("+ ", "- ")))
+
+def _was_reviewed(state: NodeState) -> bool:
+    return bool(state.messages) and state.messages[-1].startswith("[reviewer]")
+
+@dataclass
+class ReviewGate:
+    """
+    Decides after the tester whether the reviewer runs in full, as a short
+    docstring/typing pass, or not at all, and tallies the time and tokens saved.
+    Savings are priced at the measured average of full reviews so far.
+    """
+    token_budget: Optional[int] = None  # review tokens for the whole run; None = unlimited
+    lite_max_diff: int = 6              # optimal candidates changed by at most this many lines are skipped
+    budget_ms: float = 6.0              # for candidates that carry no budget_ms of their own
+    est_full_s: float = 15.0            # used until a full review has been measured
+    est_full_tokens: int = 1200
+    full_runs: int = 0
+    full_s: float = 0.0
+    full_tokens: int = 0
+    lite_runs: int = 0
+    lite_tokens: int = 0
+    skipped: int = 0
+    tokens_spent: int = 0
+    saved_s: float = 0.0
+    saved_tokens: int = 0
+
+    def _full_cost(self) -> tuple[float, float]:
+        if self.full_runs:
+            return self.full_s / self.full_runs, self.full_tokens / self.full_runs
+        return self.est_full_s, float(self.est_full_tokens)
+
+    def _lite_tokens(self) -> float:
+        return self.lite_tokens / self.lite_runs if self.lite_runs else self._full_cost()[1] / 3
+
+    def remaining_tokens(self) -> Optional[int]:
+        return None if self.token_budget is None else self.token_budget - self.tokens_spent
+
+    def decide(self, parent: Optional[NodeState], candidate: NodeState) -> tuple[str, str]:
+        code = extract_python_block(candidate.llm_answer) or ""
+        if parent is not None:
+            diff = _changed_lines(extract_python_block(parent.llm_answer) or "", code)
+        else:
+            diff = len(code.splitlines())
+        if parent is not None and diff == 0 and _was_reviewed(parent):
+            return "skip", "unchanged since last review"
+        budget = candidate.budget_ms if candidate.budget_ms is not None else self.budget_ms
+        optimal = is_optimal(candidate.tests_ok, candidate.bench or {}, budget)
+        if optimal and diff <= self.lite_max_diff:
+            return "skip", f"already optimal ({diff} changed lines)"
+        remaining = self.remaining_tokens()
+        if remaining is not None and remaining < self._full_cost()[1]:
+            if remaining >= self._lite_tokens():
+                return "lite", f"review budget low ({remaining} tokens left)"
+            return "skip", "review budget spent"
+        if optimal:
+            return "lite", "already optimal"
+        return "full", f"{diff} changed lines"
+
+    def record_review(self, lite: bool, seconds: float, tokens: int) -> None:
+        self.tokens_spent += tokens
+        if lite:
+            full_s, full_tokens = self._full_cost()
+            self.lite_runs += 1
+            self.lite_tokens += tokens
+            self.saved_s += max(0.0, full_s - seconds)
+            self.saved_tokens += max(0, int(full_tokens) - tokens)
+        else:
+            self.full_runs += 1
+            self.full_s += seconds
+            self.full_tokens += tokens
+
+    def record_skip(self) -> None:
+        full_s, full_tokens = self._full_cost()
+        self.skipped += 1
+        self.saved_s += full_s
+        self.saved_tokens += int(full_tokens)
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "full": self.full_runs,
+            "lite": self.lite_runs,
+            "skipped": self.skipped,
+            "tokens_spent": self.tokens_spent,
+            "saved_s": round(self.saved_s, 3),
+            "saved_tokens": self.saved_tokens,
+        }
 
 def coder_node_ag(state: AgentState, sb: SandboxClient, console: Console) -> Command[Literal["tester_ag"]]:
     console.print("\n[bold blue]┌─ 🤖 Coder Agent ─────────────────────────────┐[/bold blue]")
@@ -628,7 +1277,12 @@ def coder_node_ag(state: AgentState, sb: SandboxClient, console: Console) -> Com
     console.print("[bold]  ↓ Handoff to Tester Agent[/bold]\n")
     return Command(update={"out": s}, goto="tester_ag")
 
-def tester_node_ag(state: AgentState, sb: SandboxClient, console: Console) -> Command[Literal["reviewer_ag"]]:
+def tester_node_ag(
+    state: AgentState,
+    sb: SandboxClient,
+    console: Console,
+    gate: Optional[ReviewGate] = None,
+) -> Command:
     console.print("\n[bold yellow]┌─ 🧪 Tester Agent ─────────────────────────────┐[/bold yellow]")
     with console.status("[bold yellow]Running tests & benchmarks via MCP sandbox...", spinner="dots"):
         s = role_tester(sb, state.get("out"))
@@ -644,7 +1298,8 @@ def tester_node_ag(state: AgentState, sb: SandboxClient, console: Console) -> Co
 ⚡ Runtime: {rt_str}
 📊 Contract: {s.bench.get('contract', 'N/A') if s.bench else 'N/A'}
 📈 Growth Ratio: {s.bench.get('growth_ratio', 'N/A') if s.bench else 'N/A'}
-💾 Memory: {f"{s.bench.get('bytes_used', 0)} bytes" if s.bench and s.bench.get('bytes_used') else 'N/A'}"""
+💾 Memory: {f"{s.bench.get('bytes_used', 0)} bytes" if s.bench and s.bench.get('bytes_used') else 'N/A'}{_memory_note(s.bench)}
+🔢 Large n: {_big_n_note(s.bench) or 'N/A'}"""
     
     if s.note and s.note != "all tests passed":
         bench_info += f"\n📝 Note: {s.note[:100]}"
@@ -659,18 +1314,31 @@ def tester_node_ag(state: AgentState, sb: SandboxClient, console: Console) -> Co
     if s.messages:
         console.print(f"[dim yellow]  {s.messages[-1]}[/dim yellow]")
     console.print("[bold yellow]└───────────────────────────────────────────────┘[/bold yellow]")
-    console.print("[bold]  ↓ Handoff to Reviewer Agent[/bold]\n")
-    return Command(update={"out": s}, goto="reviewer_ag")
+    # The conditional edge out of tester_ag routes on this decision.
+    review, reason = gate.decide(state.get("parent"), s) if gate else ("full", "")
+    if review == "skip":
+        console.print(f"[bold]  ↷ Skipping Reviewer Agent ({reason})[/bold]\n")
+    else:
+        console.print(f"[bold]  ↓ Handoff to Reviewer Agent{' (lite: ' + reason + ')' if review == 'lite' else ''}[/bold]\n")
+    return Command(update={"out": s, "review": review, "review_reason": reason})
 
-def reviewer_node_ag(state: AgentState, sb: SandboxClient, console: Console) -> Command[Literal["__end__"]]:
-    console.print("\n[bold green]┌─ 📝 Reviewer Agent ─────────────────────────────┐[/bold green]")
+def reviewer_node_ag(
+    state: AgentState,
+    sb: SandboxClient,
+    console: Console,
+    lite: bool = False,
+    gate: Optional[ReviewGate] = None,
+) -> Command[Literal["__end__"]]:
+    title = "📝 Reviewer Agent (lite) ──────────────────────" if lite else "📝 Reviewer Agent ─────────────────────────────"
+    console.print(f"\n[bold green]┌─ {title}┐[/bold green]")
     
     # Get parent code for comparison
     parent_state = state.get("out")
     parent_code = extract_python_block(parent_state.llm_answer) if parent_state else None
     
-    with console.status("[bold green]Improving API & readability...", spinner="dots"):
-        s = role_reviewer(sb, state.get("out"))
+    status = "Adding docstring & typing..." if lite else "Improving API & readability..."
+    with console.status(f"[bold green]{status}", spinner="dots"):
+        s = role_reviewer(sb, state.get("out"), lite=lite, gate=gate)
     
     # Show improved code
     new_code = extract_python_block(s.llm_answer)
@@ -703,21 +1371,45 @@ def reviewer_node_ag(state: AgentState, sb: SandboxClient, console: Console) ->
     console.print("[bold green]└───────────────────────────────────────────────┘[/bold green]\n")
     return Command(update={"out": s}, goto="__end__")
 
-def build_agent_subgraph(sb: Optional[SandboxClient], console: Optional[Console] = None):
-    # Bind sandbox and console into closures so nodes can use them at runtime.
+def review_skip_node_ag(state: AgentState, console: Console, gate: Optional[ReviewGate] = None) -> Command[Literal["__end__"]]:
+    s = state["out"]
+    reason = state.get("review_reason", "")
+    if gate is not None:
+        gate.record_skip()
+    out = replace(s, messages=s.messages + [f"[reviewer] skipped review: {reason} (score={s.score:.3f})"])
+    console.print(f"[dim green]  {out.messages[-1]}[/dim green]\n")
+    return Command(update={"out": out}, goto="__end__")
+
+def _route_review(state: AgentState) -> str:
+    return state.get("review", "full")
+
+def build_agent_subgraph(
+    sb: Optional[SandboxClient],
+    console: Optional[Console] = None,
+    gate: Optional[ReviewGate] = None,
+):
+    # Bind sandbox, console and review gate into closures so nodes can use them at runtime.
     if console is None:
         console = Console()
     def _coder(state: AgentState): return coder_node_ag(state, sb, console)
-    def _tester(state: AgentState): return tester_node_ag(state, sb, console)
-    def _reviewer(state: AgentState): return reviewer_node_ag(state, sb, console)
+    def _tester(state: AgentState): return tester_node_ag(state, sb, console, gate)
+    def _reviewer(state: AgentState): return reviewer_node_ag(state, sb, console, gate=gate)
+    def _reviewer_lite(state: AgentState): return reviewer_node_ag(state, sb, console, lite=True, gate=gate)
+    def _skip(state: AgentState): return review_skip_node_ag(state, console, gate)
 
     g = StateGraph(AgentState)
     g.add_node("coder_ag", _coder)
     g.add_node("tester_ag", _tester)
     g.add_node("reviewer_ag", _reviewer)
+    g.add_node("reviewer_lite_ag", _reviewer_lite)
+    g.add_node("review_skip_ag", _skip)
     g.add_edge(START, "coder_ag")
     g.add_edge("coder_ag", "tester_ag")
-    g.add_edge("tester_ag", "reviewer_ag")
+    g.add_conditional_edges(
+        "tester_ag",
+        _route_review,
+        {"full": "reviewer_ag", "lite": "reviewer_lite_ag", "skip": "review_skip_ag"},
+    )
     return g.compile()
 
 
@@ -741,7 +1433,7 @@ def initial_generation(sb: SandboxClient, budget_ms: float = 5.0) -> NodeState:
                                                           "runtime30_ms": None, "bytes_used": None}
 
     score = evaluate_answer(answer, tests_ok, bench, budget_ms=budget_ms)
-    return NodeState(llm_answer=answer, score=score, tests_ok=tests_ok, bench=bench, note=note)
+    return NodeState(llm_answer=answer, score=score, tests_ok=tests_ok, bench=bench, note=note, budget_ms=budget_ms)
 
 def refine_answer(
     sb: SandboxClient,
@@ -751,8 +1443,9 @@ def refine_answer(
     fail_note: str,
     bench_prev: Dict[str, Any],
     budget_ms: float = 5.0,
+    template: str = PROMPT_REFINE_BASE,
 ) -> NodeState:
-    prompt = refine_prompt(llm_answer, test_ok, fail_note, bench_prev, budget_ms)
+    prompt = refine_prompt(llm_answer, test_ok, fail_note, bench_prev, budget_ms, template=template)
     msgs: Sequence[BaseMessage] = [
         SystemMessage(content="Improve the code based on feedback. Correctness first, then speed. Return only one ```python block."),
         HumanMessage(content=prompt),
@@ -771,18 +1464,132 @@ def refine_answer(
                                                             "runtime30_ms": None, "bytes_used": None}
 
     score2 = evaluate_answer(refined, tests_ok2, bench2, budget_ms=budget_ms)
-    return NodeState(llm_answer=refined, score=score2, tests_ok=tests_ok2, bench=bench2, note=note2)
+    return NodeState(llm_answer=refined, score=score2, tests_ok=tests_ok2, bench=bench2, note=note2,
+                     budget_ms=budget_ms)
+
+# --- MCTS action set with declared costs ------------------------------------
+
+@dataclass(frozen=True)
+class ActionSpec:
+    name: str
+    cost: float  # relative to one full coder -> tester -> reviewer turn
+    run: Callable[[Optional[NodeState], int], NodeState]
+
+# Gain per unit of cost is squashed into [0, 1] for the action bandit.
+# A gain of GAIN_SCALE per full-pipeline cost maps to ~0.88.
+GAIN_SCALE = 0.1
+
+def _same_code(parent: Optional[NodeState], out: NodeState) -> bool:
+    if parent is None:
+        return False
+    before = (extract_python_block(parent.llm_answer) or "").strip()
+    return before == (extract_python_block(out.llm_answer) or "").strip()
+
+def cost_aware_reward(parent: Optional[NodeState], out: NodeState, cost: float) -> float:
+    # A child with the parent's code (e.g. a re-score) changed nothing; any score
+    # difference is judge noise, so it earns the neutral reward.
+    if _same_code(parent, out):
+        return 0.5
+    gain = out.score - (parent.score if parent else 0.0)
+    return 0.5 + 0.5 * math.tanh(gain / (max(1e-6, cost) * GAIN_SCALE))
+
+class ActionBandit:
+    """
+    Thompson sampling over the action set on the cost-aware reward (Beta
+    posteriors with fractional updates). It only decides which action runs;
+    TreeQuest sees one action whose score is the answer's own score, so node
+    selection follows answer quality rather than cost-normalised gain.
+    """
+    def __init__(self, specs: Sequence[ActionSpec], seed: Optional[int] = None) -> None:
+        self.specs = list(specs)
+        self.alpha = {s.name: 1.0 for s in self.specs}
+        self.beta = {s.name: 1.0 for s in self.specs}
+        self._rng = np.random.default_rng(seed)
+
+    def choose(self) -> ActionSpec:
+        draws = [self._rng.beta(self.alpha[s.name], self.beta[s.name]) for s in self.specs]
+        return self.specs[int(np.argmax(draws))]
+
+    def update(self, spec: ActionSpec, reward: float) -> None:
+        self.alpha[spec.name] += reward
+        self.beta[spec.name] += 1.0 - reward
+
+def build_action_specs(sb: SandboxClient, agent_graph, gate: Optional[ReviewGate] = None) -> list[ActionSpec]:
+    def _pipeline(parent: Optional[NodeState], step_idx: int) -> NodeState:
+        ag_state: AgentState = {"parent": parent, "step_idx": step_idx}
+        return agent_graph.invoke(ag_state)["out"]
+
+    def _review(parent: Optional[NodeState], step_idx: int) -> NodeState:
+        # through the pipeline's gate, so these reviews count against the run's token budget too
+        if gate is None or parent is None:
+            return role_reviewer(sb, parent, gate=gate)
+        if _was_reviewed(parent):
+            review, reason = "skip", "unchanged since last review"
+        else:
+            review, reason = gate.decide(None, parent)
+        if review == "skip":
+            gate.record_skip()
+            return replace(parent, messages=parent.messages + [
+                f"[reviewer] skipped review: {reason} (score={parent.score:.3f})"])
+        return role_reviewer(sb, parent, lite=review == "lite", gate=gate)
+
+    # Costs count LLM calls (the judge inside evaluate_answer included) and
+    # sandbox test/bench rounds; a tester-only re-score is one judge call.
+    return [
+        ActionSpec("Coder→Tester→Reviewer", 1.00, _pipeline),
+        ActionSpec("Coder:refine", 0.45, lambda p, i: role_coder(sb, p, i)),
+        ActionSpec("Coder:perf", 0.45, lambda p, i: role_coder(sb, p, i, template=PROMPT_PERF_BASE)),
+        ActionSpec("Coder:fast-doubling", 0.45, lambda p, i: role_coder(sb, p, i, template=PROMPT_FAST_DOUBLING)),
+        ActionSpec("Reviewer", 0.40, _review),
+        ActionSpec("Tester:re-score", 0.15, lambda p, i: role_tester(sb, p)),
+    ]
+
+def make_generate_fns(
+    bandit: ActionBandit,
+    step_idx: int,
+    usage: Dict[str, int],
+) -> Dict[str, Callable[[Optional[NodeState]], tuple[NodeState, float]]]:
+    # Single-role actions fall back to the coder at the root, so price them
+    # at least like a coder turn there.
+    root_cost = max(s.cost for s in bandit.specs if s.name.startswith("Coder:"))
+
+    def run(parent: Optional[NodeState]) -> tuple[NodeState, float]:
+        spec = bandit.choose()
+        if recorder is not None:
+            with recorder.tagged(step=step_idx, action=spec.name):
+                out = spec.run(parent, step_idx)
+        else:
+            out = spec.run(parent, step_idx)
+        cost = spec.cost if parent is not None else max(spec.cost, root_cost)
+        usage[spec.name] = usage.get(spec.name, 0) + 1
+        bandit.update(spec, cost_aware_reward(parent, out, cost))
+        return out, out.score
+
+    return {"agent": run}
+
+def _rank_by_node_score(pairs):
+    return sorted(pairs, key=lambda p: p[0].score, reverse=True)
 
 # --- Top-level MCTS node that uses the agent subgraph -----------------------
 
 def mcts_node(state: LGState) -> Command[Literal["__end__"]]:
+    global recorder
     iters = int(state.get("iterations", 5))
     algo = tq.ABMCTSA()
     search_tree = algo.init_tree()
 
     trace_lines: list[str] = []
-    sb = SandboxClient(dependencies=["numpy"], log_handler=_sb_log)
+    # SANDBOX_TRANSPORT=http reuses the server at MCP_SERVER_URL (default localhost:3333) instead of spawning a sandbox
+    server_url = mcp_endpoint() if os.getenv("SANDBOX_TRANSPORT") == "http" else None
+    # SANDBOX_BACKEND=native times trusted code on CPython instead of Pyodide
+    backend = os.getenv("SANDBOX_BACKEND", "pyodide")
+    sb = SandboxClient(dependencies=["numpy"], log_handler=_sb_log, server_url=server_url, backend=backend)
     sb.start()
+    # RUN_RECORD=run.jsonl keeps every scored candidate for `python rescore.py run.jsonl`
+    if os.getenv(RECORD_ENV):
+        recorder = RunRecorder(os.environ[RECORD_ENV], meta={
+            "model": OPENAI_MODEL, "iterations": iters, "backend": sb.backend, "weights": asdict(SCORE_WEIGHTS),
+        })
     
     # Create console for interactive output
     console = Console()
@@ -799,13 +1606,14 @@ def mcts_node(state: LGState) -> Command[Literal["__end__"]]:
     
     try:
         # Build the agent subgraph once, reuse per action
-        agent_graph = build_agent_subgraph(sb, console)
-
-        def run_agents(parent: Optional[NodeState], step_idx: int) -> NodeState:
-            # Run coder -> tester -> reviewer pipeline as a single "agent turn"
-            ag_state: AgentState = {"parent": parent, "step_idx": step_idx}
-            out = agent_graph.invoke(ag_state)["out"]
-            return out
+        # REVIEW_TOKEN_BUDGET=20000 caps reviewer tokens; the gate turns to lite/skip reviews as it runs low
+        review_budget = state.get("review_token_budget")
+        if review_budget is None and os.getenv("REVIEW_TOKEN_BUDGET"):
+            review_budget = int(os.environ["REVIEW_TOKEN_BUDGET"])
+        review_gate = ReviewGate(token_budget=review_budget)
+        agent_graph = build_agent_subgraph(sb, console, review_gate)
+        action_bandit = ActionBandit(build_action_specs(sb, agent_graph, review_gate))
+        action_usage: Dict[str, int] = {}
 
         console.print("\n[bold cyan]🚀 Starting MCTS search with agent collaboration...[/bold cyan]\n")
         console.print("[bold cyan]Agent Communication Flow:[/bold cyan]")
@@ -819,17 +1627,13 @@ def mcts_node(state: LGState) -> Command[Literal["__end__"]]:
                 console.print(f"\n[bold yellow]━━━ Step {i+1}/{iters} ━━━[/bold yellow]")
                 console.print("[dim]MCTS exploring multiple agent collaboration paths...[/dim]\n")
                 
-                with console.status("[bold]🔍 Exploring with MCTS (running 3 agent pipelines)...", spinner="dots"):
-                    actions = {
-                        # Three "flavors" of the pipeline, for now all use the same subgraph
-                        "Coder→Tester→Reviewer#A": lambda parent, _i=i: (run_agents(parent, _i), (parent.score if parent else 0.0)),
-                        "Coder→Tester→Reviewer#B": lambda parent, _i=i: (run_agents(parent, _i), (parent.score if parent else 0.0)),
-                        "Coder→Tester→Reviewer#C": lambda parent, _i=i: (run_agents(parent, _i), (parent.score if parent else 0.0)),
-                    }
-                    # TreeQuest expects action -> callable returning (NodeState, score)
+                with console.status("[bold]🔍 Exploring with MCTS (cost-aware agent actions)...", spinner="dots"):
+                    # TreeQuest picks the node to expand by answer score; the action
+                    # run there is picked by the cost-aware bandit inside "agent".
+                    actions = make_generate_fns(action_bandit, i, action_usage)
                     search_tree = algo.step(search_tree, actions)
 
-                best, _ = tq.top_k(search_tree, algo, k=1)[0]
+                best, _ = tq.top_k(search_tree, algo, k=1, ranking_fn=_rank_by_node_score)[0]
                 
                 # Show score evolution
                 if prev_best_score is not None:
@@ -899,8 +1703,15 @@ def mcts_node(state: LGState) -> Command[Literal["__end__"]]:
                         else:
                             console.print(f"  • {msg}")
 
-        best_state, _ = tq.top_k(search_tree, algo, k=1)[0]
+        best_state, _ = tq.top_k(search_tree, algo, k=1, ranking_fn=_rank_by_node_score)[0]
         trace_lines.append(f"Final Best Answer score={best_state.score:.3f}")
+        usage_str = ", ".join(f"{name}×{n}" for name, n in action_usage.items())
+        console.print(f"[dim]Actions used: {usage_str}[/dim]")
+        savings = review_gate.summary()
+        console.print(
+            f"[dim]Review gate: full={savings['full']} lite={savings['lite']} skipped={savings['skipped']} "
+            f"saved ≈{savings['saved_s']:.1f}s, ≈{savings['saved_tokens']} tokens[/dim]"
+        )
         
         console.print(f"\n[bold cyan]✅ Final Best Answer score={best_state.score:.3f}[/bold cyan]\n")
 
@@ -910,11 +1721,15 @@ def mcts_node(state: LGState) -> Command[Literal["__end__"]]:
                 "best_score": float(best_state.score),
                 "trace": "\n".join(trace_lines),
                 "best_messages": best_state.messages,
+                "review_savings": savings,
             },
             goto=END,
         )
     finally:
         sb.close()
+        if recorder is not None:
+            recorder.close()
+            recorder = None
 
 # --- pretty trace ------------------------------------------------------------
 console = Console()
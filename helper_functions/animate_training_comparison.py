@@ -1,57 +1,150 @@
 from __future__ import annotations
 
+import multiprocessing as mp
+import os
 import random
+import shutil
+import subprocess
 
+import numpy as np
+import matplotlib
 import matplotlib.pyplot as plt
 from matplotlib import animation
-
-
-def animate_training_comparison(
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+from PIL import Image
+
+try:
+    from helper_context import HelperContext
+except ImportError:
+    class HelperContext:
+        """
+        Built from the injected ACTIONS and compute_group_advantages when this file
+        is exec'd on its own; covers what precompute_frames uses.
+        """
+
+        def __init__(self, actions, compute_group_advantages):
+            self.actions = tuple(actions)
+            self.compute_group_advantages = compute_group_advantages
+
+        @classmethod
+        def from_namespace(cls, ns, require_actions=True):
+            for name in ("ACTIONS", "compute_group_advantages"):
+                if name not in ns:
+                    raise NameError(
+                        f"{name} is not defined. Define it in your notebook "
+                        f"and inject it after loading, e.g. mod.{name} = {name}"
+                    )
+            return cls(ns["ACTIONS"], ns["compute_group_advantages"])
+
+        def advantage_fn(self, name):
+            return getattr(self, name)
+
+        def policy_matrix(self, policies):
+            return np.array([[policy[a] for a in self.actions] for policy in policies], dtype=float)
+
+        def run_advantages(self, rollout_history, stats_history=None):
+            sizes = [len(step) for step in rollout_history]
+            offsets = np.concatenate(([0], np.cumsum(sizes))).astype(np.int64)
+            rewards = np.array([ro.reward for step in rollout_history for ro in step], dtype=float)
+            relative = np.zeros(len(rewards))
+            for t, step in enumerate(rollout_history):
+                by_prompt = {}
+                for i, ro in enumerate(step, start=offsets[t]):
+                    by_prompt.setdefault(ro.prompt_id, []).append(i)
+                for idxs in by_prompt.values():
+                    relative[idxs] = self.compute_group_advantages([float(rewards[i]) for i in idxs])
+            absolute = None
+            if stats_history is not None:
+                absolute = rewards - np.repeat([s["baseline"] for s in stats_history[: len(sizes)]], sizes)
+            return {"offsets": offsets, "rewards": rewards, "relative": relative, "absolute": absolute}
+
+ADV_RANGE = (-3.0, 3.0)
+ADV_BINS = 20
+
+
+def _sample_text(step, abs_rollouts, rel_rollouts):
+    abs_samples = random.sample(abs_rollouts, min(3, len(abs_rollouts)))
+    rel_samples = random.sample(rel_rollouts, min(3, len(rel_rollouts)))
+
+    text = f"Step {step + 1} - Sample Rollouts:\n\n"
+    text += "ABSOLUTE BASELINE:\n"
+    for i, ro in enumerate(abs_samples[:2]):
+        text += f"  {i+1}. Action: {ro.action:15s} | Reward: {ro.reward:6.3f} | Prompt: {ro.prompt[:30]}...\n"
+    text += "\nGROUP RELATIVE:\n"
+    for i, ro in enumerate(rel_samples[:2]):
+        text += f"  {i+1}. Action: {ro.action:15s} | Reward: {ro.reward:6.3f} | Prompt: {ro.prompt[:30]}...\n"
+    return text
+
+
+def precompute_frames(
+    ctx,
     abs_policy_history, abs_stats_history, abs_rollout_history,
     rel_policy_history, rel_stats_history, rel_rollout_history,
-    fps: int = 8,
-    save_path: str = None
 ):
     """
-    Create an animated comparison showing:
-    1. Policy distributions evolving
-    2. Rewards over time
-    3. Advantages distribution
-    4. Sample rollouts with their rewards
-
-    Notes:
-    - Expects ACTIONS (list[str]) to exist in the caller's global scope
-      OR be importable from the same module (see below).
-    - Expects compute_group_advantages(list[float]) -> list[float] to exist as well.
-    """
+    Everything a frame shows, as arrays built in one pass over the run:
 
-    # --------- resolve external dependencies without changing signature ---------
-    # Option A: user defines ACTIONS / compute_group_advantages in their notebook
-    # Option B: you keep them in the same repo and adjust imports below
-
-    # Try to find ACTIONS
-    try:
-        ACTIONS = globals()["ACTIONS"]
-    except KeyError:
-        # If you prefer, replace this with: from .your_module import ACTIONS
-        raise NameError(
-            "ACTIONS is not defined. Define ACTIONS in your notebook "
-            "or provide it in the module where animate_training_comparison is imported from."
-        )
-
-    # Try to find compute_group_advantages
-    try:
-        compute_group_advantages = globals()["compute_group_advantages"]
-    except KeyError:
-        # If you prefer, replace this with: from .your_module import compute_group_advantages
-        raise NameError(
-            "compute_group_advantages is not defined. Define it in your notebook "
-            "or provide it in the module where animate_training_comparison is imported from."
-        )
+      - abs_policy, rel_policy, diff: (frames, actions) probabilities
+      - steps, abs_reward, abs_baseline, rel_reward: (steps,) curves; frame f shows [:f+1]
+      - abs_hist, rel_hist: (frames, ADV_BINS) advantage counts over ADV_RANGE, zero
+        for frames without rollouts
+      - texts: sample-rollout panel text per frame ("" without rollouts)
 
-    # -------------------------------------------------------------------------
+    `ctx` is a HelperContext (actions, run_advantages). The dict holds only arrays
+    and strings, so it can be pickled to render workers.
+    """
+    n_frames = len(abs_policy_history)
+    abs_policy = ctx.policy_matrix(abs_policy_history)
+    rel_policy = ctx.policy_matrix(rel_policy_history)
+
+    run_advantages = ctx.advantage_fn("run_advantages")
+    n_rollout_steps = min(len(abs_rollout_history), len(rel_rollout_history), n_frames)
+    abs_run = run_advantages(abs_rollout_history[:n_rollout_steps], abs_stats_history)
+    rel_run = run_advantages(rel_rollout_history[:n_rollout_steps])
+    abs_advs, abs_off = abs_run["absolute"], abs_run["offsets"]
+    rel_advs, rel_off = rel_run["relative"], rel_run["offsets"]
+
+    edges = np.linspace(ADV_RANGE[0], ADV_RANGE[1], ADV_BINS + 1)
+    abs_hist = np.zeros((n_frames, ADV_BINS))
+    rel_hist = np.zeros((n_frames, ADV_BINS))
+    for step in range(n_rollout_steps):
+        abs_hist[step] = np.histogram(abs_advs[abs_off[step]:abs_off[step + 1]], bins=edges)[0]
+        rel_hist[step] = np.histogram(rel_advs[rel_off[step]:rel_off[step + 1]], bins=edges)[0]
+
+    texts = [""] * n_frames
+    for step in range(n_rollout_steps):
+        texts[step] = _sample_text(step, abs_rollout_history[step], rel_rollout_history[step])
+
+    return {
+        "actions": list(ctx.actions),
+        "n_frames": n_frames,
+        "abs_policy": abs_policy,
+        "rel_policy": rel_policy,
+        "diff": rel_policy - abs_policy,
+        "steps": np.array([s["step"] for s in abs_stats_history], dtype=float),
+        "abs_reward": np.array([s["avg_reward"] for s in abs_stats_history], dtype=float),
+        "abs_baseline": np.array([s["baseline"] for s in abs_stats_history], dtype=float),
+        "rel_reward": np.array([s["avg_reward"] for s in rel_stats_history], dtype=float),
+        "edges": edges,
+        "abs_hist": abs_hist,
+        "rel_hist": rel_hist,
+        "hist_max": float(max(abs_hist.max(initial=0), rel_hist.max(initial=0))),
+        "texts": texts,
+    }
+
+
+def build_figure(frames, fig=None):
+    """
+    Lay out the comparison figure with persistent artists for `frames`
+    (from precompute_frames). Returns (fig, update, artists): update(i) only sets
+    artist data for frame i and returns the artists it touched.
 
-    fig = plt.figure(figsize=(16, 10))
+    Pass `fig` to draw into an existing (e.g. off-screen Agg) figure.
+    """
+    actions = frames["actions"]
+    if fig is None:
+        fig = plt.figure(figsize=(16, 10))
     gs = fig.add_gridspec(3, 3, hspace=0.3, wspace=0.3)
 
     # Top row: Policy distributions
@@ -67,34 +160,36 @@ def animate_training_comparison(
     # Bottom row: Sample rollouts
     ax7 = fig.add_subplot(gs[2, :])
 
-    x_actions = list(range(len(ACTIONS)))
+    x_actions = list(range(len(actions)))
 
     # Policy bars
-    bars_abs = ax1.bar(x_actions, [abs_policy_history[0][a] for a in ACTIONS], alpha=0.7)
-    bars_rel = ax2.bar(x_actions, [rel_policy_history[0][a] for a in ACTIONS], alpha=0.7, color="orange")
+    bars_abs = ax1.bar(x_actions, frames["abs_policy"][0], alpha=0.7)
+    bars_rel = ax2.bar(x_actions, frames["rel_policy"][0], alpha=0.7, color="orange")
 
     ax1.set_xticks(x_actions)
-    ax1.set_xticklabels(ACTIONS, rotation=45, ha="right", fontsize=8)
+    ax1.set_xticklabels(actions, rotation=45, ha="right", fontsize=8)
     ax2.set_xticks(x_actions)
-    ax2.set_xticklabels(ACTIONS, rotation=45, ha="right", fontsize=8)
+    ax2.set_xticklabels(actions, rotation=45, ha="right", fontsize=8)
 
     ax1.set_ylim(0, 1.0)
     ax2.set_ylim(0, 1.0)
-    ax1.set_title("Absolute Baseline Policy", fontsize=10, fontweight="bold")
-    ax2.set_title("Group Relative Policy", fontsize=10, fontweight="bold")
+    title_abs = ax1.set_title("Absolute Baseline Policy", fontsize=10, fontweight="bold")
+    title_rel = ax2.set_title("Group Relative Policy", fontsize=10, fontweight="bold")
 
     # Policy comparison (difference)
-    bars_diff = ax3.bar(x_actions, [0] * len(ACTIONS), alpha=0.7, color="green")
+    bars_diff = ax3.bar(x_actions, [0] * len(actions), alpha=0.7, color="green")
     ax3.set_xticks(x_actions)
-    ax3.set_xticklabels(ACTIONS, rotation=45, ha="right", fontsize=8)
+    ax3.set_xticklabels(actions, rotation=45, ha="right", fontsize=8)
     ax3.set_title("Policy Difference (Rel - Abs)", fontsize=10, fontweight="bold")
     ax3.axhline(0, color="black", linestyle="--", linewidth=0.5)
+    diff_lim = max(0.05, float(np.abs(frames["diff"]).max(initial=0)) * 1.1)
+    ax3.set_ylim(-diff_lim, diff_lim)
 
     # Reward curves
-    steps = [s["step"] for s in abs_stats_history]
-    ax4.plot([], [], "b-", label="Avg Reward", linewidth=2)
-    ax4.plot([], [], "r--", label="Baseline", linewidth=1.5)
-    ax4.set_xlim(1, len(steps))
+    n_steps = len(frames["steps"])
+    reward_line_abs, = ax4.plot([], [], "b-", label="Avg Reward", linewidth=2)
+    baseline_line, = ax4.plot([], [], "r--", label="Baseline", linewidth=1.5)
+    ax4.set_xlim(1, max(n_steps, 2))
     ax4.set_ylim(-1.1, 1.1)
     ax4.set_title("Absolute: Reward vs Baseline", fontsize=10, fontweight="bold")
     ax4.set_xlabel("Step")
@@ -102,8 +197,8 @@ def animate_training_comparison(
     ax4.legend(fontsize=8)
     ax4.grid(True, alpha=0.3)
 
-    ax5.plot([], [], "orange", label="Avg Reward", linewidth=2)
-    ax5.set_xlim(1, len(steps))
+    reward_line_rel, = ax5.plot([], [], "orange", label="Avg Reward", linewidth=2)
+    ax5.set_xlim(1, max(n_steps, 2))
     ax5.set_ylim(-1.1, 1.1)
     ax5.set_title("Relative: Average Reward", fontsize=10, fontweight="bold")
     ax5.set_xlabel("Step")
@@ -111,14 +206,17 @@ def animate_training_comparison(
     ax5.legend(fontsize=8)
     ax5.grid(True, alpha=0.3)
 
-    # Advantage comparison
-    ax6.hist([], bins=20, alpha=0.6, label="Absolute", color="blue", range=(-3, 3))
-    ax6.hist([], bins=20, alpha=0.6, label="Relative", color="orange", range=(-3, 3))
-    ax6.set_title("Advantage Distribution (Current Step)", fontsize=10, fontweight="bold")
+    # Advantage comparison: fixed bins, bar heights updated per frame
+    edges = frames["edges"]
+    centers, width = (edges[:-1] + edges[1:]) / 2, np.diff(edges)
+    hist_abs = ax6.bar(centers, np.zeros(ADV_BINS), width=width, alpha=0.6, label="Absolute", color="blue")
+    hist_rel = ax6.bar(centers, np.zeros(ADV_BINS), width=width, alpha=0.6, label="Relative", color="orange")
+    title_adv = ax6.set_title("Advantage Distribution (Current Step)", fontsize=10, fontweight="bold")
     ax6.set_xlabel("Advantage")
     ax6.set_ylabel("Frequency")
     ax6.legend(fontsize=8)
-    ax6.set_xlim(-3, 3)
+    ax6.set_xlim(*ADV_RANGE)
+    ax6.set_ylim(0, max(1.0, frames["hist_max"]) * 1.05)
 
     # Sample rollouts display
     ax7.axis("off")
@@ -131,106 +229,263 @@ def animate_training_comparison(
         bbox=dict(boxstyle="round", facecolor="wheat", alpha=0.8),
     )
 
-    reward_line_abs, = ax4.plot([], [], "b-", linewidth=2)
-    baseline_line, = ax4.plot([], [], "r--", linewidth=1.5)
-    reward_line_rel, = ax5.plot([], [], "orange", linewidth=2)
+    artists = (
+        list(bars_abs) + list(bars_rel) + list(bars_diff) + list(hist_abs) + list(hist_rel)
+        + [reward_line_abs, baseline_line, reward_line_rel, rollout_text, title_abs, title_rel, title_adv]
+    )
 
-    def init():
-        return (
-            list(bars_abs)
-            + list(bars_rel)
-            + list(bars_diff)
-            + [reward_line_abs, baseline_line, reward_line_rel, rollout_text]
-        )
+    steps = frames["steps"]
+    abs_reward, abs_baseline, rel_reward = frames["abs_reward"], frames["abs_baseline"], frames["rel_reward"]
 
     def update(frame):
-        abs_probs = abs_policy_history[frame]
-        rel_probs = rel_policy_history[frame]
-
-        for bar, a in zip(bars_abs, ACTIONS):
-            bar.set_height(abs_probs[a])
-        for bar, a in zip(bars_rel, ACTIONS):
-            bar.set_height(rel_probs[a])
-        for bar, a in zip(bars_diff, ACTIONS):
-            diff = rel_probs[a] - abs_probs[a]
-            bar.set_height(diff)
-            bar.set_color("green" if diff > 0 else "red")
-
-        xs = steps[: frame + 1]
-        abs_rewards = [s["avg_reward"] for s in abs_stats_history[: frame + 1]]
-        abs_baselines = [s["baseline"] for s in abs_stats_history[: frame + 1]]
-        rel_rewards = [s["avg_reward"] for s in rel_stats_history[: frame + 1]]
-
-        reward_line_abs.set_data(xs, abs_rewards)
-        baseline_line.set_data(xs, abs_baselines)
-        reward_line_rel.set_data(xs, rel_rewards)
-
-        ax6.clear()
-        if frame < len(abs_rollout_history):
-            abs_rollouts = abs_rollout_history[frame]
-            abs_rewards_step = [r.reward for r in abs_rollouts]
-            abs_baseline = abs_stats_history[frame]["baseline"]
-            abs_advs = [r - abs_baseline for r in abs_rewards_step]
-
-            rel_rollouts = rel_rollout_history[frame]
-            rel_rewards_step = [r.reward for r in rel_rollouts]
-
-            by_prompt = {}
-            for idx, ro in enumerate(rel_rollouts):
-                by_prompt.setdefault(ro.prompt_id, []).append(idx)
-
-            rel_advs = []
-            for _, idxs in by_prompt.items():
-                group_rewards = [rel_rewards_step[i] for i in idxs]
-                rel_advs.extend(compute_group_advantages(group_rewards))
-
-            ax6.hist(abs_advs, bins=20, alpha=0.6, label="Absolute", color="blue", range=(-3, 3))
-            ax6.hist(rel_advs, bins=20, alpha=0.6, label="Relative", color="orange", range=(-3, 3))
-            ax6.set_title(f"Advantage Distribution (Step {frame + 1})", fontsize=10, fontweight="bold")
-            ax6.set_xlabel("Advantage")
-            ax6.set_ylabel("Frequency")
-            ax6.legend(fontsize=8)
-            ax6.set_xlim(-3, 3)
-
-            abs_samples = random.sample(abs_rollouts, min(3, len(abs_rollouts)))
-            rel_samples = random.sample(rel_rollouts, min(3, len(rel_rollouts)))
-
-            text = f"Step {frame + 1} - Sample Rollouts:\n\n"
-            text += "ABSOLUTE BASELINE:\n"
-            for i, ro in enumerate(abs_samples[:2]):
-                text += f"  {i+1}. Action: {ro.action:15s} | Reward: {ro.reward:6.3f} | Prompt: {ro.prompt[:30]}...\n"
-            text += "\nGROUP RELATIVE:\n"
-            for i, ro in enumerate(rel_samples[:2]):
-                text += f"  {i+1}. Action: {ro.action:15s} | Reward: {ro.reward:6.3f} | Prompt: {ro.prompt[:30]}...\n"
-            rollout_text.set_text(text)
-
-        ax1.set_title(f"Absolute Baseline Policy (Step {frame + 1})", fontsize=10, fontweight="bold")
-        ax2.set_title(f"Group Relative Policy (Step {frame + 1})", fontsize=10, fontweight="bold")
-
-        return (
-            list(bars_abs)
-            + list(bars_rel)
-            + list(bars_diff)
-            + [reward_line_abs, baseline_line, reward_line_rel, rollout_text]
-        )
+        for bar, h in zip(bars_abs, frames["abs_policy"][frame]):
+            bar.set_height(h)
+        for bar, h in zip(bars_rel, frames["rel_policy"][frame]):
+            bar.set_height(h)
+        for bar, d in zip(bars_diff, frames["diff"][frame]):
+            bar.set_height(d)
+            bar.set_color("green" if d > 0 else "red")
+
+        # slices are views, so each frame is O(1) regardless of run length
+        reward_line_abs.set_data(steps[: frame + 1], abs_reward[: frame + 1])
+        baseline_line.set_data(steps[: frame + 1], abs_baseline[: frame + 1])
+        reward_line_rel.set_data(steps[: frame + 1], rel_reward[: frame + 1])
+
+        for bar, h in zip(hist_abs, frames["abs_hist"][frame]):
+            bar.set_height(h)
+        for bar, h in zip(hist_rel, frames["rel_hist"][frame]):
+            bar.set_height(h)
+        if frames["texts"][frame]:
+            title_adv.set_text(f"Advantage Distribution (Step {frame + 1})")
+            rollout_text.set_text(frames["texts"][frame])
+
+        title_abs.set_text(f"Absolute Baseline Policy (Step {frame + 1})")
+        title_rel.set_text(f"Group Relative Policy (Step {frame + 1})")
+        return artists
+
+    return fig, update, artists
+
+
+# ---------------------------------------------------------------------------
+# Video rendering: blitted Agg frames, rendered in a process pool
+# ---------------------------------------------------------------------------
+
+_RENDERER = {}
+
+
+def _blit_layers(fig, artists):
+    # Static artists that overlap animated ones (spines, legends, reference
+    # lines) are redrawn with them in z-order, so a blitted frame is the same
+    # image a full draw would produce.
+    animated = set(artists)
+    layers = []
+    for ax in fig.axes:
+        own = [a for a in artists if a.axes is ax]
+        if not own:
+            continue
+        overlays = [ln for ln in ax.lines if ln not in animated]
+        if ax.axison:
+            overlays += list(ax.spines.values())
+        if ax.get_legend() is not None:
+            overlays.append(ax.get_legend())
+        layers.extend(sorted(own + overlays, key=lambda a: a.get_zorder()))
+    return layers
+
+
+def _init_renderer(frames, dpi, gif):
+    # One off-screen figure per worker. The static parts (axes, ticks, labels)
+    # are drawn once into a background; animated artists are excluded from it
+    # and drawn on top of a restored copy for every frame.
+    fig = Figure(figsize=(16, 10), dpi=dpi)
+    FigureCanvasAgg(fig)
+    fig, update, artists = build_figure(frames, fig=fig)
+    layers = _blit_layers(fig, artists)
+    for a in layers:
+        a.set_animated(True)
+    fig.canvas.draw()
+    _RENDERER.update(
+        fig=fig,
+        update=update,
+        layers=layers,
+        background=fig.canvas.copy_from_bbox(fig.bbox),
+        gif=gif,
+    )
+
+
+def _render_range(start, stop):
+    """RGB bytes (or palettized PIL images for GIF) for frames [start, stop)."""
+    fig, update = _RENDERER["fig"], _RENDERER["update"]
+    canvas = fig.canvas
+    out = []
+    for frame in range(start, stop):
+        canvas.restore_region(_RENDERER["background"])
+        update(frame)
+        for a in _RENDERER["layers"]:
+            fig.draw_artist(a)
+        rgb = np.asarray(canvas.buffer_rgba())[..., :3]
+        if _RENDERER["gif"]:
+            out.append(Image.fromarray(rgb).quantize(colors=256))
+        else:
+            out.append(rgb.tobytes())
+    return out
+
+
+def _frame_size(dpi):
+    fig = Figure(figsize=(16, 10), dpi=dpi)
+    w, h = FigureCanvasAgg(fig).get_width_height()
+    return w, h
+
+
+def _render_worker(frames, dpi, gif, tasks, results):
+    try:
+        _init_renderer(frames, dpi, gif)
+        for idx, start, stop in iter(tasks.get, None):
+            results.put((idx, _render_range(start, stop)))
+    except Exception as e:
+        results.put((-1, f"{type(e).__name__}: {e}"))
+
+
+def iter_rendered_frames(frames, dpi=100, workers=None, chunk=16, gif=False):
+    """
+    Yield rendered frames in order. Frame ranges of `chunk` are rendered by
+    `workers` processes (default: all cores); at most 2 ranges per worker are in
+    flight, so memory stays bounded however long the run is.
+    """
+    n = frames["n_frames"]
+    ranges = [(s, min(s + chunk, n)) for s in range(0, n, chunk)]
+    workers = min(workers or os.cpu_count() or 1, len(ranges))
+    if workers <= 1 or "fork" not in mp.get_all_start_methods():
+        _init_renderer(frames, dpi, gif)
+        for start, stop in ranges:
+            yield from _render_range(start, stop)
+        return
+
+    # Forked processes inherit this module's functions, so nothing but frame
+    # data crosses the queues (the helper may be exec'd and not importable).
+    ctx = mp.get_context("fork")
+    tasks, results = ctx.Queue(), ctx.Queue()
+    procs = [
+        ctx.Process(target=_render_worker, args=(frames, dpi, gif, tasks, results), daemon=True)
+        for _ in range(workers)
+    ]
+    for proc in procs:
+        proc.start()
+    try:
+        submitted = 0
+        for _ in range(min(2 * workers, len(ranges))):
+            tasks.put((submitted, *ranges[submitted]))
+            submitted += 1
+        done, next_idx = {}, 0
+        while next_idx < len(ranges):
+            idx, rendered = results.get()
+            if idx < 0:
+                raise RuntimeError(f"frame render worker failed: {rendered}")
+            done[idx] = rendered
+            if submitted < len(ranges):
+                tasks.put((submitted, *ranges[submitted]))
+                submitted += 1
+            while next_idx in done:
+                yield from done.pop(next_idx)
+                next_idx += 1
+    finally:
+        for proc in procs:
+            tasks.put(None)
+        for proc in procs:
+            proc.join(timeout=5)
+            if proc.is_alive():
+                proc.terminate()
+
+
+def render_training_video(frames, save_path, fps=8, dpi=100, workers=None, chunk=16, bitrate=1800):
+    """
+    Encode `frames` (from precompute_frames) to `save_path`.
+
+    .gif is written with Pillow; anything else is piped as raw RGB into a single
+    ffmpeg process (libx264, yuv420p). Returns save_path, or None when ffmpeg is
+    needed but not installed.
+    """
+    if save_path.lower().endswith(".gif"):
+        images = iter_rendered_frames(frames, dpi=dpi, workers=workers, chunk=chunk, gif=True)
+        first = next(images)
+        first.save(save_path, save_all=True, append_images=images, duration=int(1000 / fps), loop=0)
+        return save_path
+
+    ffmpeg = shutil.which(matplotlib.rcParams["animation.ffmpeg_path"])
+    if ffmpeg is None:
+        return None
+    w, h = _frame_size(dpi)
+    cmd = [
+        ffmpeg, "-y", "-loglevel", "error",
+        "-f", "rawvideo", "-pix_fmt", "rgb24", "-s", f"{w}x{h}", "-r", str(fps), "-i", "-",
+        "-vf", "pad=ceil(iw/2)*2:ceil(ih/2)*2",
+        "-c:v", "libx264", "-pix_fmt", "yuv420p", "-b:v", f"{bitrate}k",
+        "-metadata", "artist=RL Comparison",
+        save_path,
+    ]
+    proc = subprocess.Popen(cmd, stdin=subprocess.PIPE)
+    try:
+        for buf in iter_rendered_frames(frames, dpi=dpi, workers=workers, chunk=chunk):
+            proc.stdin.write(buf)
+    finally:
+        proc.stdin.close()
+        code = proc.wait()
+    if code != 0:
+        raise RuntimeError(f"ffmpeg exited with status {code} writing {save_path}")
+    return save_path
+
+
+def animate_training_comparison(
+    abs_policy_history, abs_stats_history, abs_rollout_history,
+    rel_policy_history, rel_stats_history, rel_rollout_history,
+    fps: int = 8,
+    save_path: str = None,
+    workers: int = None,
+    ctx=None,
+):
+    """
+    Create an animated comparison showing:
+    1. Policy distributions evolving
+    2. Rewards over time
+    3. Advantages distribution
+    4. Sample rollouts with their rewards
+
+    All per-frame data (policies, reward curves, advantage histograms, sample
+    text) is computed once up front; frames only update existing artists.
+    With save_path, frames are rendered by `workers` processes (default: all
+    cores) and encoded to one ffmpeg stream, or a GIF for *.gif paths.
+
+    Notes:
+    - ctx: a HelperContext (helper_context.py) with ACTIONS and the advantage
+      functions. Without it, ACTIONS (and optionally run_advantages) are read
+      from this module's namespace, as injected by the caller.
+    """
+
+    if ctx is None:
+        ctx = HelperContext.from_namespace(globals())
+    frames = precompute_frames(
+        ctx,
+        abs_policy_history, abs_stats_history, abs_rollout_history,
+        rel_policy_history, rel_stats_history, rel_rollout_history,
+    )
+    fig, update, artists = build_figure(frames)
+
+    def init():
+        return artists
 
     anim = animation.FuncAnimation(
         fig,
         update,
-        frames=len(abs_policy_history),
+        frames=frames["n_frames"],
         init_func=init,
         interval=int(1000 / fps),
-        blit=False,
+        blit=True,
         repeat=True,
     )
 
     plt.close(fig)
 
     if save_path:
-        Writer = animation.writers["ffmpeg"] if "ffmpeg" in animation.writers.list() else None
-        if Writer:
-            writer = Writer(fps=fps, metadata=dict(artist="RL Comparison"), bitrate=1800)
-            anim.save(save_path, writer=writer)
+        if render_training_video(frames, save_path, fps=fps, workers=workers):
             print(f"Video saved to {save_path}")
         else:
             print("FFmpeg not available. Install with: conda install -c conda-forge ffmpeg")
@@ -0,0 +1,108 @@
+from __future__ import annotations
+
+import numpy as np
+
+EPS = 1e-8
+
+
+def rollout_arrays(rollouts):
+    """(rewards, prompt_ids) arrays aligned with `rollouts` (a list, or a RolloutTable step)."""
+    if hasattr(rollouts, "rewards") and hasattr(rollouts, "prompt_ids"):
+        return np.asarray(rollouts.rewards, dtype=float), np.asarray(rollouts.prompt_ids)
+    n = len(rollouts)
+    rewards = np.fromiter((r.reward for r in rollouts), dtype=float, count=n)
+    prompt_ids = np.array([r.prompt_id for r in rollouts])
+    return rewards, prompt_ids
+
+
+def segment_zscore(values, groups, n_groups, eps: float = EPS):
+    """
+    (values - group mean) / (group std + eps) for every element, where
+    groups[i] in [0, n_groups) is the segment of values[i]. Population std,
+    two passes (mean, then squared deviations) with bincount.
+    """
+    values = np.asarray(values, dtype=float)
+    counts = np.bincount(groups, minlength=n_groups)
+    safe = np.maximum(counts, 1)
+    means = np.bincount(groups, weights=values, minlength=n_groups) / safe
+    dev = values - means[groups]
+    std = np.sqrt(np.bincount(groups, weights=dev * dev, minlength=n_groups) / safe)
+    return dev / (std[groups] + eps)
+
+
+def group_relative_advantages(rewards, prompt_ids, eps: float = EPS):
+    """Z-score of each reward within its prompt_id group, aligned with the input."""
+    rewards = np.asarray(rewards, dtype=float)
+    if rewards.size == 0:
+        return rewards.copy()
+    keys, groups = np.unique(np.asarray(prompt_ids), return_inverse=True)
+    return segment_zscore(rewards, groups.ravel(), len(keys), eps)
+
+
+def absolute_advantages(rewards, baseline):
+    """reward - baseline; baseline may be a scalar or one value per reward."""
+    return np.asarray(rewards, dtype=float) - baseline
+
+
+def step_advantages(rollouts, baseline=None, eps: float = EPS):
+    """
+    Advantages for one step's rollouts:
+      - rewards, prompt_ids: arrays aligned with `rollouts`
+      - absolute: reward - baseline (None without a baseline)
+      - relative: z-score within each prompt_id group
+    """
+    rewards, prompt_ids = rollout_arrays(rollouts)
+    return {
+        "rewards": rewards,
+        "prompt_ids": prompt_ids,
+        "absolute": None if baseline is None else absolute_advantages(rewards, baseline),
+        "relative": group_relative_advantages(rewards, prompt_ids, eps),
+    }
+
+
+def run_advantages(rollout_history, stats_history=None, eps: float = EPS):
+    """
+    Advantages for a whole run in one pass. Rollouts of all steps are flattened;
+    step t occupies [offsets[t], offsets[t + 1]). Groups are (step, prompt_id),
+    so relative advantages match step_advantages step by step.
+
+    Returns a dict with offsets, steps, rewards, prompt_ids, relative and, when
+    stats_history (with a "baseline" per step) is given, absolute.
+
+    A RolloutTable (rollout_table.py) is read from its columns directly.
+    """
+    if hasattr(rollout_history, "offsets") and hasattr(rollout_history, "prompt_code"):
+        offsets = np.asarray(rollout_history.offsets)
+        steps = np.asarray(rollout_history.step)
+        rewards = np.asarray(rollout_history.reward, dtype=float)
+        prompt_ids = rollout_history.prompt_ids
+        pid, n_pids = np.asarray(rollout_history.prompt_code), len(rollout_history.prompt_id_values)
+        sizes = np.diff(offsets)
+    else:
+        sizes = np.fromiter((len(step) for step in rollout_history), dtype=np.int64, count=len(rollout_history))
+        offsets = np.concatenate(([0], np.cumsum(sizes)))
+        steps = np.repeat(np.arange(len(sizes)), sizes)
+        flat = [r for step in rollout_history for r in step]
+        rewards, prompt_ids = rollout_arrays(flat)
+        pid = n_pids = None
+
+    relative = rewards.copy()
+    if rewards.size:
+        if pid is None:
+            keys, pid = np.unique(prompt_ids, return_inverse=True)
+            pid, n_pids = pid.ravel(), len(keys)
+        segments, groups = np.unique(steps.astype(np.int64) * n_pids + pid, return_inverse=True)
+        relative = segment_zscore(rewards, groups.ravel(), len(segments), eps)
+
+    out = {
+        "offsets": offsets,
+        "steps": steps,
+        "rewards": rewards,
+        "prompt_ids": prompt_ids,
+        "relative": relative,
+        "absolute": None,
+    }
+    if stats_history is not None:
+        baselines = np.array([s["baseline"] for s in stats_history[: len(sizes)]], dtype=float)
+        out["absolute"] = rewards - baselines[steps]
+    return out
@@ -0,0 +1,179 @@
+from __future__ import annotations
+
+import types
+from typing import Any, Callable, Dict, Optional, Sequence, Tuple
+
+import numpy as np
+
+ADVANTAGE_FUNCTIONS = ("step_advantages", "run_advantages", "group_relative_advantages")
+
+
+def _rollout_arrays(rollouts):
+    # (rewards, prompt_ids) for a list of rollouts or a RolloutTable step
+    if hasattr(rollouts, "rewards") and hasattr(rollouts, "prompt_ids"):
+        return np.asarray(rollouts.rewards, dtype=float), np.asarray(rollouts.prompt_ids)
+    return np.array([r.reward for r in rollouts], dtype=float), np.array([r.prompt_id for r in rollouts])
+
+
+def _apply_per_group(fn, values, groups):
+    # fn(list of one group's values, in rollout order) -> that group's advantages
+    out = np.empty(len(values), dtype=float)
+    order = np.argsort(groups, kind="stable")
+    for idx in np.split(order, np.flatnonzero(np.diff(groups[order])) + 1):
+        out[idx] = np.asarray(fn([float(v) for v in values[idx]]), dtype=float)
+    return out
+
+
+class GroupwiseAdvantages:
+    """
+    Advantage namespace for a per-group function, the helpers' older contract:
+    compute_group_advantages(rewards: list[float]) -> list[float], applied to each
+    prompt group (each (step, prompt) group for a whole run). Rewards, absolute
+    advantages and offsets come from `base` (group_advantages) when it is
+    available, and are computed here from rollout lists otherwise.
+    """
+
+    def __init__(self, compute_group_advantages: Callable, base: Any = None):
+        self.compute_group_advantages = compute_group_advantages
+        self.base = base
+
+    def group_relative_advantages(self, rewards, prompt_ids, eps=None):
+        rewards = np.asarray(rewards, dtype=float)
+        if rewards.size == 0:
+            return rewards.copy()
+        _, groups = np.unique(np.asarray(prompt_ids), return_inverse=True)
+        return _apply_per_group(self.compute_group_advantages, rewards, groups.ravel())
+
+    def step_advantages(self, rollouts, baseline=None, eps=None):
+        if self.base is not None:
+            out = self.base.step_advantages(rollouts, baseline)
+        else:
+            rewards, prompt_ids = _rollout_arrays(rollouts)
+            out = {"rewards": rewards, "prompt_ids": prompt_ids,
+                   "absolute": None if baseline is None else rewards - baseline}
+        out["relative"] = self.group_relative_advantages(out["rewards"], out["prompt_ids"])
+        return out
+
+    def run_advantages(self, rollout_history, stats_history=None, eps=None):
+        if self.base is not None:
+            out = self.base.run_advantages(rollout_history, stats_history)
+        else:
+            sizes = np.array([len(step) for step in rollout_history], dtype=np.int64)
+            steps = np.repeat(np.arange(len(sizes)), sizes)
+            rewards, prompt_ids = _rollout_arrays([r for step in rollout_history for r in step])
+            out = {"offsets": np.concatenate(([0], np.cumsum(sizes))), "steps": steps, "rewards": rewards,
+                   "prompt_ids": prompt_ids, "relative": rewards.copy(), "absolute": None}
+            if stats_history is not None:
+                baselines = np.array([s["baseline"] for s in stats_history[: len(sizes)]], dtype=float)
+                out["absolute"] = rewards - baselines[steps]
+        rewards = out["rewards"]
+        if rewards.size:
+            _, pid = np.unique(np.asarray(out["prompt_ids"]), return_inverse=True)
+            pid = pid.ravel()
+            keys = np.asarray(out["steps"], dtype=np.int64) * (int(pid.max()) + 1) + pid
+            _, groups = np.unique(keys, return_inverse=True)
+            out["relative"] = _apply_per_group(self.compute_group_advantages, rewards, groups.ravel())
+        return out
+
+
+class HelperContext:
+    """
+    Everything the plotting helpers used to look up in their module globals.
+
+      - actions: action names, in plot order; action_index maps name -> column
+      - advantages: namespace with step_advantages / run_advantages /
+        group_relative_advantages (default: the group_advantages module)
+      - compute_group_advantages(rewards: list[float]) -> list[float]: optional
+        per-group advantage function; relative advantages then come from it
+        (see GroupwiseAdvantages) instead of the built-in z-score
+      - is_correct_answer(transcript, correct_answer) -> bool (ranking table)
+      - noise_shift_step: step to mark as reward-model drift (summary plot)
+
+    Build it once and pass ctx=... to each helper; two contexts can be used side
+    by side (e.g. in parallel render workers) without touching any module.
+    A plain class rather than a dataclass, so this file also works exec'd
+    standalone like the other helpers.
+    """
+
+    def __init__(
+        self,
+        actions: Sequence[str],
+        advantages: Any = None,
+        is_correct_answer: Optional[Callable[[str, str], bool]] = None,
+        noise_shift_step: Optional[int] = None,
+        compute_group_advantages: Optional[Callable[[list], list]] = None,
+    ):
+        self.actions: Tuple[str, ...] = tuple(actions)
+        self.action_index: Dict[str, int] = {a: i for i, a in enumerate(self.actions)}
+        if advantages is None:
+            try:
+                import group_advantages as advantages
+            except ImportError:
+                advantages = None
+        if compute_group_advantages is not None:
+            advantages = GroupwiseAdvantages(compute_group_advantages, advantages)
+        self.advantages = advantages
+        self.is_correct_answer = is_correct_answer
+        self.noise_shift_step = noise_shift_step
+
+    def __repr__(self):
+        return f"HelperContext(actions={self.actions!r}, noise_shift_step={self.noise_shift_step!r})"
+
+    @classmethod
+    def from_namespace(cls, ns: Dict[str, Any], require_actions: bool = True) -> "HelperContext":
+        """
+        Context from injected module globals (mod.ACTIONS = ..., mod.step_advantages = ...,
+        or the older mod.compute_group_advantages = ...).
+        """
+        actions = ns.get("ACTIONS")
+        if actions is None and require_actions:
+            raise NameError(
+                "ACTIONS is not defined in the module namespace. "
+                "Pass ctx=HelperContext(actions=ACTIONS, ...) or inject it, e.g. mod.ACTIONS = ACTIONS"
+            )
+        injected = {name: ns[name] for name in ADVANTAGE_FUNCTIONS if name in ns}
+        return cls(
+            actions=actions or (),
+            advantages=types.SimpleNamespace(**injected) if injected else None,
+            is_correct_answer=ns.get("is_correct_answer"),
+            noise_shift_step=ns.get("NOISE_SHIFT_STEP"),
+            compute_group_advantages=ns.get("compute_group_advantages"),
+        )
+
+    def advantage_fn(self, name: str) -> Callable:
+        fn = getattr(self.advantages, name, None)
+        if fn is None:
+            raise NameError(
+                f"{name} is not available. Pass HelperContext(advantages=group_advantages) "
+                "or put helper_functions on sys.path."
+            )
+        return fn
+
+    def policy_vector(self, policy) -> np.ndarray:
+        """Probabilities in action order, from a dict keyed by action or an array indexed by action."""
+        if isinstance(policy, dict):
+            return np.array([policy[a] for a in self.actions], dtype=float)
+        return np.asarray(policy, dtype=float)
+
+    def policy_matrix(self, policies: Sequence) -> np.ndarray:
+        """(steps, actions) probabilities for a policy history."""
+        if len(policies) and not isinstance(policies[0], dict):
+            return np.asarray(policies, dtype=float).reshape(len(policies), len(self.actions))
+        out = np.empty((len(policies), len(self.actions)))
+        for t, policy in enumerate(policies):
+            out[t] = [policy[a] for a in self.actions]
+        return out
+
+    def action_codes(self, actions: Sequence[str]) -> np.ndarray:
+        """Column index of each action name (-1 for names not in actions)."""
+        index = self.action_index
+        return np.fromiter((index.get(a, -1) for a in actions), dtype=np.int64, count=len(actions))
+
+    def mean_by_action(self, actions: Sequence[str], values, default: float = 0.0) -> np.ndarray:
+        """Mean of `values` per action (aligned with self.actions); `default` where an action is absent."""
+        codes = self.action_codes(actions)
+        keep = codes >= 0
+        n = len(self.actions)
+        counts = np.bincount(codes[keep], minlength=n)
+        sums = np.bincount(codes[keep], weights=np.asarray(values, dtype=float)[keep], minlength=n)
+        return np.where(counts > 0, sums / np.maximum(counts, 1), default)
@@ -1,8 +1,62 @@
 from __future__ import annotations
 
+import csv
+import html
 from typing import Dict, Tuple, Optional
 import numpy as np
 
+try:
+    from helper_context import HelperContext
+except ImportError:
+    class HelperContext:
+        """
+        Stand-in when this file is exec'd without helper_context.py: relative
+        advantages come from the injected compute_group_advantages, applied to
+        each (step, prompt) group.
+        """
+
+        def __init__(self, compute_group_advantages, is_correct_answer=None):
+            self.compute_group_advantages = compute_group_advantages
+            self.is_correct_answer = is_correct_answer
+
+        @classmethod
+        def from_namespace(cls, ns, require_actions=False):
+            if "compute_group_advantages" not in ns:
+                raise NameError(
+                    "compute_group_advantages is not defined in the module namespace. "
+                    "Inject it after loading, e.g. mod.compute_group_advantages = compute_group_advantages"
+                )
+            return cls(ns["compute_group_advantages"], ns.get("is_correct_answer"))
+
+        def advantage_fn(self, name):
+            return getattr(self, name)
+
+        def _per_group(self, rewards, keys):
+            groups = {}
+            for i, key in enumerate(keys):
+                groups.setdefault(key, []).append(i)
+            out = np.zeros(len(rewards))
+            for idxs in groups.values():
+                out[idxs] = self.compute_group_advantages([float(rewards[i]) for i in idxs])
+            return out
+
+        def group_relative_advantages(self, rewards, prompt_ids):
+            return self._per_group(rewards, list(prompt_ids))
+
+        def run_advantages(self, rollout_history, stats_history=None):
+            flat = [(t, r) for t, step in enumerate(rollout_history) for r in step]
+            steps = np.array([t for t, _ in flat], dtype=np.int64)
+            rewards = np.array([r.reward for _, r in flat], dtype=float)
+            prompt_ids = np.array([r.prompt_id for _, r in flat])
+            out = {"steps": steps, "rewards": rewards, "prompt_ids": prompt_ids, "absolute": None,
+                   "relative": self._per_group(rewards, list(zip(steps.tolist(), prompt_ids.tolist())))}
+            if stats_history is not None:
+                out["absolute"] = rewards - np.array([stats_history[t]["baseline"] for t in steps], dtype=float)
+            return out
+
+REPORT_COLUMNS = ("step_idx", "prompt_id", "rank", "idx", "action", "raw_reward", "reward", "advantage", "correct")
+GROUP_COLUMNS = ("step_idx", "prompt_id", "prompt", "n", "mean_reward", "mean_advantage", "std_advantage", "baseline")
+
 
 def show_ranking_table(
     step_idx: int,
@@ -11,40 +65,39 @@ def show_ranking_table(
     stats,
     method_name: str,
     reward_noise_map: Optional[Dict[int, Tuple[float, float]]] = None,
+    ctx=None,
 ):
     """
     Show a per-prompt ranking table for one prompt group.
     Displays: rollout index, action, raw reward, observed reward, rank, relative advantage.
+    For every group of a run at once, use ranking_report / write_ranking_report.
 
-    External deps you inject into this module namespace (same pattern as ACTIONS):
-      - compute_group_advantages(rewards: list[float]) -> list[float]
-      - is_correct_answer(transcript: str, correct_answer: str) -> bool
+    ctx: a HelperContext (helper_context.py) with group_relative_advantages and
+    is_correct_answer(transcript: str, correct_answer: str) -> bool. Without it,
+    is_correct_answer (and optionally group_relative_advantages) is read from
+    this module's namespace, as injected by the caller.
     """
     if step_idx >= len(rollouts):
         print(f"Step {step_idx} not available")
         return
 
-    # resolve injected functions
-    try:
-        compute_group_advantages = globals()["compute_group_advantages"]
-    except KeyError:
-        raise NameError(
-            "compute_group_advantages is not defined in the module namespace. "
-            "Inject it after loading, e.g. mod.compute_group_advantages = compute_group_advantages"
-        )
-
-    try:
-        is_correct_answer = globals()["is_correct_answer"]
-    except KeyError:
+    if ctx is None:
+        ctx = HelperContext.from_namespace(globals(), require_actions=False)
+    group_relative_advantages = ctx.advantage_fn("group_relative_advantages")
+    is_correct_answer = ctx.is_correct_answer
+    if is_correct_answer is None:
         raise NameError(
-            "is_correct_answer is not defined in the module namespace. "
-            "Inject it after loading, e.g. mod.is_correct_answer = is_correct_answer"
+            "is_correct_answer is not set. Pass ctx=HelperContext(..., is_correct_answer=is_correct_answer) "
+            "or inject it, e.g. mod.is_correct_answer = is_correct_answer"
         )
 
     step_rollouts = rollouts[step_idx]
     step_stats = stats[step_idx]
 
-    prompt_rollouts = [r for r in step_rollouts if r.prompt_id == prompt_id]
+    if hasattr(rollouts, "group"):  # RolloutTable: (step, prompt_id) index lookup
+        prompt_rollouts = rollouts.group(step_idx, prompt_id)
+    else:
+        prompt_rollouts = [r for r in step_rollouts if r.prompt_id == prompt_id]
 
     if not prompt_rollouts:
         print(f"No rollouts found for prompt_id {prompt_id} at step {step_idx}")
@@ -67,7 +120,7 @@ def show_ranking_table(
         advantages = [r - baseline for r in rewards]
         ranked_indices = sorted(range(len(rewards)), key=lambda i: rewards[i], reverse=True)
     else:
-        advantages = compute_group_advantages(rewards)
+        advantages = group_relative_advantages(rewards, [prompt_id] * len(rewards))
         ranked_indices = sorted(range(len(rewards)), key=lambda i: rewards[i], reverse=True)
 
     print("=" * 110)
@@ -105,3 +158,157 @@ def show_ranking_table(
     print(f"Group mean advantage: {np.mean(advantages):.3f}")
     print(f"Group std advantage: {np.std(advantages):.3f}")
     print()
+
+
+# ---------------------------------------------------------------------------
+# Bulk reports: every (step, prompt) group of a run in one pass
+# ---------------------------------------------------------------------------
+
+def _flat_fields(rollouts):
+    """action, prompt, (transcript, correct_answer) pair codes and decoder, row-aligned with run_advantages."""
+    if hasattr(rollouts, "codes"):  # RolloutTable
+        t_codes = np.asarray(rollouts.codes["transcript"], dtype=np.int64)
+        a_codes = np.asarray(rollouts.codes["correct_answer"], dtype=np.int64)
+        pairs = (t_codes + 1) * (len(rollouts.pools["correct_answer"]) + 1) + (a_codes + 1)
+        uniq, inverse = np.unique(pairs, return_inverse=True)
+        first = np.zeros(len(uniq), dtype=np.int64)
+        first[inverse[::-1]] = np.arange(len(pairs))[::-1]
+        keys = [(row.transcript, row.correct_answer) for row in map(rollouts.row, first)]
+        return (
+            np.array(rollouts.strings("action"), dtype=object),
+            np.array(rollouts.strings("prompt"), dtype=object),
+            inverse.ravel(),
+            keys,
+        )
+    flat = [r for step in rollouts for r in step]
+    cache: Dict[Tuple[str, str], int] = {}
+    inverse = np.fromiter(
+        (cache.setdefault((r.transcript, r.correct_answer), len(cache)) for r in flat), dtype=np.int64, count=len(flat)
+    )
+    return (
+        np.array([r.action for r in flat], dtype=object),
+        np.array([r.prompt for r in flat], dtype=object),
+        inverse,
+        list(cache),
+    )
+
+
+def ranking_report(
+    rollouts,
+    stats,
+    method_name: str,
+    reward_noise_map: Optional[Dict[int, Tuple[float, float]]] = None,
+    ctx=None,
+):
+    """
+    The show_ranking_table numbers for every (step, prompt_id) group of a run.
+
+    Advantages come from one run_advantages call, is_correct_answer runs once per
+    distinct (transcript, correct_answer), and ranks come from a single lexsort
+    (group, -reward, position), ties kept in rollout order as in the table.
+
+    Returns {"method": ..., "rows": {column: array}, "groups": {column: array}}
+    with REPORT_COLUMNS per rollout (sorted by step, prompt, rank) and
+    GROUP_COLUMNS per group. See write_ranking_report / report_to_dataframe.
+    """
+    if ctx is None:
+        ctx = HelperContext.from_namespace(globals(), require_actions=False)
+    is_correct_answer = ctx.is_correct_answer
+    if is_correct_answer is None:
+        raise NameError(
+            "is_correct_answer is not set. Pass ctx=HelperContext(..., is_correct_answer=is_correct_answer) "
+            "or inject it, e.g. mod.is_correct_answer = is_correct_answer"
+        )
+    absolute = method_name == "Absolute Baseline"
+    run = ctx.advantage_fn("run_advantages")(rollouts, stats if absolute else None)
+    rewards, steps, prompt_ids = run["rewards"], np.asarray(run["steps"]), np.asarray(run["prompt_ids"])
+    advantages = run["absolute"] if absolute else run["relative"]
+    n = len(rewards)
+
+    actions, prompts, pair_idx, pairs = _flat_fields(rollouts)
+    verdicts = np.fromiter((bool(is_correct_answer(t, a)) for t, a in pairs), dtype=bool, count=len(pairs))
+    correct = verdicts[pair_idx] if n else np.zeros(0, dtype=bool)
+
+    raw = rewards.copy()
+    if reward_noise_map:
+        for pid, (scale, bias) in reward_noise_map.items():
+            if scale > 0:
+                mask = prompt_ids == pid
+                raw[mask] = (rewards[mask] - bias) / scale
+
+    pid_keys, pid_codes = np.unique(prompt_ids, return_inverse=True) if n else (np.zeros(0), np.zeros(0, int))
+    group = steps.astype(np.int64) * max(len(pid_keys), 1) + pid_codes.ravel()
+    position = np.arange(n)
+
+    # idx: position within the group in rollout order; rank: 1-based by reward, descending
+    by_group = np.argsort(group, kind="stable")
+    starts = np.searchsorted(group[by_group], group[by_group], side="left")
+    idx = np.empty(n, dtype=np.int64)
+    idx[by_group] = position - starts
+    order = np.lexsort((idx, -rewards, group))
+    rank = np.empty(n, dtype=np.int64)
+    rank[order] = position - starts + 1  # same group boundaries: group is the primary key of both sorts
+
+    rows = {
+        "step_idx": steps[order],
+        "prompt_id": prompt_ids[order],
+        "rank": rank[order],
+        "idx": idx[order],
+        "action": actions[order],
+        "raw_reward": raw[order],
+        "reward": rewards[order],
+        "advantage": advantages[order],
+        "correct": correct[order],
+    }
+
+    seg_keys, seg, counts = np.unique(group, return_inverse=True, return_counts=True)
+    seg = seg.ravel()
+    first = np.zeros(len(seg_keys), dtype=np.int64)
+    first[seg[::-1]] = position[::-1]
+    mean_adv = np.bincount(seg, weights=advantages, minlength=len(seg_keys)) / np.maximum(counts, 1)
+    dev = advantages - mean_adv[seg]
+    groups = {
+        "step_idx": steps[first],
+        "prompt_id": prompt_ids[first],
+        "prompt": prompts[first],
+        "n": counts,
+        "mean_reward": np.bincount(seg, weights=rewards, minlength=len(seg_keys)) / np.maximum(counts, 1),
+        "mean_advantage": mean_adv,
+        "std_advantage": np.sqrt(np.bincount(seg, weights=dev * dev, minlength=len(seg_keys)) / np.maximum(counts, 1)),
+        "baseline": (np.array([stats[int(t)]["baseline"] for t in steps[first]], dtype=float)
+                     if absolute else np.full(len(seg_keys), np.nan)),
+    }
+    return {"method": method_name, "rows": rows, "groups": groups}
+
+
+def _records(columns):
+    names = list(columns)
+    return names, zip(*(columns[c].tolist() for c in names))
+
+
+def write_ranking_report(report, path: str, table: str = "rows"):
+    """Write report[table] ("rows" or "groups") as CSV, or HTML for *.html / *.htm paths."""
+    names, records = _records(report[table])
+    if path.lower().endswith((".html", ".htm")):
+        with open(path, "w", encoding="utf-8") as fh:
+            fh.write(f"<h3>{html.escape(report['method'])} ranking report ({table})</h3>\n")
+            fh.write('<table border="1" class="ranking-report">\n<thead><tr>')
+            fh.write("".join(f"<th>{html.escape(n)}</th>" for n in names))
+            fh.write("</tr></thead>\n<tbody>\n")
+            for rec in records:
+                cells = (f"{v:.3f}" if isinstance(v, float) else ("✓" if v is True else "✗" if v is False else v)
+                         for v in rec)
+                fh.write("<tr>" + "".join(f"<td>{html.escape(str(c))}</td>" for c in cells) + "</tr>\n")
+            fh.write("</tbody></table>\n")
+    else:
+        with open(path, "w", newline="", encoding="utf-8") as fh:
+            writer = csv.writer(fh)
+            writer.writerow(names)
+            writer.writerows(records)
+    return path
+
+
+def report_to_dataframe(report, table: str = "rows"):
+    """report[table] as a pandas DataFrame (pandas is only needed for this)."""
+    import pandas as pd
+    return pd.DataFrame(report[table])
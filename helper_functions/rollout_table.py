@@ -0,0 +1,307 @@
+from __future__ import annotations
+
+import json
+import os
+from collections import namedtuple
+from collections.abc import Sequence
+
+import numpy as np
+
+STRING_FIELDS = ("action", "prompt", "transcript", "correct_answer")
+RolloutRow = namedtuple("RolloutRow", ("reward", "prompt_id", "step") + STRING_FIELDS)
+
+FORMAT_VERSION = 1
+
+
+class StringPool:
+    """Distinct strings as one UTF-8 buffer plus offsets; code i decodes to pool[i]."""
+
+    def __init__(self, data, offsets):
+        self.data = data  # uint8
+        self.offsets = offsets  # int64, len(pool) + 1
+        self._codes = None
+
+    @classmethod
+    def from_strings(cls, strings):
+        encoded = [s.encode("utf-8") for s in strings]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(b) for b in encoded], out=offsets[1:])
+        data = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+        return cls(data, offsets)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, code):
+        lo, hi = self.offsets[code], self.offsets[code + 1]
+        return self.data[lo:hi].tobytes().decode("utf-8")
+
+    def tolist(self):
+        return [self[i] for i in range(len(self))]
+
+    def code(self, s):
+        """Code of `s`, or -1 when it is not in the pool."""
+        if self._codes is None:
+            self._codes = {v: i for i, v in enumerate(self.tolist())}
+        return self._codes.get(s, -1)
+
+
+def _encode(values):
+    # dictionary-encode in first-seen order; None -> -1
+    codes = np.empty(len(values), dtype=np.int32)
+    vocab = {}
+    for i, v in enumerate(values):
+        codes[i] = -1 if v is None else vocab.setdefault(v, len(vocab))
+    return codes, list(vocab)
+
+
+class StepView(Sequence):
+    """The rollouts of one step; iterates RolloutRow like the original list."""
+
+    def __init__(self, table, step):
+        self.table = table
+        self.step = step
+        self.start, self.stop = int(table.offsets[step]), int(table.offsets[step + 1])
+
+    def __len__(self):
+        return self.stop - self.start
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self.table.row(self.start + j) for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        return self.table.row(self.start + i)
+
+    def __iter__(self):
+        return (self.table.row(i) for i in range(self.start, self.stop))
+
+    @property
+    def rewards(self):
+        return self.table.reward[self.start:self.stop]
+
+    @property
+    def prompt_ids(self):
+        return self.table.prompt_ids[self.start:self.stop]
+
+
+class RolloutTable:
+    """
+    Columnar store for a run's rollouts (a list of steps, each a list of objects
+    with reward, prompt_id, action, prompt, transcript, correct_answer).
+
+    Columns are NumPy arrays over all rollouts, step by step: reward (float64),
+    step (int32), prompt_code (int32 into prompt_id_values), and an int32 code
+    per string field into a StringPool. Step t is rows [offsets[t], offsets[t+1]).
+
+    The table stands in for the list of lists: len(table) is the number of
+    steps, table[t] is a StepView of rows and table[a:b] a table of those steps.
+    group(step, prompt_id) answers from a sorted (step, prompt_id) index.
+    save(path) writes one .npy per column; load(path) memory-maps them.
+    """
+
+    def __init__(self, columns, pools, prompt_id_values, offsets, index=None):
+        self.reward = columns["reward"]
+        self.step = columns["step"]
+        self.prompt_code = columns["prompt_code"]
+        self.codes = {f: columns[f] for f in STRING_FIELDS}
+        self.pools = pools
+        self.prompt_id_values = prompt_id_values  # int64 array or StringPool
+        self.offsets = offsets
+        self._index = index  # (order, sorted keys); built on first group()
+        self._pid_lookup = None
+        self._prompt_ids = None
+
+    # -- construction ---------------------------------------------------------
+
+    @classmethod
+    def from_history(cls, rollout_history):
+        sizes = [len(step) for step in rollout_history]
+        offsets = np.zeros(len(sizes) + 1, dtype=np.int64)
+        np.cumsum(sizes, out=offsets[1:])
+        flat = [r for step in rollout_history for r in step]
+        n = len(flat)
+
+        columns = {
+            "reward": np.fromiter((r.reward for r in flat), dtype=np.float64, count=n),
+            "step": np.repeat(np.arange(len(sizes), dtype=np.int32), sizes),
+        }
+        pid_codes, pid_vocab = _encode([r.prompt_id for r in flat])
+        columns["prompt_code"] = pid_codes
+        if all(isinstance(p, (int, np.integer)) for p in pid_vocab):
+            prompt_id_values = np.array(pid_vocab, dtype=np.int64)
+        else:
+            prompt_id_values = StringPool.from_strings([str(p) for p in pid_vocab])
+
+        pools = {}
+        for field in STRING_FIELDS:
+            codes, vocab = _encode([getattr(r, field, None) for r in flat])
+            columns[field] = codes
+            pools[field] = StringPool.from_strings(vocab)
+        return cls(columns, pools, prompt_id_values, offsets)
+
+    # -- list-of-steps protocol -----------------------------------------------
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, step):
+        if isinstance(step, slice):
+            start, stop, stride = step.indices(len(self))
+            if stride != 1:
+                raise ValueError("RolloutTable only supports contiguous step slices")
+            return self._steps(start, max(start, stop))
+        if step < 0:
+            step += len(self)
+        if not 0 <= step < len(self):
+            raise IndexError(step)
+        return StepView(self, step)
+
+    def __iter__(self):
+        return (StepView(self, t) for t in range(len(self)))
+
+    def _steps(self, start, stop):
+        lo, hi = int(self.offsets[start]), int(self.offsets[stop])
+        columns = {
+            "reward": self.reward[lo:hi],
+            "step": self.step[lo:hi] - start,
+            "prompt_code": self.prompt_code[lo:hi],
+            **{f: c[lo:hi] for f, c in self.codes.items()},
+        }
+        return RolloutTable(columns, self.pools, self.prompt_id_values, self.offsets[start:stop + 1] - lo)
+
+    # -- rows and columns -----------------------------------------------------
+
+    @property
+    def n_rollouts(self):
+        return len(self.reward)
+
+    @property
+    def prompt_ids(self):
+        """prompt_id per row (int64, or object array of str)."""
+        if self._prompt_ids is None:
+            values = self.prompt_id_values
+            if isinstance(values, StringPool):
+                values = np.array(values.tolist(), dtype=object)
+            self._prompt_ids = np.asarray(values)[self.prompt_code]
+        return self._prompt_ids
+
+    def prompt_id(self, code):
+        values = self.prompt_id_values
+        return values[code] if isinstance(values, StringPool) else int(values[code])
+
+    def strings(self, field, rows=None):
+        """Decoded values of a string field (all rows, or the given row indices)."""
+        pool, codes = self.pools[field], self.codes[field]
+        codes = codes if rows is None else codes[rows]
+        vocab = pool.tolist()
+        return [None if c < 0 else vocab[c] for c in codes]
+
+    def row(self, i):
+        values = {}
+        for field in STRING_FIELDS:
+            c = self.codes[field][i]
+            values[field] = None if c < 0 else self.pools[field][c]
+        return RolloutRow(
+            reward=float(self.reward[i]),
+            prompt_id=self.prompt_id(self.prompt_code[i]),
+            step=int(self.step[i]),
+            **values,
+        )
+
+    # -- (step, prompt_id) index ----------------------------------------------
+
+    def _keys(self):
+        return self.step.astype(np.int64) * len(self.prompt_id_values) + self.prompt_code
+
+    @property
+    def index(self):
+        if self._index is None:
+            keys = self._keys()
+            order = np.argsort(keys, kind="stable")
+            self._index = (order, keys[order])
+        return self._index
+
+    def prompt_code_of(self, prompt_id):
+        """Code of a prompt_id, or -1 when the run never saw it."""
+        if self._pid_lookup is None:
+            values = self.prompt_id_values
+            vocab = values.tolist()
+            self._pid_lookup = {v: i for i, v in enumerate(vocab)}
+        return self._pid_lookup.get(prompt_id, -1)
+
+    def group_rows(self, step, prompt_id):
+        """Row indices (in rollout order) of one step's rollouts for one prompt."""
+        code = self.prompt_code_of(prompt_id)
+        order, sorted_keys = self.index
+        if code < 0:
+            return order[:0]
+        key = step * len(self.prompt_id_values) + code
+        lo, hi = np.searchsorted(sorted_keys, [key, key + 1])
+        return order[lo:hi]
+
+    def group(self, step, prompt_id):
+        """RolloutRow list for one (step, prompt_id) group."""
+        return [self.row(i) for i in self.group_rows(step, prompt_id)]
+
+    # -- persistence ----------------------------------------------------------
+
+    def save(self, path):
+        """Write the table to directory `path` (one .npy per array plus meta.json)."""
+        os.makedirs(path, exist_ok=True)
+        arrays = {
+            "reward": self.reward,
+            "step": self.step,
+            "prompt_code": self.prompt_code,
+            "offsets": self.offsets,
+            "index_order": self.index[0],
+            "index_keys": self.index[1],
+        }
+        for field in STRING_FIELDS:
+            arrays[f"{field}.codes"] = self.codes[field]
+            arrays[f"{field}.data"] = self.pools[field].data
+            arrays[f"{field}.offsets"] = self.pools[field].offsets
+        if isinstance(self.prompt_id_values, StringPool):
+            kind = "str"
+            arrays["prompt_id.data"] = self.prompt_id_values.data
+            arrays["prompt_id.offsets"] = self.prompt_id_values.offsets
+        else:
+            kind = "int"
+            arrays["prompt_id.values"] = self.prompt_id_values
+        for name, arr in arrays.items():
+            np.save(os.path.join(path, name + ".npy"), np.ascontiguousarray(arr))
+        meta = {
+            "version": FORMAT_VERSION,
+            "n_rollouts": self.n_rollouts,
+            "n_steps": len(self),
+            "prompt_id_kind": kind,
+            "string_fields": list(STRING_FIELDS),
+        }
+        with open(os.path.join(path, "meta.json"), "w") as fh:
+            json.dump(meta, fh, indent=2)
+        return path
+
+    @classmethod
+    def load(cls, path, mmap: bool = True):
+        """Open a saved table; with mmap, columns are read from disk on demand."""
+        with open(os.path.join(path, "meta.json")) as fh:
+            meta = json.load(fh)
+        if meta.get("version") != FORMAT_VERSION:
+            raise ValueError(f"{path}: unsupported RolloutTable format {meta.get('version')!r}")
+
+        def arr(name):
+            return np.load(os.path.join(path, name + ".npy"), mmap_mode="r" if mmap else None)
+
+        columns = {"reward": arr("reward"), "step": arr("step"), "prompt_code": arr("prompt_code")}
+        pools = {}
+        for field in STRING_FIELDS:
+            columns[field] = arr(f"{field}.codes")
+            pools[field] = StringPool(arr(f"{field}.data"), arr(f"{field}.offsets"))
+        if meta["prompt_id_kind"] == "str":
+            prompt_id_values = StringPool(arr("prompt_id.data"), arr("prompt_id.offsets"))
+        else:
+            prompt_id_values = arr("prompt_id.values")
+        return cls(columns, pools, prompt_id_values, arr("offsets"),
+                   index=(arr("index_order"), arr("index_keys")))
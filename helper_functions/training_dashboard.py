@@ -0,0 +1,379 @@
+from __future__ import annotations
+
+import os
+import sys
+import threading
+
+import numpy as np
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+try:
+    from helper_context import HelperContext
+except ImportError:
+    class HelperContext:
+        """
+        What the dashboard needs from helper_context.HelperContext, read from the
+        injected ACTIONS, compute_group_advantages and NOISE_SHIFT_STEP when this
+        file is exec'd on its own.
+        """
+
+        def __init__(self, actions, compute_group_advantages, noise_shift_step=None):
+            self.actions = tuple(actions)
+            self.compute_group_advantages = compute_group_advantages
+            self.noise_shift_step = noise_shift_step
+
+        @classmethod
+        def from_namespace(cls, ns, require_actions=True):
+            for name in ("ACTIONS", "compute_group_advantages"):
+                if name not in ns:
+                    raise NameError(
+                        f"{name} is not defined in the module namespace. "
+                        f"Inject it after loading, e.g. mod.{name} = {name}"
+                    )
+            return cls(ns["ACTIONS"], ns["compute_group_advantages"], ns.get("NOISE_SHIFT_STEP"))
+
+        def advantage_fn(self, name):
+            return getattr(self, name)
+
+        def step_advantages(self, rollouts, baseline=None):
+            rewards = np.array([r.reward for r in rollouts], dtype=float)
+            relative = np.zeros(len(rewards))
+            by_prompt = {}
+            for i, r in enumerate(rollouts):
+                by_prompt.setdefault(r.prompt_id, []).append(i)
+            for idxs in by_prompt.values():
+                relative[idxs] = self.compute_group_advantages([float(rewards[i]) for i in idxs])
+            return {"rewards": rewards, "absolute": None if baseline is None else rewards - baseline,
+                    "relative": relative}
+
+        def policy_vector(self, policy):
+            if isinstance(policy, dict):
+                return np.array([policy[a] for a in self.actions], dtype=float)
+            return np.asarray(policy, dtype=float)
+
+        def mean_by_action(self, actions, values, default=0.0):
+            sums, counts = np.zeros(len(self.actions)), np.zeros(len(self.actions))
+            index = {a: i for i, a in enumerate(self.actions)}
+            for a, v in zip(actions, values):
+                if a in index:
+                    sums[index[a]] += v
+                    counts[index[a]] += 1
+            return np.where(counts > 0, sums / np.maximum(counts, 1), default)
+
+ADV_RANGE = (-3.0, 3.0)
+ADV_BINS = 20
+STAT_KEYS = ("avg_reward", "baseline", "correctness_rate", "mean_adv", "std_adv")
+COLORS = ("b", "orange", "green", "purple", "brown", "gray")
+
+
+class StepHistory:
+    """
+    Bounded per-step series (step + STAT_KEYS) for one method.
+
+    mode="decimate" keeps the whole run: when `capacity` points are stored every
+    other one is dropped and only every 2nd, 4th, ... later step is accepted, so
+    the curve always spans step 1..now; the latest step is held separately and
+    view() appends it if decimation skipped it. mode="window" keeps the last
+    `capacity` steps in a ring buffer.
+    """
+
+    def __init__(self, capacity: int = 2048, mode: str = "decimate"):
+        if mode not in ("decimate", "window"):
+            raise ValueError(f"mode must be 'decimate' or 'window', not {mode!r}")
+        self.capacity = capacity
+        self.mode = mode
+        self.data = np.full((capacity, 1 + len(STAT_KEYS)), np.nan)
+        self.size = 0
+        self.head = 0  # window mode: next slot
+        self.stride = 1  # decimate mode: keep every stride-th append
+        self.seen = 0
+        self.latest = None  # decimate mode: last appended row, kept or not
+
+    def append(self, step, stats):
+        row = [step] + [stats.get(k, np.nan) for k in STAT_KEYS]
+        self.seen += 1
+        if self.mode == "window":
+            self.data[self.head] = row
+            self.head = (self.head + 1) % self.capacity
+            self.size = min(self.size + 1, self.capacity)
+            return
+        self.latest = row
+        if (self.seen - 1) % self.stride:
+            return
+        if self.size == self.capacity:
+            kept = self.data[: self.size : 2].copy()
+            self.data[: len(kept)] = kept
+            self.data[len(kept):] = np.nan
+            self.size = len(kept)
+            self.stride *= 2
+            if (self.seen - 1) % self.stride:
+                return
+        self.data[self.size] = row
+        self.size += 1
+
+    def view(self):
+        """(steps, stats) in step order; stats columns follow STAT_KEYS."""
+        if self.mode == "window" and self.size == self.capacity:
+            rows = np.roll(self.data, -self.head, axis=0)
+        else:
+            rows = self.data[: self.size]
+            if self.latest is not None and (self.size == 0 or rows[-1, 0] != self.latest[0]):
+                rows = np.vstack([rows, np.asarray(self.latest, dtype=float)])
+        return rows[:, 0], rows[:, 1:]
+
+
+class TrainingDashboard:
+    """
+    Live training dashboard fed one step at a time:
+
+        dash = TrainingDashboard(ctx, methods=("Absolute Baseline", "Group Relative"))
+        dash.show()                                 # in a notebook: one output that refresh() updates
+        dash.start_snapshots("run.png", every_s=30) # optional PNGs from a background thread
+        for step in ...:
+            dash.append(step_stats, policy, rollouts, method="Group Relative")
+            dash.refresh()                          # whenever you want to see it
+        dash.close()
+
+    append() only stores numbers: stats into a bounded StepHistory per method, and
+    for the latest step the policy, an advantage histogram over fixed bins and
+    the mean advantage per action. Nothing keeps the rollouts. Advantages are
+    reward - baseline for `absolute_methods`, group z-scores otherwise. Artists
+    are created once and updated in place on refresh() / snapshot.
+    """
+
+    def __init__(self, ctx=None, methods=("Absolute Baseline", "Group Relative"),
+                 capacity: int = 2048, mode: str = "decimate", dpi: int = 100,
+                 absolute_methods=("Absolute Baseline",)):
+        self.ctx = ctx if ctx is not None else HelperContext.from_namespace(globals())
+        self.methods = tuple(methods)
+        self.absolute_methods = tuple(m for m in self.methods if m in absolute_methods)
+        self.history = {m: StepHistory(capacity, mode) for m in self.methods}
+        self.latest = {m: None for m in self.methods}
+        self.edges = np.linspace(ADV_RANGE[0], ADV_RANGE[1], ADV_BINS + 1)
+        self._data_lock = threading.Lock()  # held by append() only long enough to store numbers
+        self._render_lock = threading.RLock()  # artists and the canvas
+        self._dirty = False
+        self._version = 0  # appends so far; the snapshot thread writes when it moves
+        self._last_step = 0
+        self._stop = threading.Event()
+        self._thread = None
+        self._display = None
+        self.fig = Figure(figsize=(18, 10), dpi=dpi)
+        FigureCanvasAgg(self.fig)
+        self._build()
+
+    # -- feeding --------------------------------------------------------------
+
+    def append(self, step_stats, policy=None, rollouts=None, method=None):
+        """Record one training step of `method` (default: the first method)."""
+        method = method or self.methods[0]
+        step = step_stats.get("step", self.history[method].seen + 1)
+        latest = {"step": step, "policy": None, "hist": None, "by_action": None}
+        if policy is not None:
+            latest["policy"] = self.ctx.policy_vector(policy)
+        if rollouts is not None and len(rollouts):
+            adv = self.ctx.advantage_fn("step_advantages")(rollouts, step_stats.get("baseline"))
+            absolute = method in self.absolute_methods and adv["absolute"] is not None
+            values = adv["absolute"] if absolute else adv["relative"]
+            latest["hist"] = np.histogram(values, bins=self.edges)[0]
+            latest["by_action"] = self.ctx.mean_by_action([r.action for r in rollouts], values)
+        with self._data_lock:
+            self.history[method].append(step, step_stats)
+            self.latest[method] = latest
+            self._dirty = True
+            self._version += 1
+
+    # -- figure ---------------------------------------------------------------
+
+    def _build(self):
+        fig, actions = self.fig, self.ctx.actions
+        axes = fig.subplots(2, 3)
+        fig.subplots_adjust(hspace=0.35, wspace=0.25)
+        self.axes = axes
+        colors = {m: COLORS[i % len(COLORS)] for i, m in enumerate(self.methods)}
+
+        ax = axes[0, 0]
+        self.reward_lines = {m: ax.plot([], [], color=colors[m], linewidth=2, label=m)[0] for m in self.methods}
+        self.baseline_line = ax.plot([], [], "r--", linewidth=1.5, alpha=0.7, label="Baseline")[0]
+        ax.set_title("Average Reward", fontweight="bold")
+        ax.set_xlabel("Training Step")
+        ax.set_ylim(-1.1, 1.1)
+        ax.legend(fontsize=8)
+        ax.grid(True, alpha=0.3)
+        if self.ctx.noise_shift_step is not None:
+            ax.axvline(self.ctx.noise_shift_step, color="gray", linestyle=":", linewidth=2, alpha=0.7)
+
+        ax = axes[0, 1]
+        self.correct_lines = {m: ax.plot([], [], color=colors[m], linewidth=2, label=m)[0] for m in self.methods}
+        ax.set_title("Correctness Rate", fontweight="bold")
+        ax.set_xlabel("Training Step")
+        ax.set_ylim(0, 1.0)
+        ax.legend(fontsize=8)
+        ax.grid(True, alpha=0.3)
+
+        ax = axes[0, 2]
+        self.mean_adv_lines = {m: ax.plot([], [], color=colors[m], linewidth=2, label=f"{m} mean")[0]
+                               for m in self.methods}
+        self.std_adv_lines = {m: ax.plot([], [], color=colors[m], linestyle="--", linewidth=1.5, alpha=0.7,
+                                         label=f"{m} std")[0] for m in self.methods}
+        ax.set_title("Advantage Statistics", fontweight="bold")
+        ax.set_xlabel("Training Step")
+        ax.legend(fontsize=8)
+        ax.grid(True, alpha=0.3)
+
+        n = len(self.methods)
+        width = 0.8 / n
+        x_pos = np.arange(len(actions))
+
+        ax = axes[1, 0]
+        self.policy_bars = {
+            m: ax.bar(x_pos + (i - (n - 1) / 2) * width, np.zeros(len(actions)), width, color=colors[m], alpha=0.8, label=m)
+            for i, m in enumerate(self.methods)
+        }
+        self.policy_title = ax.set_title("Current Policy", fontweight="bold")
+        ax.set_xticks(x_pos)
+        ax.set_xticklabels(actions, rotation=45, ha="right", fontsize=8)
+        ax.set_ylim(0, 1.0)
+        ax.legend(fontsize=8)
+        ax.grid(True, alpha=0.3, axis="y")
+
+        ax = axes[1, 1]
+        centers, bin_w = (self.edges[:-1] + self.edges[1:]) / 2, np.diff(self.edges)
+        self.hist_bars = {m: ax.bar(centers, np.zeros(ADV_BINS), bin_w, color=colors[m], alpha=0.6, label=m)
+                          for m in self.methods}
+        self.hist_title = ax.set_title("Advantage Distribution (latest step)", fontweight="bold")
+        ax.set_xlabel("Advantage")
+        ax.set_xlim(*ADV_RANGE)
+        ax.legend(fontsize=8)
+
+        ax = axes[1, 2]
+        self.action_bars = {
+            m: ax.barh(x_pos + (i - (n - 1) / 2) * width, np.zeros(len(actions)), width, color=colors[m], alpha=0.8, label=m)
+            for i, m in enumerate(self.methods)
+        }
+        ax.set_yticks(x_pos)
+        ax.set_yticklabels(actions, fontsize=8)
+        ax.set_title("Mean Advantage by Action (latest step)", fontweight="bold")
+        ax.axvline(0, color="black", linewidth=0.5)
+        ax.legend(fontsize=8)
+        ax.grid(True, alpha=0.3, axis="x")
+
+    def _copy_state(self):
+        with self._data_lock:
+            self._dirty = False
+            views = {m: tuple(a.copy() for a in self.history[m].view()) for m in self.methods}
+            return views, dict(self.latest)
+
+    def _update_artists(self, views, latest_by_method):
+        last_step = 0
+        hist_max, adv_lim = 1.0, 0.1
+        for m in self.methods:
+            steps, stats = views[m]
+            cols = dict(zip(STAT_KEYS, stats.T))
+            self.reward_lines[m].set_data(steps, cols["avg_reward"])
+            self.correct_lines[m].set_data(steps, cols["correctness_rate"])
+            self.mean_adv_lines[m].set_data(steps, cols["mean_adv"])
+            self.std_adv_lines[m].set_data(steps, cols["std_adv"])
+            if self.absolute_methods and m == self.absolute_methods[0]:
+                self.baseline_line.set_data(steps, cols["baseline"])
+            if len(steps):
+                last_step = max(last_step, steps[-1])
+
+            latest = latest_by_method[m]
+            if latest is None:
+                continue
+            if latest["policy"] is not None:
+                for bar, h in zip(self.policy_bars[m], latest["policy"]):
+                    bar.set_height(h)
+            if latest["hist"] is not None:
+                for bar, h in zip(self.hist_bars[m], latest["hist"]):
+                    bar.set_height(h)
+                hist_max = max(hist_max, latest["hist"].max())
+                for bar, w in zip(self.action_bars[m], latest["by_action"]):
+                    bar.set_width(w)
+                adv_lim = max(adv_lim, np.abs(latest["by_action"]).max())
+
+        for ax in self.axes[0]:
+            ax.set_xlim(0.5, max(last_step, 1) + 0.5)
+        ax = self.axes[0, 2]
+        ax.relim()
+        ax.autoscale_view(scalex=False)
+        self.axes[1, 1].set_ylim(0, hist_max * 1.05)
+        self.axes[1, 2].set_xlim(-adv_lim * 1.1, adv_lim * 1.1)
+        self.policy_title.set_text(f"Current Policy (step {int(last_step)})")
+        self.hist_title.set_text(f"Advantage Distribution (step {int(last_step)})")
+        return int(last_step)
+
+    def render(self):
+        """Bring the artists up to date with the appended data; returns the figure."""
+        with self._render_lock:
+            if self._dirty:
+                self._last_step = self._update_artists(*self._copy_state())
+            return self.fig
+
+    # -- output ---------------------------------------------------------------
+
+    def show(self):
+        """Display the dashboard once in a notebook; refresh() then updates that output."""
+        from IPython.display import display
+        self._display = display(self.render(), display_id=True)
+        return self._display
+
+    def refresh(self):
+        fig = self.render()
+        if self._display is not None:
+            with self._render_lock:
+                self._display.update(fig)
+        return fig
+
+    def snapshot(self, path):
+        """Write a PNG of the current state. `{step}` in the path is filled in; writes are atomic."""
+        with self._render_lock:
+            fig = self.render()
+            target = path.format(step=self._last_step)
+            tmp = f"{target}.tmp.png"
+            fig.savefig(tmp, format="png")
+            os.replace(tmp, target)
+        return target
+
+    def start_snapshots(self, path, every_s: float = 30.0):
+        """Write snapshot(path) every `every_s` seconds from a daemon thread, when there is new data."""
+        self.stop_snapshots()
+        self._stop.clear()
+
+        def loop():
+            written = -1
+            while not self._stop.wait(every_s):
+                if self._version != written:
+                    version = self._version
+                    try:
+                        self.snapshot(path)
+                    except Exception as e:  # keep the thread alive; retried on the next tick
+                        print(f"dashboard snapshot to {path} failed: {type(e).__name__}: {e}", file=sys.stderr)
+                    else:
+                        written = version
+
+        self._snapshot_path = path
+        self._thread = threading.Thread(target=loop, name="dashboard-snapshots", daemon=True)
+        self._thread.start()
+
+    def stop_snapshots(self):
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+
+    def close(self):
+        """Stop the snapshot thread, writing a last snapshot if one was configured."""
+        path = getattr(self, "_snapshot_path", None) if self._thread is not None else None
+        self.stop_snapshots()
+        if path is not None:
+            self.snapshot(path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
@@ -2,46 +2,142 @@ from __future__ import annotations
 
 import numpy as np
 import matplotlib.pyplot as plt
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
 
+try:
+    from helper_context import HelperContext
+except ImportError:
+    class HelperContext:
+        """The injected ACTIONS and NOISE_SHIFT_STEP, when this file is exec'd without helper_context.py."""
 
-def plot_training_summary(abs_stats, rel_stats, abs_pol, rel_pol):
+        def __init__(self, actions, noise_shift_step=None):
+            self.actions = tuple(actions)
+            self.noise_shift_step = noise_shift_step
+
+        @classmethod
+        def from_namespace(cls, ns, require_actions=True):
+            if "ACTIONS" not in ns:
+                raise NameError(
+                    "ACTIONS is not defined in the module namespace. "
+                    "Inject it after loading, e.g. mod.ACTIONS = ACTIONS"
+                )
+            return cls(ns["ACTIONS"], ns.get("NOISE_SHIFT_STEP"))
+
+        def policy_vector(self, policy):
+            if isinstance(policy, dict):
+                return np.array([policy[a] for a in self.actions], dtype=float)
+            return np.asarray(policy, dtype=float)
+
+STAT_KEYS = ("step", "avg_reward", "baseline", "correctness_rate", "mean_adv", "std_adv")
+SHORT_NAMES = {"Absolute Baseline": "Absolute", "Group Relative": "Relative"}
+COLORS = ("b", "orange", "green", "purple", "brown", "gray", "olive", "cyan", "magenta", "black", "pink", "teal")
+
+
+def stats_columns(stats):
     """
-    Create comprehensive comparison plots + print summary stats.
+    Per-step stats as {key: float array} for STAT_KEYS. Accepts the usual
+    list[dict] or something already columnar (dict of lists/arrays); missing
+    keys become NaN, a missing "step" becomes 1..n.
+    """
+    if isinstance(stats, dict):
+        n = max((len(v) for v in stats.values()), default=0)
+        cols = {k: np.asarray(stats[k], dtype=float) for k in STAT_KEYS if k in stats}
+    else:
+        n = len(stats)
+        cols = {k: np.array([s.get(k, np.nan) for s in stats], dtype=float) for k in STAT_KEYS}
+    for k in STAT_KEYS:
+        if k not in cols:
+            cols[k] = np.arange(1, n + 1, dtype=float) if k == "step" else np.full(n, np.nan)
+    return cols
 
-    Expects:
-      - abs_stats, rel_stats: list[dict] with keys:
-          step, avg_reward, baseline (abs only used), correctness_rate, mean_adv, std_adv
-      - abs_pol, rel_pol: list[dict] policies per step, keyed by action name
 
-    Optional globals you can inject into this module:
-      - ACTIONS: list[str]
-      - NOISE_SHIFT_STEP: int
+def minmax_downsample(x, y, n_buckets: int):
+    """
+    Keep the first, last, min and max point of each of `n_buckets` equal-count
+    buckets (NaNs dropped). At one bucket per pixel column the line looks the
+    same as the full series.
     """
+    x, y = np.asarray(x, dtype=float), np.asarray(y, dtype=float)
+    keep = np.isfinite(y)
+    x, y = x[keep], y[keep]
+    n = len(y)
+    if n <= 4 * n_buckets:
+        return x, y
+    bucket = np.arange(n) * n_buckets // n
+    starts = np.searchsorted(bucket, np.arange(n_buckets))
+    ends = np.append(starts[1:], n) - 1
+    picks = [starts, ends]
+    for extreme in (np.minimum, np.maximum):
+        # first index in each bucket that attains the bucket's extreme
+        hits = np.flatnonzero(y == extreme.reduceat(y, starts)[bucket])
+        picks.append(hits[np.unique(bucket[hits], return_index=True)[1]])
+    idx = np.unique(np.concatenate(picks))
+    return x[idx], y[idx]
+
+
+def lttb_downsample(x, y, n_out: int):
+    """Largest-Triangle-Three-Buckets: `n_out` points that keep the visual shape (NaNs dropped)."""
+    x, y = np.asarray(x, dtype=float), np.asarray(y, dtype=float)
+    keep = np.isfinite(y)
+    x, y = x[keep], y[keep]
+    n = len(y)
+    if n <= n_out or n_out < 3:
+        return x, y
+    edges = np.linspace(1, n - 1, n_out - 1).astype(int)
+    out = np.empty(n_out, dtype=np.int64)
+    out[0], out[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        nlo, nhi = edges[i + 1], (edges[i + 2] if i + 2 < len(edges) else n)
+        cx, cy = x[nlo:nhi].mean(), y[nlo:nhi].mean()
+        area = np.abs((x[a] - cx) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (cy - y[a]))
+        a = lo + int(np.argmax(area))
+        out[i + 1] = a
+    return x[out], y[out]
+
 
-    # Resolve ACTIONS from module globals (inject like: mod.ACTIONS = ACTIONS)
-    try:
-        ACTIONS = globals()["ACTIONS"]
-    except KeyError:
-        raise NameError(
-            "ACTIONS is not defined in the module namespace. "
-            "Inject it after loading, e.g. mod.ACTIONS = ACTIONS"
-        )
+DOWNSAMPLERS = {"minmax": minmax_downsample, "lttb": lambda x, y, n: lttb_downsample(x, y, 2 * n)}
 
-    # NOISE_SHIFT_STEP is optional
-    NOISE_SHIFT_STEP = globals().get("NOISE_SHIFT_STEP", None)
 
-    fig, axes = plt.subplots(2, 2, figsize=(14, 10))
+def _normalize_runs(runs):
+    # {name: {"stats": ..., "policy": ...}} or {name: (stats, policy)} -> {name: (columns, policy)}
+    out = {}
+    for name, run in runs.items():
+        if isinstance(run, dict) and "stats" in run:
+            stats, policy = run["stats"], run.get("policy")
+        elif isinstance(run, tuple):
+            stats, policy = run
+        else:
+            stats, policy = run, None
+        out[name] = (stats_columns(stats), policy)
+    return out
 
-    steps = [s["step"] for s in abs_stats]
+
+def _draw_summary(fig, runs, ctx, downsample="minmax", baseline_runs=("Absolute Baseline",)):
+    """Draw the four summary panels for any number of runs onto `fig`; returns the axes."""
+    axes = fig.subplots(2, 2)
+    fig.tight_layout()  # so each axes' pixel width is known before downsampling
+    reduce = DOWNSAMPLERS[downsample] if downsample else None
+    colors = {name: COLORS[i % len(COLORS)] for i, name in enumerate(runs)}
+
+    def plot(ax, x, y, *args, **kwargs):
+        if reduce is not None:
+            x, y = reduce(x, y, max(int(ax.bbox.width), 50))
+        return ax.plot(x, y, *args, **kwargs)
 
     # Average reward over time
     ax = axes[0, 0]
-    ax.plot(steps, [s["avg_reward"] for s in abs_stats], "b-", label="Absolute Baseline", linewidth=2)
-    ax.plot(steps, [s["avg_reward"] for s in rel_stats], "orange", label="Group Relative", linewidth=2)
-    ax.plot(steps, [s["baseline"] for s in abs_stats], "r--", label="Baseline (Absolute)", linewidth=1.5, alpha=0.7)
+    for name, (cols, _) in runs.items():
+        plot(ax, cols["step"], cols["avg_reward"], color=colors[name], label=name, linewidth=2)
+    for name, (cols, _) in runs.items():
+        if name in baseline_runs:
+            plot(ax, cols["step"], cols["baseline"], "r--", label=f"Baseline ({SHORT_NAMES.get(name, name)})",
+                 linewidth=1.5, alpha=0.7)
 
-    if NOISE_SHIFT_STEP is not None:
-        ax.axvline(NOISE_SHIFT_STEP, color="gray", linestyle=":", linewidth=2, alpha=0.7, label="Reward Model Drift")
+    if ctx.noise_shift_step is not None:
+        ax.axvline(ctx.noise_shift_step, color="gray", linestyle=":", linewidth=2, alpha=0.7, label="Reward Model Drift")
 
     ax.set_xlabel("Training Step")
     ax.set_ylabel("Reward")
@@ -52,8 +148,8 @@ def plot_training_summary(abs_stats, rel_stats, abs_pol, rel_pol):
 
     # Correctness rate
     ax = axes[0, 1]
-    ax.plot(steps, [s["correctness_rate"] for s in abs_stats], "b-", label="Absolute Baseline", linewidth=2)
-    ax.plot(steps, [s["correctness_rate"] for s in rel_stats], "orange", label="Group Relative", linewidth=2)
+    for name, (cols, _) in runs.items():
+        plot(ax, cols["step"], cols["correctness_rate"], color=colors[name], label=name, linewidth=2)
     ax.set_xlabel("Training Step")
     ax.set_ylabel("Correctness Rate")
     ax.set_title("True Correctness Rate Over Training", fontsize=12, fontweight="bold")
@@ -63,10 +159,13 @@ def plot_training_summary(abs_stats, rel_stats, abs_pol, rel_pol):
 
     # Advantage statistics
     ax = axes[1, 0]
-    ax.plot(steps, [s["mean_adv"] for s in abs_stats], "b-", label="Absolute Mean Adv", linewidth=2)
-    ax.plot(steps, [s["mean_adv"] for s in rel_stats], "orange", label="Relative Mean Adv", linewidth=2)
-    ax.plot(steps, [s["std_adv"] for s in abs_stats], "b--", label="Absolute Std Adv", linewidth=1.5, alpha=0.7)
-    ax.plot(steps, [s["std_adv"] for s in rel_stats], "orange", linestyle="--", label="Relative Std Adv", linewidth=1.5, alpha=0.7)
+    for name, (cols, _) in runs.items():
+        short = SHORT_NAMES.get(name, name)
+        plot(ax, cols["step"], cols["mean_adv"], color=colors[name], label=f"{short} Mean Adv", linewidth=2)
+    for name, (cols, _) in runs.items():
+        short = SHORT_NAMES.get(name, name)
+        plot(ax, cols["step"], cols["std_adv"], color=colors[name], linestyle="--", label=f"{short} Std Adv",
+             linewidth=1.5, alpha=0.7)
     ax.set_xlabel("Training Step")
     ax.set_ylabel("Advantage")
     ax.set_title("Advantage Statistics Over Training", fontsize=12, fontweight="bold")
@@ -75,24 +174,75 @@ def plot_training_summary(abs_stats, rel_stats, abs_pol, rel_pol):
 
     # Final policy comparison
     ax = axes[1, 1]
-    x_pos = np.arange(len(ACTIONS))
-    width = 0.35
-
-    abs_final = [abs_pol[-1][a] for a in ACTIONS]
-    rel_final = [rel_pol[-1][a] for a in ACTIONS]
-
-    ax.bar(x_pos - width / 2, abs_final, width, label="Absolute Baseline", alpha=0.8)
-    ax.bar(x_pos + width / 2, rel_final, width, label="Group Relative", alpha=0.8, color="orange")
+    with_policy = [(name, policy) for name, (_, policy) in runs.items() if policy is not None]
+    x_pos = np.arange(len(ctx.actions))
+    width = 0.7 / max(len(with_policy), 1) if len(with_policy) > 2 else 0.35
+    for i, (name, policy) in enumerate(with_policy):
+        offset = (i - (len(with_policy) - 1) / 2) * width
+        ax.bar(x_pos + offset, ctx.policy_vector(policy), width, label=name, alpha=0.8, color=colors[name])
 
     ax.set_xlabel("Action")
     ax.set_ylabel("Probability")
     ax.set_title("Final Policy Distribution", fontsize=12, fontweight="bold")
     ax.set_xticks(x_pos)
-    ax.set_xticklabels(ACTIONS, rotation=45, ha="right")
+    ax.set_xticklabels(ctx.actions, rotation=45, ha="right")
     ax.legend()
     ax.grid(True, alpha=0.3, axis="y")
 
-    plt.tight_layout()
+    fig.tight_layout()
+    return axes
+
+
+def render_training_summary(runs, path=None, ctx=None, downsample="minmax", figsize=(14, 10), dpi: int = 100,
+                            baseline_runs=("Absolute Baseline",)):
+    """
+    Headless summary plot for any number of runs, e.g.
+
+        render_training_summary({"Absolute Baseline": (abs_stats, abs_pol[-1]),
+                                 "Group Relative": (rel_stats, rel_pol[-1]),
+                                 "GRPO lr=3e-4": {"stats": cols, "policy": final}}, "summary.png")
+
+    stats may be list[dict] or columnar (see stats_columns). Each series is reduced
+    to about one point per pixel column of its axes with `downsample` ("minmax",
+    "lttb", or None for every point). The baseline curve is drawn for the runs in
+    `baseline_runs`. Draws on an Agg figure without pyplot, so it works in scripts
+    and worker processes; saves to `path` if given.
+    """
+    if ctx is None:
+        ctx = HelperContext.from_namespace(globals())
+    fig = Figure(figsize=figsize, dpi=dpi)
+    FigureCanvasAgg(fig)
+    _draw_summary(fig, _normalize_runs(runs), ctx, downsample, baseline_runs)
+    if path:
+        fig.savefig(path)
+    return fig
+
+
+def plot_training_summary(abs_stats, rel_stats, abs_pol, rel_pol, ctx=None, downsample="minmax"):
+    """
+    Create comprehensive comparison plots + print summary stats.
+
+    Expects:
+      - abs_stats, rel_stats: list[dict] (or columnar dicts) with keys:
+          step, avg_reward, baseline (abs only used), correctness_rate, mean_adv, std_adv
+      - abs_pol, rel_pol: list[dict] policies per step, keyed by action name
+
+    ctx: a HelperContext (helper_context.py) with ACTIONS and, optionally,
+    noise_shift_step. Without it, ACTIONS and NOISE_SHIFT_STEP are read from this
+    module's namespace, as injected by the caller. Long runs are downsampled per
+    pixel column (see render_training_summary for more than two runs or files).
+    """
+
+    if ctx is None:
+        ctx = HelperContext.from_namespace(globals())
+    runs = _normalize_runs({
+        "Absolute Baseline": (abs_stats, abs_pol[-1]),
+        "Group Relative": (rel_stats, rel_pol[-1]),
+    })
+    abs_c, rel_c = runs["Absolute Baseline"][0], runs["Group Relative"][0]
+
+    fig = plt.figure(figsize=(14, 10))
+    _draw_summary(fig, runs, ctx, downsample)
     plt.show()
 
     # Print summary statistics
@@ -101,21 +251,21 @@ def plot_training_summary(abs_stats, rel_stats, abs_pol, rel_pol):
     print("=" * 70)
 
     print("\nAbsolute Baseline Method:")
-    print(f"  Initial avg reward: {abs_stats[0]['avg_reward']:.3f}")
-    print(f"  Final avg reward: {abs_stats[-1]['avg_reward']:.3f}")
-    print(f"  Improvement: {abs_stats[-1]['avg_reward'] - abs_stats[0]['avg_reward']:+.3f}")
-    print(f"  Final correctness rate: {abs_stats[-1]['correctness_rate']:.1%}")
-    print(f"  Final baseline: {abs_stats[-1]['baseline']:.3f}")
+    print(f"  Initial avg reward: {abs_c['avg_reward'][0]:.3f}")
+    print(f"  Final avg reward: {abs_c['avg_reward'][-1]:.3f}")
+    print(f"  Improvement: {abs_c['avg_reward'][-1] - abs_c['avg_reward'][0]:+.3f}")
+    print(f"  Final correctness rate: {abs_c['correctness_rate'][-1]:.1%}")
+    print(f"  Final baseline: {abs_c['baseline'][-1]:.3f}")
 
     print("\nGroup Relative Method:")
-    print(f"  Initial avg reward: {rel_stats[0]['avg_reward']:.3f}")
-    print(f"  Final avg reward: {rel_stats[-1]['avg_reward']:.3f}")
-    print(f"  Improvement: {rel_stats[-1]['avg_reward'] - rel_stats[0]['avg_reward']:+.3f}")
-    print(f"  Final correctness rate: {rel_stats[-1]['correctness_rate']:.1%}")
+    print(f"  Initial avg reward: {rel_c['avg_reward'][0]:.3f}")
+    print(f"  Final avg reward: {rel_c['avg_reward'][-1]:.3f}")
+    print(f"  Improvement: {rel_c['avg_reward'][-1] - rel_c['avg_reward'][0]:+.3f}")
+    print(f"  Final correctness rate: {rel_c['correctness_rate'][-1]:.1%}")
 
     print("\nComparison:")
-    abs_improvement = abs_stats[-1]["avg_reward"] - abs_stats[0]["avg_reward"]
-    rel_improvement = rel_stats[-1]["avg_reward"] - rel_stats[0]["avg_reward"]
+    abs_improvement = abs_c["avg_reward"][-1] - abs_c["avg_reward"][0]
+    rel_improvement = rel_c["avg_reward"][-1] - rel_c["avg_reward"][0]
     print(f"  Absolute improvement: {abs_improvement:+.3f}")
     print(f"  Relative improvement: {rel_improvement:+.3f}")
     print(f"  Difference: {rel_improvement - abs_improvement:+.3f}")
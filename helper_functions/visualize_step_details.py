@@ -1,66 +1,96 @@
 from __future__ import annotations
 
-from collections import defaultdict
 import numpy as np
 import matplotlib.pyplot as plt
 
-
-def visualize_step_details(step_idx: int, abs_rollouts, abs_stats, rel_rollouts, rel_stats):
+try:
+    from helper_context import HelperContext
+except ImportError:
+    class HelperContext:
+        """
+        Used when this file is exec'd on its own: the injected ACTIONS and
+        compute_group_advantages (or step_advantages), and only what this file needs.
+        """
+
+        def __init__(self, actions, compute_group_advantages=None, step_advantages=None):
+            self.actions = tuple(actions)
+            self.compute_group_advantages = compute_group_advantages
+            self.step_advantages = step_advantages or self._step_advantages
+
+        @classmethod
+        def from_namespace(cls, ns, require_actions=True):
+            if "ACTIONS" not in ns:
+                raise NameError(
+                    "ACTIONS is not defined in the module namespace. Inject it after loading, e.g. mod.ACTIONS = ACTIONS"
+                )
+            if "step_advantages" not in ns and "compute_group_advantages" not in ns:
+                raise NameError(
+                    "compute_group_advantages is not defined in the module namespace. "
+                    "Inject it after loading, e.g. mod.compute_group_advantages = compute_group_advantages"
+                )
+            return cls(ns["ACTIONS"], ns.get("compute_group_advantages"), ns.get("step_advantages"))
+
+        def advantage_fn(self, name):
+            return getattr(self, name)
+
+        def _step_advantages(self, rollouts, baseline=None):
+            rewards = np.array([r.reward for r in rollouts], dtype=float)
+            by_prompt = {}
+            for i, ro in enumerate(rollouts):
+                by_prompt.setdefault(ro.prompt_id, []).append(i)
+            relative = np.zeros(len(rollouts))
+            for idxs in by_prompt.values():
+                relative[idxs] = self.compute_group_advantages([float(rewards[i]) for i in idxs])
+            return {
+                "rewards": rewards,
+                "prompt_ids": np.array([r.prompt_id for r in rollouts]),
+                "absolute": None if baseline is None else rewards - baseline,
+                "relative": relative,
+            }
+
+        def mean_by_action(self, actions, values, default=0.0):
+            by_action = {}
+            for a, v in zip(actions, values):
+                by_action.setdefault(a, []).append(v)
+            return np.array([np.mean(by_action[a]) if a in by_action else default for a in self.actions])
+
+
+def visualize_step_details(step_idx: int, abs_rollouts, abs_stats, rel_rollouts, rel_stats, ctx=None):
     """Show detailed breakdown of rewards and advantages for a specific step.
 
-    External deps you inject into this module namespace:
-      - ACTIONS: list[str]
-      - compute_group_advantages(rewards: list[float]) -> list[float]
+    ctx: a HelperContext (helper_context.py) with ACTIONS and step_advantages.
+    Without it, ACTIONS (and optionally step_advantages, or a per-group
+    compute_group_advantages(rewards) -> advantages) are read from this
+    module's namespace, as injected by the caller.
     """
 
     if step_idx >= len(abs_rollouts):
         print(f"Step {step_idx} not available (max: {len(abs_rollouts)-1})")
         return
 
-    # resolve injected deps
-    try:
-        ACTIONS = globals()["ACTIONS"]
-    except KeyError:
-        raise NameError(
-            "ACTIONS is not defined in the module namespace. Inject it after loading, e.g. mod.ACTIONS = ACTIONS"
-        )
-
-    try:
-        compute_group_advantages = globals()["compute_group_advantages"]
-    except KeyError:
-        raise NameError(
-            "compute_group_advantages is not defined in the module namespace. "
-            "Inject it after loading, e.g. mod.compute_group_advantages = compute_group_advantages"
-        )
+    if ctx is None:
+        ctx = HelperContext.from_namespace(globals())
+    step_advantages = ctx.advantage_fn("step_advantages")
 
     abs_step_rollouts = abs_rollouts[step_idx]
     rel_step_rollouts = rel_rollouts[step_idx]
     abs_step_stats = abs_stats[step_idx]
 
     # Compute advantages: absolute
-    abs_rewards = [r.reward for r in abs_step_rollouts]
     abs_baseline = abs_step_stats["baseline"]
-    abs_advantages = [r - abs_baseline for r in abs_rewards]
-
-    # Compute advantages: relative (per prompt group)
-    rel_rewards = [r.reward for r in rel_step_rollouts]
-    by_prompt = {}
-    for idx, ro in enumerate(rel_step_rollouts):
-        by_prompt.setdefault(ro.prompt_id, []).append(idx)
+    abs_step = step_advantages(abs_step_rollouts, abs_baseline)
+    abs_rewards, abs_advantages = abs_step["rewards"], abs_step["absolute"]
 
-    rel_advantages = [0.0] * len(rel_step_rollouts)
-    for _, idxs in by_prompt.items():
-        group_rewards = [rel_rewards[i] for i in idxs]
-        group_adv = compute_group_advantages(group_rewards)
-        for i, a in zip(idxs, group_adv):
-            rel_advantages[i] = a
+    # Compute advantages: relative (z-score per prompt group)
+    rel_step = step_advantages(rel_step_rollouts)
+    rel_rewards, rel_advantages = rel_step["rewards"], rel_step["relative"]
 
     # Create visualization
     fig, axes = plt.subplots(2, 3, figsize=(16, 10))
 
     # Top row: Rewards
     ax = axes[0, 0]
-    ax.scatter(range(len(abs_rewards)), sorted(abs_rewards), alpha=0.6, s=50, label="Rewards")
+    ax.scatter(range(len(abs_rewards)), np.sort(abs_rewards), alpha=0.6, s=50, label="Rewards")
     ax.axhline(abs_baseline, color="r", linestyle="--", linewidth=2, label=f"Baseline: {abs_baseline:.3f}")
     ax.set_xlabel("Rollout (sorted)")
     ax.set_ylabel("Reward")
@@ -69,7 +99,7 @@ def visualize_step_details(step_idx: int, abs_rollouts, abs_stats, rel_rollouts,
     ax.grid(True, alpha=0.3)
 
     ax = axes[0, 1]
-    ax.scatter(range(len(rel_rewards)), sorted(rel_rewards), alpha=0.6, s=50, color="orange", label="Rewards")
+    ax.scatter(range(len(rel_rewards)), np.sort(rel_rewards), alpha=0.6, s=50, color="orange", label="Rewards")
     ax.axhline(np.mean(rel_rewards), color="r", linestyle="--", linewidth=2, label=f"Mean: {np.mean(rel_rewards):.3f}")
     ax.set_xlabel("Rollout (sorted)")
     ax.set_ylabel("Reward")
@@ -114,20 +144,15 @@ def visualize_step_details(step_idx: int, abs_rollouts, abs_stats, rel_rollouts,
 
     # Action wise analysis
     ax = axes[1, 2]
-    action_abs_adv = defaultdict(list)
-    action_rel_adv = defaultdict(list)
-
-    for ro, adv in zip(abs_step_rollouts, abs_advantages):
-        action_abs_adv[ro.action].append(adv)
-
-    for ro, adv in zip(rel_step_rollouts, rel_advantages):
-        action_rel_adv[ro.action].append(adv)
+    abs_by_action = ctx.mean_by_action([ro.action for ro in abs_step_rollouts], abs_advantages)
+    rel_by_action = ctx.mean_by_action([ro.action for ro in rel_step_rollouts], rel_advantages)
 
-    actions_sorted = sorted(ACTIONS, key=lambda a: np.mean(action_abs_adv.get(a, [0])))
+    order = np.argsort(abs_by_action, kind="stable")
+    actions_sorted = [ctx.actions[i] for i in order]
     x_pos = np.arange(len(actions_sorted))
 
-    abs_means = [np.mean(action_abs_adv.get(a, [0])) for a in actions_sorted]
-    rel_means = [np.mean(action_rel_adv.get(a, [0])) for a in actions_sorted]
+    abs_means = abs_by_action[order]
+    rel_means = rel_by_action[order]
 
     width = 0.35
     ax.barh(x_pos - width / 2, abs_means, width, label="Absolute", alpha=0.8)